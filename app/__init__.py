@@ -1,30 +1,84 @@
 import os
-from flask import Flask, send_from_directory
-from flask_cors import CORS
 from datetime import timedelta
+from typing import Optional
 
-from flask_migrate import Migrate
-from config import Config
-from .models import db
+# everything web related is imported in create_app(), so that the game core
+# (app.game), the TUI and the command line tools don't load Flask,
+# SQLAlchemy or the config when they import this package
 
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+
+def create_app(config: Optional[dict] = None):
+    """
+    `config` overrides settings from config.Config. the schema comes from
+    `flask db upgrade` (or `flask create-db` for a throwaway database), not
+    from here
+    """
+    from flask import Flask, send_from_directory
+    from flask_cors import CORS
+    from config import Config
+    from .models import SQLITE_PRAGMAS, apply_sqlite_pragmas, db, engine_options
+    from .api import register_blueprints
+    from .api.events import LocalBroker, RedisBroker
+    from .api.matchmaking import LocalMatchQueue, RedisMatchQueue
 
-def create_app():
     app = Flask(__name__, static_folder="../frontend/dist", static_url_path="")
     app.config.from_object(Config)
+    if config:
+        app.config.update(config)
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS",
+        engine_options(app.config["SQLALCHEMY_DATABASE_URI"]),
+    )
     app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(hours=24)
 
     CORS(app, supports_credentials=True, origins=["http://localhost:5173"])
     db.init_app(app)
-    Migrate(app, db)
+    with app.app_context():
+        apply_sqlite_pragmas(
+            db.engine, app.config.get("SQLITE_PRAGMAS", SQLITE_PRAGMAS)
+        )
+    # game events and the matchmaking queue are shared by the web workers
+    # through Redis. the tests run on a single process, and keep them in it
+    max_streams = app.config.get("MAX_EVENT_STREAMS", 800)
+    redis_url = app.config.get("REDIS_URL") or os.environ.get("REDIS_URL")
+    if app.testing and not redis_url:
+        app.extensions["events"] = LocalBroker(max_subscribers=max_streams)
+        app.extensions["matchmaking"] = LocalMatchQueue()
+    else:
+        import redis
 
-    from .api.auth import auth_bp
-    from .api.game import game_bp
+        # connects on first use, so commands that don't publish, like
+        # `flask db upgrade`, don't need a Redis server
+        client = redis.Redis.from_url(
+            redis_url or DEFAULT_REDIS_URL, socket_connect_timeout=2
+        )
+        app.extensions["events"] = RedisBroker(
+            client, max_subscribers=max_streams, logger=app.logger
+        )
+        app.extensions["matchmaking"] = RedisMatchQueue(client)
 
-    app.register_blueprint(auth_bp, url_prefix="/api")
-    app.register_blueprint(game_bp, url_prefix="/api/game")
+    register_blueprints(app)
 
-    with app.app_context():
-        db.create_all()
+    from .cli import create_db_command, migrate_command, ratings_cli
+
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(create_db_command)
+    app.cli.add_command(ratings_cli)
+
+    from .api.ai_jobs import ProcessPoolJobQueue
+    from .api.game import commit_ai_move
+
+    def handle_ai_result(job, code):
+        with app.app_context():
+            commit_ai_move(job, code)
+
+    app.extensions["ai_jobs"] = ProcessPoolJobQueue(
+        handle_ai_result,
+        workers=app.config.get("AI_WORKERS", 2),
+        logger=app.logger,
+    )
 
     @app.errorhandler(404)
     def not_found(e):
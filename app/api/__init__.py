@@ -1,9 +1,10 @@
-from flask import Blueprint
-
-from .auth import auth_bp
-from .game import game_bp
-
-
 def register_blueprints(app):
-    app.register_blueprint(auth_bp, url_prefix="/auth")
-    app.register_blueprint(game_bp, url_prefix="/game")
+    # imported here so that importing a module of this package, eg.
+    # app.api.matchmaking, doesn't load every endpoint
+    from .auth import auth_bp
+    from .game import game_bp
+    from .leaderboard import leaderboard_bp
+
+    app.register_blueprint(auth_bp, url_prefix="/api")
+    app.register_blueprint(game_bp, url_prefix="/api/game")
+    app.register_blueprint(leaderboard_bp, url_prefix="/api")
@@ -0,0 +1,198 @@
+"""
+AI replies for human vs AI games, computed off the request thread. the move
+endpoint submits a job after committing the human's move and returns, a
+worker process searches for the reply within the game's time budget, and
+the result handler commits and publishes the AI's move.
+
+there is at most one job per game. submitting again or cancelling the game
+drops the old job, and results are tagged with the game version they were
+computed for, so the handler can throw away anything that went stale while
+it was running.
+"""
+
+import abc
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+from app.game.ai.book import OpeningBook
+from app.game.ai.evaluation import DEFAULT_WEIGHTS, Weights, load_weights
+from app.game.ai.search import SearchAI
+from app.game.engine import BitBoards, GameState, encode_move
+from app.game.tablebase import Tablebase
+from app.game.types import PlayerNumberType
+
+
+@dataclass(frozen=True)
+class AIJob:
+    game_id: int
+    # the game's version when the job was submitted
+    version: int
+    black: int
+    white: int
+    player: PlayerNumberType
+    time_budget: float
+    # opening book file, see app.game.ai.book
+    book_path: Optional[str] = None
+    # endgame tablebase file, see app.game.tablebase
+    tablebase_path: Optional[str] = None
+    # evaluation weights file, see app.game.ai.tune
+    weights_path: Optional[str] = None
+
+
+# called with the job and the AI's move code, or None if it had no legal move
+ResultHandler = Callable[[AIJob, Optional[int]], None]
+
+_search_ai: Optional[SearchAI] = None
+_books: Dict[str, OpeningBook] = {}
+_tablebases: Dict[str, Tablebase] = {}
+_weights: Dict[str, Weights] = {}
+
+
+def compute_ai_move(job: AIJob) -> Optional[int]:
+    """
+    top level so it can run in a worker process, which keeps one SearchAI
+    (and its transposition table) and its opened files across jobs
+    """
+    global _search_ai
+    if _search_ai is None:
+        _search_ai = SearchAI()
+    _search_ai.time_budget = job.time_budget
+    _search_ai.book = None
+    if job.book_path is not None:
+        if job.book_path not in _books:
+            _books[job.book_path] = OpeningBook.open(job.book_path)
+        _search_ai.book = _books[job.book_path]
+    _search_ai.tablebase = None
+    if job.tablebase_path is not None:
+        if job.tablebase_path not in _tablebases:
+            _tablebases[job.tablebase_path] = Tablebase.open(job.tablebase_path)
+        _search_ai.tablebase = _tablebases[job.tablebase_path]
+    _search_ai.evaluator.weights = DEFAULT_WEIGHTS
+    if job.weights_path is not None:
+        if job.weights_path not in _weights:
+            _weights[job.weights_path] = load_weights(job.weights_path)
+        _search_ai.evaluator.weights = _weights[job.weights_path]
+    move = _search_ai.generate_move(
+        GameState(
+            boards=BitBoards(job.black, job.white), player_turn=job.player
+        )
+    )
+    return None if move is None else encode_move(move)
+
+
+class JobQueue(abc.ABC):
+    @abc.abstractmethod
+    def submit(self, job: AIJob):
+        pass
+
+    @abc.abstractmethod
+    def cancel(self, game_id: int):
+        pass
+
+    @abc.abstractmethod
+    def has_job(self, game_id: int) -> bool:
+        """
+        whether a job for the game is waiting or running
+        """
+
+    def close(self):
+        pass
+
+
+class LocalJobQueue(JobQueue):
+    """
+    in-process stand-in for tests: jobs wait until run_pending() computes
+    them in the calling thread
+    """
+
+    def __init__(self, handler: ResultHandler):
+        self.handler = handler
+        self.pending: Dict[int, AIJob] = {}
+
+    def submit(self, job: AIJob):
+        self.pending[job.game_id] = job
+
+    def cancel(self, game_id: int):
+        self.pending.pop(game_id, None)
+
+    def has_job(self, game_id: int) -> bool:
+        return game_id in self.pending
+
+    def run_pending(self) -> int:
+        jobs = list(self.pending.values())
+        self.pending.clear()
+        for job in jobs:
+            self.handler(job, compute_ai_move(job))
+        return len(jobs)
+
+
+class ProcessPoolJobQueue(JobQueue):
+    """
+    runs jobs on a pool of worker processes, started on the first submit.
+    the handler runs on a thread of this process once a result is back
+    """
+
+    def __init__(
+        self,
+        handler: ResultHandler,
+        workers: int = 2,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.logger = logger or logging.getLogger(__name__)
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._futures: Dict[int, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job: AIJob):
+        with self._lock:
+            if self._executor is None:
+                # the web worker runs greenlets and threads, so don't fork it
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            previous = self._futures.pop(job.game_id, None)
+            if previous is not None:
+                previous.cancel()
+            future = self._executor.submit(compute_ai_move, job)
+            self._futures[job.game_id] = future
+        future.add_done_callback(lambda done: self._finish(job, done))
+
+    def cancel(self, game_id: int):
+        # a job that's already running finishes its search, and its result
+        # is dropped here
+        with self._lock:
+            future = self._futures.pop(game_id, None)
+        if future is not None:
+            future.cancel()
+
+    def has_job(self, game_id: int) -> bool:
+        with self._lock:
+            return game_id in self._futures
+
+    def _finish(self, job: AIJob, future: concurrent.futures.Future):
+        with self._lock:
+            if self._futures.get(job.game_id) is not future:
+                return
+            del self._futures[job.game_id]
+        if future.cancelled():
+            return
+        # a failed job leaves the game on the AI's turn until the next
+        # state request submits it again, see app.api.game.resume_ai_reply
+        try:
+            self.handler(job, future.result())
+        except Exception:
+            self.logger.exception("AI job for game %s failed", job.game_id)
+
+    def close(self):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+            self._futures.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,343 @@
+"""
+request throughput of the web app as gunicorn.conf.py runs it: worker
+processes (WEB_CONCURRENCY, 2 by default) of gevent greenlets, against one
+SQLite file opened with SQLITE_PRAGMAS. each greenlet is a player who plays
+random moves in their own game through the move endpoint and refreshes
+their list of active games after every move, as the lobby does. the
+database is first filled with --history finished games between other
+players, which the game list's indexes skip and a table scan doesn't.
+
+reports the moves and game lists per second, their median and 95th
+percentile latency, and the requests that failed, eg. on a locked database.
+--no-indexes drops the game table's indexes and --default-journal opens
+connections without SQLITE_PRAGMAS, for before and after comparisons. game
+events go through Redis if REDIS_URL is set, and stay in each worker
+otherwise.
+
+--startup instead times fresh interpreters importing the game core, and
+creating the web app, which every web worker, self-play run and command
+line tool pays once.
+
+    python -m app.api.bench
+    python -m app.api.bench --no-indexes
+    python -m app.api.bench --default-journal
+    python -m app.api.bench --startup
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+
+def move_json(move) -> dict:
+    return {
+        "move": {
+            "playerColor": move.player,
+            "passiveMove": {
+                "boardId": move.passive.board,
+                "origin": move.passive.origin,
+                "destination": move.passive.destination,
+            },
+            "activeMove": {
+                "boardId": move.active.board,
+                "origin": move.active.origin,
+                "destination": move.active.destination,
+            },
+        }
+    }
+
+
+def _bench_app(config: dict):
+    from app import create_app
+    from app.api.ai_jobs import LocalJobQueue
+    from app.api.events import LocalBroker
+
+    app = create_app(config)
+    app.extensions["ai_jobs"].close()
+    app.extensions["ai_jobs"] = LocalJobQueue(lambda job, code: None)
+    if not (config.get("REDIS_URL") or os.environ.get("REDIS_URL")):
+        app.extensions["events"].close()
+        app.extensions["events"] = LocalBroker()
+    return app
+
+
+class Timings:
+    def __init__(self):
+        self.moves: List[float] = []
+        self.lists: List[float] = []
+        self.errors = 0
+
+
+def _play(app, game_id: int, players: Tuple[int, int], plies: int, seed: int):
+    from app.game.engine import GameEngine, GameState
+
+    clients = []
+    for user_id in players:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+        clients.append(client)
+
+    timings = Timings()
+    rng = random.Random(seed)
+    state = GameState.initial_state()
+    for _ in range(plies):
+        move = rng.choice(list(GameEngine.legal_moves(state)))
+        client = clients[state.player_turn]
+        began = time.perf_counter()
+        response = client.post(
+            f"/api/game/{game_id}/move", json=move_json(move)
+        )
+        timings.moves.append(time.perf_counter() - began)
+        if response.status_code != 200:
+            timings.errors += 1
+            break
+        began = time.perf_counter()
+        response = client.get("/api/game/list?status=active")
+        timings.lists.append(time.perf_counter() - began)
+        if response.status_code != 200:
+            timings.errors += 1
+        state = GameEngine.apply_move(state, move).state
+        if state.winner is not None:
+            break
+    return timings
+
+
+def _worker(config, games, players, plies, start, results):
+    # as gunicorn's gevent worker does, before the app is loaded
+    from gevent import monkey
+
+    monkey.patch_all()
+    import gevent
+
+    app = _bench_app(config)
+    start.wait()
+    began = time.perf_counter()
+    players_done = [
+        gevent.spawn(_play, app, game_id, players, plies, seed=game_id)
+        for game_id in games
+    ]
+    gevent.joinall(players_done)
+    elapsed = time.perf_counter() - began
+    timings = Timings()
+    for player in players_done:
+        timings.moves += player.value.moves
+        timings.lists += player.value.lists
+        timings.errors += player.value.errors
+    results.send((timings.moves, timings.lists, timings.errors, elapsed))
+    results.close()
+
+
+def _add_history(players: List[int], count: int, seed: int):
+    """
+    inserts `count` finished games between random pairs of `players`
+    """
+    from app.game.engine import GameState
+    from app.models import Game, db
+
+    rng = random.Random(seed)
+    boards = GameState.initial_state().boards
+    finished_at = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(count):
+        player1, player2 = rng.sample(players, 2)
+        rows.append(
+            {
+                "boards": boards,
+                "moves": [],
+                "player_turn": 0,
+                "player1_id": player1,
+                "player2_id": player2,
+                "is_human_vs_ai": False,
+                "winner": rng.randrange(2),
+                "status": "finished",
+                "finished_at": finished_at,
+                "version": 1,
+                "ply": 0,
+            }
+        )
+    db.session.execute(db.insert(Game), rows)
+    db.session.commit()
+
+
+def _add_user(name: str) -> int:
+    from app.models import User, db
+
+    user = User(username=name, email=f"{name}@example.com")
+    user.set_password(name)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def bench(
+    workers: int,
+    clients: int,
+    plies: int,
+    history: int,
+    indexes: bool,
+    default_journal: bool,
+    path: str,
+) -> Tuple[Timings, float]:
+    """
+    the moves and lists timed by every worker, and the longest any worker
+    ran for
+    """
+    from app.api.game import new_game
+    from app.models import Game, db
+
+    config = {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"}
+    if default_journal:
+        config["SQLITE_PRAGMAS"] = {}
+
+    app = _bench_app(config)
+    with app.app_context():
+        db.create_all()
+        if not indexes:
+            for index in Game.__table__.indexes:
+                index.drop(db.engine)
+        _add_history(
+            [_add_user(f"player{number}") for number in range(200)],
+            history,
+            seed=0,
+        )
+        players = (_add_user("black"), _add_user("white"))
+        game_ids = [new_game(*players).id for _ in range(workers * clients)]
+        db.engine.dispose()
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(workers + 1)
+    processes = []
+    connections = []
+    for worker in range(workers):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_worker,
+            args=(
+                config,
+                game_ids[worker * clients : (worker + 1) * clients],
+                players,
+                plies,
+                start,
+                sender,
+            ),
+        )
+        process.start()
+        sender.close()
+        processes.append(process)
+        connections.append(receiver)
+    start.wait()
+    timings = Timings()
+    elapsed = 0.0
+    for connection in connections:
+        moves, lists, errors, worker_elapsed = connection.recv()
+        timings.moves += moves
+        timings.lists += lists
+        timings.errors += errors
+        elapsed = max(elapsed, worker_elapsed)
+    for process in processes:
+        process.join()
+    return timings, elapsed
+
+
+def _summary(name: str, samples: List[float], elapsed: float) -> str:
+    if not samples:
+        return f"{name}: none"
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (
+        f"{name}: {len(samples)} in {elapsed:.2f}s, "
+        f"{len(samples) / elapsed:.0f}/s, "
+        f"median {statistics.median(ordered) * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms"
+    )
+
+
+# what each startup case runs in a fresh interpreter
+STARTUP_CASES = {
+    "interpreter": "pass",
+    "import app.game.engine": "import app.game.engine",
+    "import app.game.selfplay": "import app.game.selfplay",
+    "create_app()": "from app import create_app; create_app()",
+}
+
+
+def startup_times(repeats: int) -> dict:
+    """
+    median wall time of each startup case, in seconds
+    """
+    times = {}
+    for name, code in STARTUP_CASES.items():
+        samples = []
+        for _ in range(repeats):
+            began = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True)
+            samples.append(time.perf_counter() - began)
+        times[name] = statistics.median(samples)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="web app request throughput")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", "2")),
+        help="worker processes, as in gunicorn.conf.py",
+    )
+    parser.add_argument(
+        "--clients", type=int, default=16, help="greenlets per worker"
+    )
+    parser.add_argument("--plies", type=int, default=40)
+    parser.add_argument(
+        "--history",
+        type=int,
+        default=50_000,
+        help="finished games in the database before the run",
+    )
+    parser.add_argument(
+        "--no-indexes",
+        action="store_true",
+        help="drop the game table's indexes",
+    )
+    parser.add_argument(
+        "--default-journal",
+        action="store_true",
+        help="don't set SQLITE_PRAGMAS on connections",
+    )
+    parser.add_argument(
+        "--startup", action="store_true", help="time startup instead"
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.startup:
+        for name, seconds in startup_times(args.repeats).items():
+            print(f"{name:<28}{seconds * 1000:8.1f} ms")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        timings, elapsed = bench(
+            args.workers,
+            args.clients,
+            args.plies,
+            args.history,
+            not args.no_indexes,
+            args.default_journal,
+            os.path.join(directory, "bench.db"),
+        )
+    print(_summary("moves", timings.moves, elapsed))
+    print(_summary("game lists", timings.lists, elapsed))
+    print(f"{timings.errors} failed")
+
+
+if __name__ == "__main__":
+    main()
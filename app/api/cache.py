@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.game.engine import GameState
+
+
+class GameStateCache:
+    """
+    per-process LRU of live game states keyed by game id. each entry
+    remembers the row version it was read or written at, and a lookup with a
+    different version (another process moved in the meantime) is a miss
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[int, GameState]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, game_id: int, version: int) -> Optional[GameState]:
+        with self._lock:
+            entry = self._entries.get(game_id)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    del self._entries[game_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(game_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, game_id: int, version: int, state: GameState):
+        with self._lock:
+            self._entries[game_id] = (version, state)
+            self._entries.move_to_end(game_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, game_id: int):
+        with self._lock:
+            self._entries.pop(game_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ReplayCache:
+    """
+    per-process LRU of past positions keyed by (game id, ply). the move log
+    is append-only, so an entry never goes stale
+    """
+
+    def __init__(self, max_size: int = 8192):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[int, int], GameState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, game_id: int, ply: int) -> Optional[GameState]:
+        with self._lock:
+            state = self._entries.get((game_id, ply))
+            if state is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((game_id, ply))
+            self.hits += 1
+            return state
+
+    def put(self, game_id: int, ply: int, state: GameState):
+        with self._lock:
+            self._entries[(game_id, ply)] = state
+            self._entries.move_to_end((game_id, ply))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
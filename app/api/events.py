@@ -0,0 +1,243 @@
+"""
+pub/sub for pushing game updates to connected clients. the move endpoint
+publishes to a game's channel after it commits, and the event stream
+endpoint relays the channel to the browser as server-sent events.
+
+RedisBroker publishes through Redis, so a move committed by any web worker
+reaches the streams open on all of them. each worker keeps its own
+subscribers and relays to them what its one Redis subscription receives.
+LocalBroker only reaches subscribers in its own process, and is the broker
+of the tests.
+
+the web workers are gevent workers (gunicorn.conf.py), where an open stream
+is a greenlet rather than a thread. the broker still caps the streams of a
+worker (MAX_EVENT_STREAMS) below its connection limit, to keep connections
+free for moves. streams past the cap are refused, and those clients poll the
+game state instead.
+"""
+
+import abc
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Optional, Set
+import redis
+
+# the Redis channels RedisBroker listens on
+CHANNEL_PATTERN = "game:*"
+
+
+def game_channel(game_id: int) -> str:
+    return f"game:{game_id}"
+
+
+def format_sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class BrokerFull(Exception):
+    pass
+
+
+class BrokerUnavailable(Exception):
+    pass
+
+
+class Subscription:
+    """
+    one subscriber's view of a channel. events queue up until get() takes
+    them, and a subscriber that falls too far behind is closed, so that it
+    reconnects and starts again from a full state
+    """
+
+    def __init__(self, broker: "Broker", channel: str, max_pending: int = 64):
+        self.broker = broker
+        self.channel = channel
+        self.closed = False
+        self._events: "queue.Queue[Optional[dict]]" = queue.Queue(max_pending)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        the next event, or None if none arrived within `timeout` seconds or
+        the subscription was closed
+        """
+        if self.closed:
+            return None
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def deliver(self, event: dict):
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker.unsubscribe(self)
+            try:
+                # wake up a get() waiting on this subscription
+                self._events.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Broker(abc.ABC):
+    @abc.abstractmethod
+    def publish(self, channel: str, event: dict):
+        pass
+
+    @abc.abstractmethod
+    def subscribe(self, channel: str) -> Subscription:
+        pass
+
+    @abc.abstractmethod
+    def unsubscribe(self, subscription: Subscription):
+        pass
+
+    def close(self):
+        pass
+
+
+class LocalBroker(Broker):
+    """
+    delivers events to subscribers in this process only
+    """
+
+    def __init__(self, max_subscribers: Optional[int] = None):
+        self.max_subscribers = max_subscribers
+        self._channels: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, event: dict):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def subscribe(self, channel: str) -> Subscription:
+        """
+        raises BrokerFull when max_subscribers are already subscribed
+        """
+        subscription = Subscription(self, channel)
+        with self._lock:
+            if (
+                self.max_subscribers is not None
+                and self._count >= self.max_subscribers
+            ):
+                raise BrokerFull()
+            self._channels.setdefault(channel, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.remove(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def subscriber_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._channels.get(channel, ()))
+
+
+class RedisBroker(LocalBroker):
+    """
+    publishes to Redis, and delivers what a pattern subscription to every
+    game channel receives to this process's subscribers. `client` is a
+    redis.Redis. the subscription starts with the first stream, on a
+    listener thread that reconnects and subscribes again when Redis drops
+    the connection. events published while it's down are lost, and clients
+    catch up by fetching the state when a delta doesn't start at their
+    version
+    """
+
+    def __init__(
+        self,
+        client,
+        max_subscribers: Optional[int] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        super().__init__(max_subscribers)
+        self.client = client
+        self.logger = logger or logging.getLogger(__name__)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, channel: str, event: dict):
+        # the move is committed by now, so an unreachable Redis only costs
+        # the push. clients see the new version on their next fetch
+        try:
+            self.client.publish(
+                channel, json.dumps(event, separators=(",", ":"))
+            )
+        except redis.RedisError as e:
+            self.logger.warning("couldn't publish to %s: %s", channel, e)
+
+    def subscribe(self, channel: str) -> Subscription:
+        """
+        raises BrokerFull past max_subscribers, and BrokerUnavailable when
+        Redis can't be reached
+        """
+        try:
+            self._listen()
+        except redis.RedisError as e:
+            raise BrokerUnavailable(str(e)) from e
+        return super().subscribe(channel)
+
+    def close(self):
+        with self._listener_lock:
+            listener = self._listener
+            self._listener = None
+        if listener is not None:
+            listener.stop()
+
+    def _listen(self):
+        with self._listener_lock:
+            if self._listener is not None:
+                return
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(**{CHANNEL_PATTERN: self._receive})
+                # wait for Redis to confirm, so the first stream doesn't miss
+                # a move committed while it reads the game
+                pubsub.get_message(timeout=1.0)
+            except redis.RedisError:
+                pubsub.close()
+                raise
+            self._listener = pubsub.run_in_thread(
+                sleep_time=1.0,
+                daemon=True,
+                exception_handler=self._listener_failed,
+            )
+
+    def _receive(self, message: dict):
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        super().publish(channel, json.loads(message["data"]))
+
+    def _listener_failed(self, error, pubsub, thread):
+        self.logger.warning("lost the Redis event subscription: %s", error)
+        # the next read reconnects and subscribes again
+        time.sleep(1.0)
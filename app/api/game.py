@@ -1,16 +1,215 @@
-from flask import Blueprint, request, jsonify, session
-from app.models import db, Game
+from dataclasses import replace
+from typing import Optional
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    request,
+    jsonify,
+    session,
+    stream_with_context,
+)
+from sqlalchemy.orm import defer
+from sqlalchemy.orm.exc import StaleDataError
+from app.models import db, Game, LeaderboardEntry
+from app.models.leaderboard import record_result
+from app.models.game_move import SNAPSHOT_INTERVAL
+from app.api.cache import GameStateCache, ReplayCache
+from app.api.ai_jobs import AIJob
+from app.api.events import (
+    BrokerFull,
+    BrokerUnavailable,
+    format_sse,
+    game_channel,
+)
+from app.api.matchmaking import Ticket
 
+from app.game.rating import DEFAULT_RATING
 from app.game.engine import (
     GameEngine,
     GameState,
     GameError,
     Move,
+    BitBoards,
     BoardMove,
+    decode_move,
+    encode_move,
 )
 
 game_bp = Blueprint("game", __name__)
 
+# the AI always plays white (player 1) in human vs AI games
+AI_PLAYER = 1
+# seconds the AI thinks per move, unless the game sets its own budget
+AI_TIME_BUDGET = 1.0
+MAX_AI_TIME_BUDGET = 10.0
+
+# live games of this process. the boards and moves JSON is only read from the
+# row when the cached state is missing or stale
+game_states = GameStateCache(max_size=1024)
+
+# past positions of this process, for replays. a miss decodes the whole
+# snapshot interval around the ply, so stepping back and forth through a game
+# mostly hits
+replay_states = ReplayCache(max_size=8192)
+
+# seconds between keepalive comments on an idle event stream
+EVENT_KEEPALIVE = 15.0
+
+
+def load_game_state(game_db: Game) -> GameState:
+    state = game_states.get(game_db.id, game_db.version)
+    if state is None:
+        # the boards column is only written with snapshots, so the position
+        # comes from the move log
+        state = game_db.state_at()
+        if game_db.winner is not None:
+            # abandoned, or lost for want of a legal move
+            state = replace(state, winner=game_db.winner)
+        game_states.put(game_db.id, game_db.version, state)
+    return state
+
+
+def finish_if_stuck(state: GameState) -> GameState:
+    """
+    a player with no legal moves loses, so the move that left the opponent
+    without one wins the game
+    """
+    if state.winner is None and GameEngine.count_legal_moves(state) == 0:
+        return replace(state, winner=1 - state.player_turn)
+    return state
+
+
+def state_dict(state: GameState) -> dict:
+    return {
+        "boards": state.boards,
+        "player_turn": state.player_turn,
+        "winner": state.winner,
+    }
+
+
+def move_delta(move: Move, before: GameState, after: GameState) -> dict:
+    return {
+        "code": encode_move(move),
+        "changes": GameEngine.changed_squares(before.boards, after.boards),
+    }
+
+
+def state_delta(
+    game_db: Game, base_version: int, moves: list[dict], state: GameState
+) -> dict:
+    """
+    what a client at `base_version` needs to reach the game's current
+    version: the moves played, each with the (square, new cell) pairs it
+    changed. clients at any other version fetch the full state instead
+    """
+    return {
+        "base_version": base_version,
+        "version": game_db.version,
+        "ply": game_db.ply,
+        "moves": moves,
+        "player_turn": state.player_turn,
+        "winner": state.winner,
+    }
+
+
+def save_state(game_db: Game, state: GameState):
+    # the move log holds the position, so the boards JSON is only rewritten
+    # along with a snapshot or at the end of the game. it's never loaded
+    # first, and unchanged columns are left out of the UPDATE
+    if game_db.ply % SNAPSHOT_INTERVAL == 0 or state.winner is not None:
+        game_db.boards = state.boards
+    game_db.player_turn = state.player_turn
+    game_db.winner = state.winner
+    if state.winner is not None:
+        game_db.status = "finished"
+        # the ratings change in the same transaction as the result
+        record_result(game_db)
+    db.session.commit()
+    game_states.put(game_db.id, game_db.version, state)
+
+
+def submit_ai_reply(game_db: Game, state: GameState):
+    boards = state.boards
+    if not isinstance(boards, BitBoards):
+        boards = BitBoards.from_boards(boards)
+    current_app.extensions["ai_jobs"].submit(
+        AIJob(
+            game_id=game_db.id,
+            version=game_db.version,
+            black=boards.black,
+            white=boards.white,
+            player=state.player_turn,
+            time_budget=game_db.ai_time_budget or AI_TIME_BUDGET,
+            book_path=current_app.config.get("OPENING_BOOK"),
+            tablebase_path=current_app.config.get("TABLEBASE"),
+            weights_path=current_app.config.get("EVAL_WEIGHTS"),
+        )
+    )
+
+
+def resume_ai_reply(game_db: Game, state: GameState):
+    """
+    submits the AI's reply again if it's the AI's turn and no job is
+    running, ie. the job failed, was rejected or was lost with a restart.
+    jobs are per web worker, so this can also start a second job for a
+    reply another worker is computing. whichever commits first wins, and
+    the other is dropped by the version check in commit_ai_move
+    """
+    if (
+        game_db.is_human_vs_ai
+        and game_db.status == "active"
+        and state.winner is None
+        and state.player_turn == AI_PLAYER
+        and not current_app.extensions["ai_jobs"].has_job(game_db.id)
+    ):
+        current_app.logger.info("resubmitting AI reply for game %s", game_db.id)
+        submit_ai_reply(game_db, state)
+
+
+def commit_ai_move(job: AIJob, code: Optional[int]):
+    """
+    result handler for AI jobs, run in an app context. results for a game
+    that has moved on since the job was submitted are dropped
+    """
+    game_db = db.session.get(
+        Game, job.game_id, options=[defer(Game.boards), defer(Game.moves)]
+    )
+    if (
+        game_db is None
+        or game_db.version != job.version
+        or game_db.status != "active"
+    ):
+        return
+
+    state = load_game_state(game_db)
+    if code is None:
+        # a player with no legal moves loses
+        new_state = replace(state, winner=1 - job.player)
+        played = []
+    else:
+        move = decode_move(code, state.boards)
+        result = GameEngine.apply_move(state, move)
+        if result.state is state:
+            current_app.logger.error(
+                "AI move rejected in game %s: %s", job.game_id, result.message
+            )
+            return
+        new_state = finish_if_stuck(result.state)
+        game_db.record_move(move, new_state)
+        played = [move_delta(move, state, new_state)]
+
+    try:
+        save_state(game_db, new_state)
+    except StaleDataError:
+        db.session.rollback()
+        game_states.discard(job.game_id)
+        return
+    current_app.extensions["events"].publish(
+        game_channel(job.game_id),
+        state_delta(game_db, job.version, played, new_state),
+    )
+
 
 def parse_api_move(input):
     passive_move = input["passiveMove"]
@@ -43,7 +242,9 @@ def make_move(game_id):
     if not user_id:
         return jsonify({"error": "unauthorized"}), 401
 
-    game_db = db.session.get(Game, game_id)
+    game_db = db.session.get(
+        Game, game_id, options=[defer(Game.boards), defer(Game.moves)]
+    )
     if not game_db:
         return jsonify({"error": "game not found"}), 404
 
@@ -52,11 +253,7 @@ def make_move(game_id):
 
     player_number = 0 if user_id == game_db.player1_id else 1
 
-    current_state = GameState(
-        boards=game_db.boards,
-        player_turn=game_db.player_turn,
-        winner=game_db.winner,
-    )
+    current_state = load_game_state(game_db)
 
     if current_state.winner is not None:
         return jsonify({"error": "game finished"}), 400
@@ -69,63 +266,286 @@ def make_move(game_id):
         return jsonify({"error": "move data required"}), 400
 
     try:
+        base_version = game_db.version
         move = parse_api_move(data["move"])
-        result = GameEngine.apply_action(current_state, move)
-        new_state = result.state
+        result = GameEngine.apply_move(current_state, move)
+        if result.state is current_state:
+            raise GameError(result.message)
+        new_state = finish_if_stuck(result.state)
+        game_db.record_move(move, new_state)
+        played = [move_delta(move, current_state, new_state)]
+        save_state(game_db, new_state)
 
-        game_db.boards = new_state.boards
-        game_db.player_turn = new_state.player_turn
-        game_db.winner = new_state.winner
-        if new_state.winner is not None:
-            game_db.status = "finished"
+        delta = state_delta(game_db, base_version, played, new_state)
+        current_app.extensions["events"].publish(game_channel(game_id), delta)
 
-        db.session.commit()
+        if (
+            game_db.is_human_vs_ai
+            and new_state.winner is None
+            and new_state.player_turn == AI_PLAYER
+        ):
+            # the reply is committed and published when the AI is done
+            submit_ai_reply(game_db, new_state)
 
-        return jsonify(
-            {
-                "message": "move processed",
-                "game_state": {
-                    "boards": new_state.boards,
-                    "player_turn": new_state.player_turn,
-                    "winner": new_state.winner,
-                },
-            }
-        )
+        return jsonify({"message": "move processed", **delta})
 
+    except StaleDataError:
+        db.session.rollback()
+        game_states.discard(game_id)
+        return jsonify({"error": "game was updated, try again"}), 409
     except GameError as e:
-        print("bad error", e)
+        current_app.logger.warning("invalid move in game %s: %s", game_id, e)
         return jsonify({"error": f"invalid move: {str(e)}"}), 400
-    except Exception as e:
-        print("horrible error", e)
+    except Exception:
+        current_app.logger.exception("move failed in game %s", game_id)
         db.session.rollback()
+        game_states.discard(game_id)
         return jsonify({"error": "move processing failed"}), 500
 
 
-@game_bp.route("/create", methods=["POST"])
-def create_game():
+@game_bp.route("/<int:game_id>/abandon", methods=["POST"])
+def abandon_game(game_id):
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"error": "unauthorized"}), 401
 
-    data = request.get_json() or {}
-    opponent_type = data.get("opponent", "human")
+    game_db = db.session.get(
+        Game, game_id, options=[defer(Game.boards), defer(Game.moves)]
+    )
+    if not game_db:
+        return jsonify({"error": "game not found"}), 404
+
+    if user_id not in [game_db.player1_id, game_db.player2_id]:
+        return jsonify({"error": "not a player in this game"}), 403
+
+    if game_db.status != "active":
+        return jsonify({"error": "game finished"}), 400
+
+    current_app.extensions["ai_jobs"].cancel(game_id)
+    base_version = game_db.version
+    game_db.status = "abandoned"
+    game_db.winner = 1 if user_id == game_db.player1_id else 0
+    record_result(game_db)
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "game was updated, try again"}), 409
+    game_states.discard(game_id)
+
+    state = load_game_state(game_db)
+    delta = state_delta(game_db, base_version, [], state)
+    current_app.extensions["events"].publish(game_channel(game_id), delta)
+    return jsonify({"message": "game abandoned", **delta})
+
+
+def load_replay_state(game_db: Game, ply: int) -> GameState:
+    state = replay_states.get(game_db.id, ply)
+    if state is None:
+        first = ply - (ply % SNAPSHOT_INTERVAL)
+        last = min(first + SNAPSHOT_INTERVAL - 1, game_db.ply)
+        for replay_ply, replay_state in game_db.replay(first, last):
+            replay_states.put(game_db.id, replay_ply, replay_state)
+            if replay_ply == ply:
+                state = replay_state
+    return state
+
+
+@game_bp.route("/<int:game_id>/state", methods=["GET"])
+def get_game_state(game_id):
+    """
+    the current state, or the position after `ply` moves for replays
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+    game_db = db.session.get(
+        Game, game_id, options=[defer(Game.boards), defer(Game.moves)]
+    )
+    if not game_db:
+        return jsonify({"error": "game not found"}), 404
+
+    if user_id not in [game_db.player1_id, game_db.player2_id]:
+        return jsonify({"error": "not a player in this game"}), 403
+
+    ply = request.args.get("ply", type=int)
+    if ply is None or ply == game_db.ply:
+        ply = game_db.ply
+        state = load_game_state(game_db)
+        resume_ai_reply(game_db, state)
+    elif 0 <= ply < game_db.ply:
+        state = load_replay_state(game_db, ply)
+    else:
+        return jsonify({"error": f"ply must be 0-{game_db.ply}"}), 400
+
+    return jsonify(
+        {
+            "version": game_db.version,
+            "ply": ply,
+            "game_state": state_dict(state),
+        }
+    )
+
+
+@game_bp.route("/<int:game_id>/replay", methods=["GET"])
+def replay_game(game_id):
+    """
+    server-sent event stream of a "position" event for each ply from
+    `from` to `to` (default: the whole game), with the ply as event id
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
 
+    game_db = db.session.get(
+        Game, game_id, options=[defer(Game.boards), defer(Game.moves)]
+    )
+    if not game_db:
+        return jsonify({"error": "game not found"}), 404
+
+    if user_id not in [game_db.player1_id, game_db.player2_id]:
+        return jsonify({"error": "not a player in this game"}), 403
+
+    first = request.args.get("from", 0, type=int)
+    last = request.args.get("to", game_db.ply, type=int)
+    if not 0 <= first <= last <= game_db.ply:
+        return jsonify({"error": f"plies must be within 0-{game_db.ply}"}), 400
+
+    def stream():
+        for ply, state in game_db.replay(first, last):
+            replay_states.put(game_id, ply, state)
+            yield format_sse(
+                "position", {"ply": ply, "game_state": state_dict(state)}, ply
+            )
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@game_bp.route("/<int:game_id>/events", methods=["GET"])
+def game_events(game_id):
+    """
+    server-sent event stream of a game: a "state" event with the full state
+    on connect, then a "move" event with the state_delta of every committed
+    move. each event id is the game's version
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+    # subscribe before reading the row, so a move committed in between is
+    # in the queue rather than lost
+    try:
+        subscription = current_app.extensions["events"].subscribe(
+            game_channel(game_id)
+        )
+    except (BrokerFull, BrokerUnavailable):
+        # every stream holds one of the worker's connections, so past the
+        # cap, or while Redis is down, clients poll GET /state instead
+        response = jsonify({"error": "too many event streams, poll instead"})
+        response.headers["Retry-After"] = str(int(EVENT_KEEPALIVE))
+        return response, 503
+    game_db = db.session.get(
+        Game, game_id, options=[defer(Game.boards), defer(Game.moves)]
+    )
+    if not game_db or user_id not in [game_db.player1_id, game_db.player2_id]:
+        subscription.close()
+        if not game_db:
+            return jsonify({"error": "game not found"}), 404
+        return jsonify({"error": "not a player in this game"}), 403
+
+    version = game_db.version
+    state = load_game_state(game_db)
+    resume_ai_reply(game_db, state)
+    initial = {
+        "version": version,
+        "ply": game_db.ply,
+        "game_state": state_dict(state),
+    }
+    # the stream outlives the request's database session
+    db.session.close()
+
+    def stream():
+        with subscription:
+            yield format_sse("state", initial, version)
+            while not subscription.closed:
+                event = subscription.get(timeout=EVENT_KEEPALIVE)
+                if event is None:
+                    yield ": keepalive\n\n"
+                elif event["version"] > version:
+                    yield format_sse("move", event, event["version"])
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def new_game(
+    player1_id: int,
+    player2_id: Optional[int] = None,
+    is_human_vs_ai: bool = False,
+    ai_time_budget: Optional[float] = None,
+) -> Game:
+    """
+    inserts and commits a game at the initial position
+    """
     initial_state = GameState.initial_state()
 
     game = Game(
-        player1_id=user_id,
-        player2_id=(
-            None if opponent_type == "ai" else None
-        ),  # set to AI_PLAYER_ID constant
+        player1_id=player1_id,
+        player2_id=player2_id,
         boards=initial_state.boards,
         player_turn=initial_state.player_turn,
         status="active",
-        is_human_vs_ai=opponent_type == "ai",
+        is_human_vs_ai=is_human_vs_ai,
+        ai_time_budget=ai_time_budget,
         moves=[],
     )
 
     db.session.add(game)
+    db.session.flush()
+    game.record_snapshot(initial_state)
     db.session.commit()
+    game_states.put(game.id, game.version, initial_state)
+    return game
+
+
+@game_bp.route("/create", methods=["POST"])
+def create_game():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+    data = request.get_json() or {}
+    opponent_type = data.get("opponent", "human")
+    ai_time_budget = None
+    if opponent_type == "ai" and "ai_time_budget" in data:
+        try:
+            ai_time_budget = float(data["ai_time_budget"])
+        except (TypeError, ValueError):
+            return jsonify({"error": "ai_time_budget must be a number"}), 400
+        if not 0 < ai_time_budget <= MAX_AI_TIME_BUDGET:
+            return (
+                jsonify(
+                    {
+                        "error": "ai_time_budget must be between 0 and "
+                        f"{MAX_AI_TIME_BUDGET} seconds"
+                    }
+                ),
+                400,
+            )
+
+    game = new_game(
+        user_id,
+        is_human_vs_ai=opponent_type == "ai",
+        ai_time_budget=ai_time_budget,
+    )
 
     return (
         jsonify(
@@ -143,3 +563,111 @@ def create_game():
         ),
         201,
     )
+
+
+# games per page of a player's game list
+GAMES_PAGE_SIZE = 50
+
+
+@game_bp.route("/list", methods=["GET"])
+def list_games():
+    """
+    the player's games, newest first, optionally only those with a status.
+    each seat is an index lookup on (player, status)
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+    status = request.args.get("status")
+    as_player1 = Game.player1_id == user_id
+    as_player2 = Game.player2_id == user_id
+    if status is not None:
+        as_player1 = db.and_(as_player1, Game.status == status)
+        as_player2 = db.and_(as_player2, Game.status == status)
+    games = db.session.scalars(
+        db.select(Game)
+        .options(
+            defer(Game.boards),
+            defer(Game.moves),
+            db.joinedload(Game.player1),
+            db.joinedload(Game.player2),
+        )
+        .where(db.or_(as_player1, as_player2))
+        .order_by(Game.id.desc())
+        .limit(GAMES_PAGE_SIZE)
+    ).all()
+    return jsonify({"games": [game.to_dict() for game in games]})
+
+
+def matched_game(game: Game):
+    return (
+        jsonify(
+            {
+                "status": "matched",
+                "game_id": game.id,
+                "player1_id": game.player1_id,
+                "player2_id": game.player2_id,
+            }
+        ),
+        201,
+    )
+
+
+def pair_with(user_id: int, opponent: Optional[Ticket]):
+    if opponent is None:
+        return jsonify({"status": "waiting"}), 202
+    # whoever waited longer moves first
+    game = new_game(opponent.user_id, user_id)
+    current_app.extensions["matchmaking"].set_match(opponent.user_id, game.id)
+    return matched_game(game)
+
+
+@game_bp.route("/match", methods=["POST"])
+def join_matchmaking():
+    """
+    queues the player for a game against someone of a similar rating, and
+    creates the game if someone is already waiting
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+    entry = db.session.get(LeaderboardEntry, user_id)
+    rating = entry.rating if entry is not None else DEFAULT_RATING
+    opponent = current_app.extensions["matchmaking"].join(user_id, rating)
+    return pair_with(user_id, opponent)
+
+
+@game_bp.route("/match", methods=["GET"])
+def poll_matchmaking():
+    """
+    the game the player was paired into, or another try at pairing them
+    with the rating window widened by their wait so far
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+    queue = current_app.extensions["matchmaking"]
+    game_id = queue.take_match(user_id)
+    if game_id is not None:
+        game = db.session.get(Game, game_id)
+        if game is not None:
+            return matched_game(game)
+        # taking the match dropped it, and the player is told to join again
+        return jsonify({"error": "matched game no longer exists"}), 404
+    if not queue.is_waiting(user_id):
+        return jsonify({"error": "not waiting for a game"}), 404
+    return pair_with(user_id, queue.poll(user_id))
+
+
+@game_bp.route("/match", methods=["DELETE"])
+def leave_matchmaking():
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+    if not current_app.extensions["matchmaking"].leave(user_id):
+        return jsonify({"error": "not waiting for a game"}), 404
+    return jsonify({"status": "left"})
@@ -0,0 +1,43 @@
+from flask import Blueprint, request, jsonify
+from app.models import db, LeaderboardEntry
+
+leaderboard_bp = Blueprint("leaderboard", __name__)
+
+PAGE_SIZE = 50
+
+
+@leaderboard_bp.route("/leaderboard", methods=["GET"])
+def get_leaderboard():
+    """
+    one page of players by conservative rating, read from the leaderboard
+    table's score index
+    """
+    page = request.args.get("page", 1, type=int)
+    if page < 1:
+        return jsonify({"error": "page must be 1 or more"}), 400
+
+    offset = (page - 1) * PAGE_SIZE
+    entries = db.session.scalars(
+        db.select(LeaderboardEntry)
+        .options(db.joinedload(LeaderboardEntry.user))
+        .order_by(
+            LeaderboardEntry.score.desc(), LeaderboardEntry.user_id.desc()
+        )
+        .offset(offset)
+        .limit(PAGE_SIZE)
+    ).all()
+    total = db.session.scalar(
+        db.select(db.func.count()).select_from(LeaderboardEntry)
+    )
+
+    return jsonify(
+        {
+            "page": page,
+            "page_size": PAGE_SIZE,
+            "total": total,
+            "players": [
+                entry.to_dict(rank=offset + number + 1)
+                for number, entry in enumerate(entries)
+            ],
+        }
+    )
@@ -0,0 +1,332 @@
+"""
+pairs remote players for human vs human games. a player joins the queue
+with their rating and is matched against the nearest waiting rating within
+a window that widens the longer they wait. pairing happens when a player
+joins or polls, so a long wait is met by whoever joins next within the
+wider window.
+
+waiting players are kept in buckets of BUCKET_WIDTH rating points, each in
+the order they joined, and the occupied buckets in a sorted list. finding an
+opponent is a bisect into that list and a walk outwards over at most the
+window's buckets, and takes the longest waiting player of the nearest
+bucket, so it doesn't depend on how many players are queued.
+
+the pair is taken off the queue together under the store's lock, so no one
+is matched twice, and the game is then created with both players in one
+insert. the player who was waiting finds its game id on their next poll.
+
+RedisMatchQueue keeps the queue in Redis, shared by every web worker, and
+pairs in a Lua script, which Redis runs without interleaving other
+commands. LocalMatchQueue keeps it in this process, for the tests.
+"""
+
+import abc
+import bisect
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+BUCKET_WIDTH = 25.0
+# the window, in buckets either side of the player's own, starts at
+# INITIAL_WINDOW and grows by one bucket every WIDEN_INTERVAL seconds
+INITIAL_WINDOW = 2
+WIDEN_INTERVAL = 5.0
+MAX_WINDOW = 40
+
+
+@dataclass(frozen=True)
+class Ticket:
+    user_id: int
+    rating: float
+    # monotonic seconds
+    joined_at: float
+
+    @property
+    def bucket(self) -> int:
+        return int(self.rating // BUCKET_WIDTH)
+
+    def window(self, now: float) -> int:
+        waited = max(0.0, now - self.joined_at)
+        return min(MAX_WINDOW, INITIAL_WINDOW + int(waited / WIDEN_INTERVAL))
+
+
+class MatchQueue(abc.ABC):
+    @abc.abstractmethod
+    def join(self, user_id: int, rating: float) -> Optional[Ticket]:
+        """
+        queues the player, or takes them and an opponent off the queue and
+        returns the opponent's ticket. joining again keeps the first ticket
+        """
+
+    @abc.abstractmethod
+    def poll(self, user_id: int) -> Optional[Ticket]:
+        """
+        looks for an opponent for a queued player with their current window,
+        taking both off the queue if one is found
+        """
+
+    @abc.abstractmethod
+    def leave(self, user_id: int) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def is_waiting(self, user_id: int) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def set_match(self, user_id: int, game_id: int):
+        """
+        records the game a player taken off the queue by someone else was
+        paired into
+        """
+
+    @abc.abstractmethod
+    def take_match(self, user_id: int) -> Optional[int]:
+        pass
+
+
+class LocalMatchQueue(MatchQueue):
+    """
+    in-process queue, also the stand-in for tests. `clock` gives monotonic
+    seconds
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._tickets: Dict[int, Ticket] = {}
+        # bucket -> waiting players in the order they joined
+        self._buckets: Dict[int, Dict[int, Ticket]] = {}
+        # sorted occupied buckets
+        self._occupied: List[int] = []
+        self._matches: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def join(self, user_id: int, rating: float) -> Optional[Ticket]:
+        with self._lock:
+            ticket = self._tickets.get(user_id)
+            if ticket is None:
+                ticket = Ticket(user_id, rating, self.clock())
+                self._add(ticket)
+            return self._pair(ticket)
+
+    def poll(self, user_id: int) -> Optional[Ticket]:
+        with self._lock:
+            ticket = self._tickets.get(user_id)
+            if ticket is None:
+                return None
+            return self._pair(ticket)
+
+    def leave(self, user_id: int) -> bool:
+        with self._lock:
+            ticket = self._tickets.get(user_id)
+            if ticket is None:
+                return False
+            self._remove(ticket)
+            return True
+
+    def is_waiting(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._tickets
+
+    def set_match(self, user_id: int, game_id: int):
+        with self._lock:
+            self._matches[user_id] = game_id
+
+    def take_match(self, user_id: int) -> Optional[int]:
+        with self._lock:
+            return self._matches.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def _add(self, ticket: Ticket):
+        self._tickets[ticket.user_id] = ticket
+        bucket = self._buckets.get(ticket.bucket)
+        if bucket is None:
+            bucket = self._buckets[ticket.bucket] = {}
+            bisect.insort(self._occupied, ticket.bucket)
+        bucket[ticket.user_id] = ticket
+
+    def _remove(self, ticket: Ticket):
+        del self._tickets[ticket.user_id]
+        bucket = self._buckets[ticket.bucket]
+        del bucket[ticket.user_id]
+        if not bucket:
+            del self._buckets[ticket.bucket]
+            del self._occupied[
+                bisect.bisect_left(self._occupied, ticket.bucket)
+            ]
+
+    def _pair(self, ticket: Ticket) -> Optional[Ticket]:
+        opponent = self._nearest(ticket, ticket.window(self.clock()))
+        if opponent is None:
+            return None
+        self._remove(ticket)
+        self._remove(opponent)
+        return opponent
+
+    def _nearest(self, ticket: Ticket, window: int) -> Optional[Ticket]:
+        # occupied buckets either side of the player's own, nearest first
+        occupied = self._occupied
+        own = ticket.bucket
+        below = bisect.bisect_right(occupied, own) - 1
+        above = below + 1
+        while True:
+            candidates: List[Tuple[int, int]] = []
+            if below >= 0 and own - occupied[below] <= window:
+                candidates.append((own - occupied[below], occupied[below]))
+            if above < len(occupied) and occupied[above] - own <= window:
+                candidates.append((occupied[above] - own, occupied[above]))
+            if not candidates:
+                return None
+            _, bucket = min(candidates)
+            for other in self._buckets[bucket].values():
+                if other.user_id != ticket.user_id:
+                    return other
+            # only the player themselves is in their own bucket
+            if below >= 0 and occupied[below] == bucket:
+                below -= 1
+            else:
+                above += 1
+
+
+# seconds a match waits for the player who was paired to poll for it
+MATCH_TTL = 600
+
+# KEYS: the queue (a sorted set of user ids by rating) and the tickets (a
+# hash of user id -> "rating joined_at"). ARGV: user id, rating, now, 1 to
+# join or 0 to poll, BUCKET_WIDTH, INITIAL_WINDOW, WIDEN_INTERVAL and
+# MAX_WINDOW. the same pairing as LocalMatchQueue: the nearest bucket within
+# the window, lower first on a tie, and the longest waiting player in it.
+# returns the opponent's {user id, rating, joined_at}, or nil
+PAIR_SCRIPT = """
+local queue, tickets = KEYS[1], KEYS[2]
+local user = ARGV[1]
+local width = tonumber(ARGV[5])
+
+local function parse(ticket)
+    local space = string.find(ticket, " ")
+    return tonumber(string.sub(ticket, 1, space - 1)),
+        tonumber(string.sub(ticket, space + 1))
+end
+
+local ticket = redis.call("HGET", tickets, user)
+if not ticket then
+    if ARGV[4] ~= "1" then
+        return nil
+    end
+    ticket = ARGV[2] .. " " .. ARGV[3]
+    redis.call("HSET", tickets, user, ticket)
+    redis.call("ZADD", queue, ARGV[2], user)
+end
+local rating, joined = parse(ticket)
+local waited = math.max(0, tonumber(ARGV[3]) - joined)
+local window = math.min(
+    tonumber(ARGV[8]),
+    tonumber(ARGV[6]) + math.floor(waited / tonumber(ARGV[7]))
+)
+local own = math.floor(rating / width)
+
+local candidates = redis.call(
+    "ZRANGEBYSCORE", queue,
+    (own - window) * width, "(" .. ((own + window + 1) * width)
+)
+local best, best_distance, best_bucket, best_joined, best_ticket
+for _, other in ipairs(candidates) do
+    if other ~= user then
+        local other_ticket = redis.call("HGET", tickets, other)
+        local other_rating, other_joined = parse(other_ticket)
+        local bucket = math.floor(other_rating / width)
+        local distance = math.abs(bucket - own)
+        if best == nil
+            or distance < best_distance
+            or (distance == best_distance and bucket < best_bucket)
+            or (bucket == best_bucket and other_joined < best_joined) then
+            best, best_distance, best_bucket = other, distance, bucket
+            best_joined, best_ticket = other_joined, other_ticket
+        end
+    end
+end
+if best == nil then
+    return nil
+end
+redis.call("ZREM", queue, user, best)
+redis.call("HDEL", tickets, user, best)
+return {best, best_ticket}
+"""
+
+
+class RedisMatchQueue(MatchQueue):
+    """
+    the queue in Redis, shared by every web worker. `client` is a
+    redis.Redis, and `clock` gives seconds that agree between the workers'
+    machines. matches are kept for MATCH_TTL seconds
+    """
+
+    def __init__(
+        self,
+        client,
+        clock: Callable[[], float] = time.time,
+        prefix: str = "match:",
+    ):
+        self.client = client
+        self.clock = clock
+        self.prefix = prefix
+        self._queue = prefix + "queue"
+        self._tickets = prefix + "tickets"
+        self._pair_script = client.register_script(PAIR_SCRIPT)
+
+    def join(self, user_id: int, rating: float) -> Optional[Ticket]:
+        return self._pair(user_id, rating, joining=True)
+
+    def poll(self, user_id: int) -> Optional[Ticket]:
+        return self._pair(user_id, 0.0, joining=False)
+
+    def leave(self, user_id: int) -> bool:
+        pipe = self.client.pipeline()
+        pipe.hdel(self._tickets, user_id)
+        pipe.zrem(self._queue, user_id)
+        removed, _ = pipe.execute()
+        return bool(removed)
+
+    def is_waiting(self, user_id: int) -> bool:
+        return bool(self.client.hexists(self._tickets, user_id))
+
+    def set_match(self, user_id: int, game_id: int):
+        self.client.set(self._match_key(user_id), game_id, ex=MATCH_TTL)
+
+    def take_match(self, user_id: int) -> Optional[int]:
+        game_id = self.client.getdel(self._match_key(user_id))
+        return None if game_id is None else int(game_id)
+
+    def __len__(self):
+        return self.client.hlen(self._tickets)
+
+    def _match_key(self, user_id: int) -> str:
+        return f"{self.prefix}game:{user_id}"
+
+    def _pair(
+        self, user_id: int, rating: float, joining: bool
+    ) -> Optional[Ticket]:
+        found = self._pair_script(
+            keys=[self._queue, self._tickets],
+            args=[
+                user_id,
+                repr(float(rating)),
+                repr(self.clock()),
+                1 if joining else 0,
+                BUCKET_WIDTH,
+                INITIAL_WINDOW,
+                WIDEN_INTERVAL,
+                MAX_WINDOW,
+            ],
+        )
+        if found is None:
+            return None
+        opponent, ticket = (
+            value.decode() if isinstance(value, bytes) else value
+            for value in found
+        )
+        rating, joined_at = ticket.split(" ")
+        return Ticket(int(opponent), float(rating), float(joined_at))
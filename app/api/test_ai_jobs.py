@@ -0,0 +1,53 @@
+import threading
+from app.api.ai_jobs import (
+    AIJob,
+    LocalJobQueue,
+    ProcessPoolJobQueue,
+    compute_ai_move,
+)
+from app.game.engine import BitBoards, GameEngine, GameState, decode_move
+
+
+def initial_job(game_id=1, version=1):
+    boards = BitBoards.from_boards(GameState.initial_state().boards)
+    return AIJob(game_id, version, boards.black, boards.white, 0, 0.05)
+
+
+def test_compute_ai_move_is_legal():
+    job = initial_job()
+    boards = BitBoards(job.black, job.white)
+    move = decode_move(compute_ai_move(job), boards)
+    state = GameState(boards=boards, player_turn=0)
+    assert move in list(GameEngine.legal_moves(state))
+
+
+def test_local_queue_keeps_one_job_per_game():
+    results = []
+    queue = LocalJobQueue(lambda job, code: results.append((job, code)))
+    queue.submit(initial_job(1, version=1))
+    queue.submit(initial_job(1, version=2))
+    queue.submit(initial_job(2))
+    queue.cancel(2)
+    assert queue.has_job(1) and not queue.has_job(2)
+    assert queue.run_pending() == 1
+    assert not queue.has_job(1)
+    assert [(job.game_id, job.version) for job, _ in results] == [(1, 2)]
+    assert results[0][1] is not None
+
+
+def test_process_pool_queue():
+    done = threading.Event()
+    results = []
+
+    def handler(job, code):
+        results.append((job.game_id, code))
+        done.set()
+
+    queue = ProcessPoolJobQueue(handler, workers=1)
+    try:
+        queue.submit(initial_job(7))
+        assert done.wait(timeout=30)
+        assert not queue.has_job(7)
+    finally:
+        queue.close()
+    assert results[0][0] == 7 and results[0][1] is not None
@@ -0,0 +1,31 @@
+def test_register_login_and_logout(app):
+    client = app.test_client()
+    assert client.get("/api/status").json == {"logged_in": False}
+    assert client.get("/api/profile").status_code == 401
+
+    details = {"username": "ada", "email": "ada@example.com", "password": "pw"}
+    assert client.post("/api/register", json=details).status_code == 201
+    response = client.post("/api/register", json=details)
+    assert response.status_code == 409
+    response = client.post("/api/register", json={"username": "bob"})
+    assert response.status_code == 400
+
+    response = client.post(
+        "/api/login", json={"username": "ada", "password": "wrong"}
+    )
+    assert response.status_code == 401
+    response = client.post(
+        "/api/login", json={"username": "ada", "password": "pw"}
+    )
+    assert response.status_code == 200
+    assert client.get("/api/status").json == {
+        "logged_in": True,
+        "username": "ada",
+    }
+    assert client.get("/api/profile").json == {
+        "username": "ada",
+        "email": "ada@example.com",
+    }
+
+    assert client.post("/api/logout").status_code == 200
+    assert client.get("/api/status").json == {"logged_in": False}
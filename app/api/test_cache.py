@@ -0,0 +1,38 @@
+from app.api.cache import GameStateCache, ReplayCache
+from app.game.engine import GameState
+
+
+def test_version_mismatch_is_a_miss():
+    cache = GameStateCache()
+    state = GameState.initial_state()
+    cache.put(1, 3, state)
+    assert cache.get(1, 3) is state
+    assert cache.get(1, 4) is None
+    # the stale entry is dropped
+    assert cache.get(1, 3) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_is_evicted():
+    cache = GameStateCache(max_size=2)
+    state = GameState.initial_state()
+    cache.put(1, 1, state)
+    cache.put(2, 1, state)
+    cache.get(1, 1)
+    cache.put(3, 1, state)
+    assert len(cache) == 2
+    assert cache.get(2, 1) is None
+    assert cache.get(1, 1) is state
+    assert cache.get(3, 1) is state
+
+
+def test_replay_entries_are_keyed_by_ply():
+    cache = ReplayCache(max_size=2)
+    state = GameState.initial_state()
+    cache.put(1, 0, state)
+    cache.put(1, 1, state)
+    assert cache.get(1, 0) is state
+    assert cache.get(2, 0) is None
+    cache.put(1, 2, state)
+    assert cache.get(1, 1) is None
+    assert len(cache) == 2
@@ -0,0 +1,107 @@
+import threading
+import pytest
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+from app.api.events import (
+    BrokerFull,
+    BrokerUnavailable,
+    LocalBroker,
+    RedisBroker,
+    format_sse,
+    game_channel,
+)
+
+
+def test_publish_reaches_subscribers_of_the_channel():
+    broker = LocalBroker()
+    first = broker.subscribe(game_channel(1))
+    second = broker.subscribe(game_channel(1))
+    other = broker.subscribe(game_channel(2))
+
+    broker.publish(game_channel(1), {"version": 2})
+    assert first.get(timeout=1) == {"version": 2}
+    assert second.get(timeout=1) == {"version": 2}
+    assert other.get(timeout=0.01) is None
+
+
+def test_close_unsubscribes_and_wakes_the_reader():
+    broker = LocalBroker()
+    subscription = broker.subscribe("game:1")
+    results = []
+    reader = threading.Thread(
+        target=lambda: results.append(subscription.get(timeout=5))
+    )
+    reader.start()
+    subscription.close()
+    reader.join(timeout=5)
+    assert results == [None]
+    assert broker.subscriber_count("game:1") == 0
+
+
+def test_slow_subscriber_is_dropped():
+    broker = LocalBroker()
+    with broker.subscribe("game:1") as subscription:
+        for version in range(100):
+            broker.publish("game:1", {"version": version})
+        assert subscription.closed
+        assert broker.subscriber_count("game:1") == 0
+
+
+def test_format_sse():
+    assert format_sse("move", {"version": 3}, 3) == (
+        'id: 3\nevent: move\ndata: {"version":3}\n\n'
+    )
+
+
+def test_subscribers_past_the_cap_are_refused():
+    broker = LocalBroker(max_subscribers=2)
+    first = broker.subscribe("game:1")
+    broker.subscribe("game:2")
+    with pytest.raises(BrokerFull):
+        broker.subscribe("game:1")
+    first.close()
+    first.close()
+    broker.subscribe("game:3")
+
+
+def test_redis_broker_reaches_every_worker():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    # two web workers on one Redis server
+    first, second = (
+        RedisBroker(fakeredis.FakeRedis(server=server), max_subscribers=1)
+        for _ in range(2)
+    )
+    try:
+        here = first.subscribe(game_channel(1))
+        there = second.subscribe(game_channel(1))
+        # the cap is per worker
+        with pytest.raises(BrokerFull):
+            first.subscribe(game_channel(2))
+
+        first.publish(game_channel(1), {"version": 2})
+        assert here.get(timeout=5) == {"version": 2}
+        assert there.get(timeout=5) == {"version": 2}
+        second.publish(game_channel(2), {"version": 7})
+        second.publish(game_channel(1), {"version": 3})
+        assert there.get(timeout=5) == {"version": 3}
+        assert here.get(timeout=5) == {"version": 3}
+
+        there.close()
+        assert second.subscriber_count(game_channel(1)) == 0
+        first.publish(game_channel(1), {"version": 4})
+        assert here.get(timeout=5) == {"version": 4}
+    finally:
+        first.close()
+        second.close()
+
+
+def test_redis_broker_without_redis():
+    client = redis.Redis(port=1, retry=Retry(NoBackoff(), 0))
+    broker = RedisBroker(client, max_subscribers=4)
+    # the move is committed before it's published, so that can't fail
+    broker.publish(game_channel(1), {"version": 2})
+    with pytest.raises(BrokerUnavailable):
+        broker.subscribe(game_channel(1))
+    assert broker.subscriber_count(game_channel(1)) == 0
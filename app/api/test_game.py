@@ -0,0 +1,272 @@
+import json
+from app.api.testing import (
+    apply_changes,
+    next_event,
+    play,
+    set_position,
+    sign_in,
+)
+from app.game.engine import (
+    BitBoards,
+    GameEngine,
+    GameState,
+    decode_move,
+    encode_move,
+)
+from app.game.testing import random_game
+
+
+def test_move_ai_reply_and_abandon(app):
+    from app.api.game import game_states
+    from app.models import db
+
+    client = app.test_client()
+    sign_in(app, client, "human")
+    game_id = client.post(
+        "/api/game/create", json={"opponent": "ai", "ai_time_budget": 0.05}
+    ).json["game_id"]
+
+    events = client.get(f"/api/game/{game_id}/events", buffered=False)
+    chunks = events.response
+    event, data = next_event(chunks)
+    assert event == "state" and data["ply"] == 0
+    state = GameState(**data["game_state"])
+
+    # the human's move comes back as a delta from the version the client had
+    move = next(GameEngine.legal_moves(state))
+    response = play(client, game_id, move)
+    assert response.status_code == 200
+    delta = response.json
+    assert delta["base_version"] == data["version"]
+    assert delta["ply"] == 1 and delta["player_turn"] == 1
+    after = GameEngine.apply_move(state, move).state
+    assert apply_changes(state.boards, delta["moves"][0]["changes"]) == (
+        after.boards
+    )
+    event, data = next_event(chunks)
+    assert event == "move" and data["version"] == delta["version"]
+
+    # the AI's reply is committed and published when its job runs
+    queue = app.extensions["ai_jobs"]
+    assert queue.has_job(game_id)
+    assert queue.run_pending() == 1
+    event, reply = next_event(chunks)
+    assert event == "move"
+    assert reply["base_version"] == delta["version"]
+    assert reply["ply"] == 2 and reply["player_turn"] == 0
+    ai_move = decode_move(reply["moves"][0]["code"], after.boards)
+    expected = GameEngine.apply_move(after, ai_move).state
+    assert apply_changes(after.boards, reply["moves"][0]["changes"]) == (
+        expected.boards
+    )
+
+    # a write from another process bumps the version, so the cached state
+    # misses and the position is rebuilt from the move log
+    with app.app_context():
+        db.session.execute(
+            db.text("UPDATE game SET version = version + 1 WHERE id = :id"),
+            {"id": game_id},
+        )
+        db.session.commit()
+    misses = game_states.misses
+    response = client.get(f"/api/game/{game_id}/state")
+    assert game_states.misses == misses + 1
+    assert response.json["version"] == reply["version"] + 1
+    assert response.json["game_state"]["boards"] == expected.boards
+
+    response = client.post(f"/api/game/{game_id}/abandon")
+    assert response.status_code == 200
+    assert response.json["winner"] == 1 and response.json["moves"] == []
+    event, data = next_event(chunks)
+    assert event == "move" and data["winner"] == 1
+    assert not queue.has_job(game_id)
+    events.close()
+
+    assert play(client, game_id, move).json["error"] == "game finished"
+    assert app.extensions["events"].subscriber_count(f"game:{game_id}") == 0
+
+
+def test_create_list_and_state(app):
+    client = app.test_client()
+    assert client.post("/api/game/create", json={}).status_code == 401
+    sign_in(app, client, "black")
+
+    response = client.post(
+        "/api/game/create", json={"opponent": "ai", "ai_time_budget": 60}
+    )
+    assert response.status_code == 400
+    response = client.post("/api/game/create", json={"opponent": "ai"})
+    assert response.status_code == 201
+    ai_game = response.json["game_id"]
+    human_game = client.post("/api/game/create", json={}).json["game_id"]
+
+    games = client.get("/api/game/list").json["games"]
+    assert [game["id"] for game in games] == [human_game, ai_game]
+    assert games[1]["is_human_vs_ai"] and games[1]["ply"] == 0
+    # the moves are served by replays, not with the list
+    assert "moves" not in games[0]
+
+    response = client.get(f"/api/game/{human_game}/state")
+    assert response.json["game_state"] == {
+        "boards": GameState.initial_state().boards,
+        "player_turn": 0,
+        "winner": None,
+    }
+    assert client.get("/api/game/999/state").status_code == 404
+
+    other = app.test_client()
+    sign_in(app, other, "stranger")
+    assert client.get("/api/game/list?status=finished").json["games"] == []
+    assert other.get("/api/game/list").json["games"] == []
+    move = next(GameEngine.legal_moves(GameState.initial_state()))
+    assert play(other, ai_game, move).status_code == 403
+
+
+def stuck_after(state):
+    """
+    a move after which the opponent has stones on every board but no legal
+    move
+    """
+    for move in GameEngine.legal_moves(state):
+        after = GameEngine.apply_move(state, move).state
+        if after.winner is None and GameEngine.count_legal_moves(after) == 0:
+            return move
+    raise AssertionError("no move leaves the opponent stuck")
+
+
+# fmt: off
+# black to move, with a move that leaves white no legal move and a stone on
+# every board
+BLACK_TO_STICK = [
+    [None, None, None, None, 0, None, None, None, None, None, None, None, 0, 0, 1, None],
+    [None, None, None, None, None, 0, 0, None, None, None, None, None, 0, None, None, 1],
+    [None, None, 0, 1, None, 0, 0, 0, None, None, None, None, None, None, None, None],
+    [1, None, 0, None, None, None, None, None, None, None, None, None, None, 0, None, None],
+]
+# the same for white
+WHITE_TO_STICK = [
+    [None, None, None, None, None, None, None, 1, None, None, None, None, 0, 1, None, None],
+    [None, None, 1, 0, 1, None, None, None, None, 1, None, None, 1, None, None, None],
+    [0, None, None, None, None, None, None, None, None, None, None, None, None, None, 1, None],
+    [None, None, None, None, None, None, None, None, 1, None, None, 1, 0, None, None, None],
+]
+# fmt: on
+
+
+def test_leaving_the_opponent_without_a_move_wins(app):
+    from app.api.ai_jobs import AIJob
+    from app.api.game import commit_ai_move
+    from app.models import Game, db
+
+    client = app.test_client()
+    sign_in(app, client, "human")
+
+    # the human's move
+    game_id = client.post("/api/game/create", json={"opponent": "ai"}).json[
+        "game_id"
+    ]
+    state = GameState(boards=BLACK_TO_STICK, player_turn=0)
+    set_position(app, game_id, state)
+    response = play(client, game_id, stuck_after(state))
+    assert response.status_code == 200
+    assert response.json["winner"] == 0
+    assert not app.extensions["ai_jobs"].has_job(game_id)
+    with app.app_context():
+        game = db.session.get(Game, game_id)
+        assert game.status == "finished" and game.winner == 0
+
+    # the AI's move
+    game_id = client.post("/api/game/create", json={"opponent": "ai"}).json[
+        "game_id"
+    ]
+    state = GameState(boards=WHITE_TO_STICK, player_turn=1)
+    set_position(app, game_id, state)
+    boards = BitBoards.from_boards(state.boards)
+    with app.app_context():
+        version = db.session.get(Game, game_id).version
+        job = AIJob(game_id, version, boards.black, boards.white, 1, 0.05)
+        commit_ai_move(job, encode_move(stuck_after(state)))
+    response = client.get(f"/api/game/{game_id}/state")
+    assert response.json["ply"] == 1
+    assert response.json["game_state"]["winner"] == 1
+    response = play(client, game_id, stuck_after(state))
+    assert response.json["error"] == "game finished"
+
+
+def parse_sse(body):
+    """
+    (id, event, data) of every message in a complete SSE body
+    """
+    messages = []
+    for block in body.decode().strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        messages.append(
+            (int(fields["id"]), fields["event"], json.loads(fields["data"]))
+        )
+    return messages
+
+
+def test_replay_positions(app):
+    from app.api.game import new_game, replay_states, state_dict
+    from app.models import db
+    from app.models.game_move import SNAPSHOT_INTERVAL
+
+    clients = [app.test_client(), app.test_client()]
+    players = [
+        sign_in(app, client, name)
+        for client, name in zip(clients, ("black", "white"))
+    ]
+    with app.app_context():
+        game_id = new_game(*players).id
+    # past the first snapshot after the initial position
+    moves, states = random_game(seed=1, plies=SNAPSHOT_INTERVAL + 4)
+    assert len(moves) == SNAPSHOT_INTERVAL + 4
+    for move, state in zip(moves, states):
+        assert (
+            play(clients[state.player_turn], game_id, move).status_code == 200
+        )
+    final = len(moves)
+
+    def position(ply):
+        response = clients[0].get(f"/api/game/{game_id}/state?ply={ply}")
+        assert response.status_code == 200
+        assert response.json["ply"] == ply
+        return response.json["game_state"]
+
+    # plies on each side of the snapshot at SNAPSHOT_INTERVAL, read from the
+    # database and then from the replay cache
+    plies = (
+        0,
+        1,
+        SNAPSHOT_INTERVAL - 1,
+        SNAPSHOT_INTERVAL,
+        SNAPSHOT_INTERVAL + 1,
+    )
+    assert len(replay_states) == 0
+    for _ in range(2):
+        for ply in plies + (final,):
+            assert position(ply) == state_dict(states[ply])
+        assert len(replay_states) > 0
+    for ply in (-1, final + 1):
+        response = clients[0].get(f"/api/game/{game_id}/state?ply={ply}")
+        assert response.status_code == 400
+
+    # the stream has one position event per ply, in order, with the ply as
+    # the event id
+    first, last = SNAPSHOT_INTERVAL - 2, SNAPSHOT_INTERVAL + 2
+    response = clients[1].get(
+        f"/api/game/{game_id}/replay?from={first}&to={last}"
+    )
+    assert response.mimetype == "text/event-stream"
+    assert parse_sse(response.data) == [
+        (ply, "position", {"ply": ply, "game_state": state_dict(states[ply])})
+        for ply in range(first, last + 1)
+    ]
+    messages = parse_sse(clients[1].get(f"/api/game/{game_id}/replay").data)
+    assert [ply for ply, _, _ in messages] == list(range(final + 1))
+    response = clients[1].get(f"/api/game/{game_id}/replay?from=3&to=2")
+    assert response.status_code == 400
+
+    stranger = app.test_client()
+    sign_in(app, stranger, "stranger")
+    assert stranger.get(f"/api/game/{game_id}/replay").status_code == 403
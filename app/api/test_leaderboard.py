@@ -0,0 +1,71 @@
+from app.api.testing import play, set_position, sign_in
+from app.game.engine import GameEngine, GameState
+from app.game.rating import Rating, rate_game
+
+# fmt: off
+# black to move, and a push takes white's last stone off a board
+BLACK_TO_WIN = [
+    [None, None, None, None, None, None, None, 1, 0, 0, None, None, None, None, None, None],
+    [None, None, None, None, 1, 0, None, None, None, 0, None, None, None, None, None, None],
+    [None, None, None, None, None, None, None, None, None, None, 0, None, None, None, None, 1],
+    [None, None, 1, None, None, None, None, None, None, 0, None, None, None, None, None, None],
+]
+# fmt: on
+
+
+def test_leaderboard_after_a_win_and_an_abandon(app):
+    from app.api.game import new_game
+
+    clients = {name: app.test_client() for name in ("ada", "bob", "cy")}
+    ids = {name: sign_in(app, client, name) for name, client in clients.items()}
+    leaderboard = clients["ada"].get("/api/leaderboard").json
+    assert leaderboard["total"] == 0 and leaderboard["players"] == []
+
+    with app.app_context():
+        won = new_game(ids["ada"], ids["bob"]).id
+        abandoned = new_game(ids["cy"], ids["bob"]).id
+        unrated = new_game(ids["cy"], is_human_vs_ai=True).id
+
+    # ada beats bob on the board
+    state = GameState(boards=BLACK_TO_WIN, player_turn=0)
+    set_position(app, won, state)
+    move = next(
+        move
+        for move in GameEngine.legal_moves(state)
+        if GameEngine.apply_move(state, move).state.winner == 0
+    )
+    assert play(clients["ada"], won, move).json["winner"] == 0
+    # then cy leaves their game against bob, and one against the AI, which
+    # isn't rated
+    response = clients["cy"].post(f"/api/game/{abandoned}/abandon")
+    assert response.json["winner"] == 1
+    assert clients["cy"].post(f"/api/game/{unrated}/abandon").status_code == 200
+
+    ada, bob = rate_game(Rating(), Rating())
+    bob, cy = rate_game(bob, Rating())
+    expected = sorted(
+        [
+            ("ada", ada, 1, 1),
+            ("bob", bob, 2, 1),
+            ("cy", cy, 1, 0),
+        ],
+        key=lambda player: player[1].conservative,
+        reverse=True,
+    )
+
+    leaderboard = clients["bob"].get("/api/leaderboard").json
+    assert leaderboard["total"] == 3
+    assert leaderboard["players"] == [
+        {
+            "rank": rank,
+            "username": name,
+            "rating": round(rating.rating),
+            "deviation": round(rating.deviation),
+            "score": round(rating.conservative),
+            "games": games,
+            "wins": wins,
+        }
+        for rank, (name, rating, games, wins) in enumerate(expected, 1)
+    ]
+    assert clients["ada"].get("/api/leaderboard?page=2").json["players"] == []
+    assert clients["ada"].get("/api/leaderboard?page=0").status_code == 400
@@ -0,0 +1,129 @@
+import pytest
+from app.api.matchmaking import (
+    BUCKET_WIDTH,
+    INITIAL_WINDOW,
+    WIDEN_INTERVAL,
+    LocalMatchQueue,
+    RedisMatchQueue,
+)
+from app.api.testing import sign_in
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["local", "redis"])
+def make_queue(request):
+    """
+    builds each MatchQueue on a clock, so that both are held to the same
+    tests
+    """
+    if request.param == "local":
+        return LocalMatchQueue
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    return lambda clock: RedisMatchQueue(client, clock=clock)
+
+
+def test_pairs_the_nearest_rating(make_queue):
+    queue = make_queue(Clock())
+    assert queue.join(1, 1500) is None
+    assert queue.join(2, 1600) is None
+    assert queue.join(3, 1700) is None
+    assert queue.join(4, 1640).user_id == 2
+    assert not queue.is_waiting(2) and not queue.is_waiting(4)
+    assert queue.join(5, 1490).user_id == 1
+    # joining again keeps the place in the queue
+    assert queue.join(3, 1000) is None
+    assert queue.join(6, 1710).user_id == 3
+    assert len(queue) == 0
+
+
+def test_window_widens_while_waiting(make_queue):
+    clock = Clock()
+    queue = make_queue(clock)
+    far = (INITIAL_WINDOW + 3) * BUCKET_WIDTH
+    assert queue.join(1, 1500) is None
+    assert queue.join(2, 1500 + far) is None
+    assert queue.poll(1) is None
+
+    clock.now = 3 * WIDEN_INTERVAL
+    assert queue.poll(1).user_id == 2
+    assert len(queue) == 0
+    assert queue.poll(1) is None
+
+
+def test_leave_and_matches(make_queue):
+    queue = make_queue(Clock())
+    queue.join(1, 1500)
+    assert queue.leave(1)
+    assert not queue.leave(1)
+    assert queue.join(2, 1500) is None
+
+    queue.set_match(2, 7)
+    assert queue.take_match(2) == 7
+    assert queue.take_match(2) is None
+
+
+def test_a_tie_goes_to_the_lower_bucket(make_queue):
+    queue = make_queue(Clock())
+    assert queue.join(1, 1550) is None
+    assert queue.join(2, 1450) is None
+    # both two buckets away
+    assert queue.join(3, 1510).user_id == 2
+    assert queue.is_waiting(1) and len(queue) == 1
+
+
+def test_match_routes(app, make_queue):
+    from app.game.rating import Rating
+    from app.models import LeaderboardEntry, db
+
+    clients = {}
+    ids = {}
+    for name, rating in (("ada", 1500), ("bob", 1800), ("cy", 1520)):
+        clients[name] = app.test_client()
+        ids[name] = sign_in(app, clients[name], name)
+        with app.app_context():
+            LeaderboardEntry.for_user(ids[name]).set_rating(Rating(rating))
+            db.session.commit()
+    queue = app.extensions["matchmaking"] = make_queue(Clock())
+    assert app.test_client().post("/api/game/match").status_code == 401
+
+    response = clients["ada"].post("/api/game/match")
+    assert response.status_code == 202 and response.json["status"] == "waiting"
+    # polling or joining again never pairs a player with themselves
+    assert clients["ada"].get("/api/game/match").status_code == 202
+    assert clients["ada"].post("/api/game/match").status_code == 202
+    assert len(queue) == 1
+    assert clients["bob"].post("/api/game/match").status_code == 202
+
+    # cy is nearer ada's rating than bob's, and ada, who waited, moves first
+    response = clients["cy"].post("/api/game/match")
+    assert response.status_code == 201
+    game_id = response.json["game_id"]
+    assert response.json["player1_id"] == ids["ada"]
+    assert response.json["player2_id"] == ids["cy"]
+    response = clients["ada"].get("/api/game/match")
+    assert response.status_code == 201 and response.json["game_id"] == game_id
+    assert clients["ada"].get("/api/game/match").status_code == 404
+    state = clients["cy"].get(f"/api/game/{game_id}/state").json
+    assert state["ply"] == 0 and state["game_state"]["player_turn"] == 0
+
+    # bob gives up waiting
+    assert clients["bob"].delete("/api/game/match").status_code == 200
+    assert clients["bob"].delete("/api/game/match").status_code == 404
+    assert clients["bob"].get("/api/game/match").status_code == 404
+    assert len(queue) == 0
+
+    # a match whose game is gone is dropped
+    queue.set_match(ids["bob"], 999)
+    response = clients["bob"].get("/api/game/match")
+    assert response.status_code == 404
+    assert response.json["error"] == "matched game no longer exists"
+    response = clients["bob"].get("/api/game/match")
+    assert response.json["error"] == "not waiting for a game"
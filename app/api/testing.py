@@ -0,0 +1,66 @@
+"""
+helpers shared by the route tests. the `app` fixture is in app/conftest.py
+"""
+
+import json
+from app.api.bench import move_json
+
+
+def sign_in(app, client, username) -> int:
+    """
+    creates the user and signs `client` in as them, returning their id
+    """
+    from app.models import User, db
+
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com")
+        user.set_password(username)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return user_id
+
+
+def next_event(chunks):
+    """
+    (event, data) of the next message on a streamed SSE response
+    """
+    lines = next(chunks).decode().strip().split("\n")
+    fields = dict(line.split(": ", 1) for line in lines)
+    return fields["event"], json.loads(fields["data"])
+
+
+def apply_changes(boards, changes):
+    boards = [list(board) for board in boards]
+    for square, cell in changes:
+        boards[square >> 4][square & 15] = cell
+    return boards
+
+
+def play(client, game_id, move):
+    return client.post(f"/api/game/{game_id}/move", json=move_json(move))
+
+
+def set_position(app, game_id, state):
+    """
+    replaces the starting position of a game that has no moves yet
+    """
+    from app.game.engine import BitBoards
+    from app.models import Game, db
+    from app.models.game_move import GameSnapshot
+
+    boards = BitBoards.from_boards(state.boards)
+    with app.app_context():
+        snapshot = db.session.get(GameSnapshot, (game_id, 0))
+        fresh = GameSnapshot.from_bitboards(
+            game_id, 0, boards, state.player_turn
+        )
+        snapshot.stones = fresh.stones
+        snapshot.player_turn = fresh.player_turn
+        game = db.session.get(Game, game_id)
+        game.boards = boards.to_boards()
+        game.player_turn = state.player_turn
+        # a new version, so the cached initial state is dropped
+        db.session.commit()
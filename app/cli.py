@@ -0,0 +1,131 @@
+"""
+flask commands, eg.
+
+    flask --app wsgi create-db
+    flask --app wsgi ratings recompute --workers 8
+"""
+
+import multiprocessing
+import click
+from flask.cli import AppGroup, with_appcontext
+from app.game.rating import independent_groups, replay_ratings
+
+
+def init_migrate(app):
+    from flask_migrate import Migrate
+    from app.models import db
+
+    if "migrate" not in app.extensions:
+        Migrate(app, db)
+
+
+# flask_migrate imports alembic, which is about half of create_app()'s time,
+# so the web app doesn't load it and `flask db ...` hands its arguments to
+# Flask-Migrate's own command group once it's run
+@click.command(
+    "db",
+    context_settings={"ignore_unknown_options": True, "allow_extra_args": True},
+    add_help_option=False,
+)
+@click.pass_context
+def migrate_command(ctx):
+    """
+    database migrations, with Flask-Migrate
+    """
+    from flask import current_app
+    from flask_migrate.cli import db as migrate_group
+
+    init_migrate(current_app)
+    migrate_group.main(ctx.args, prog_name=ctx.command_path, obj=ctx.obj)
+
+
+@click.command("create-db")
+@with_appcontext
+def create_db_command():
+    """
+    creates any missing tables straight from the models and marks the
+    migrations as applied, for a new database that doesn't need the
+    migration history. existing databases are upgraded with flask db upgrade
+    """
+    from flask import current_app
+    from flask_migrate import stamp
+    from app.models import db
+
+    init_migrate(current_app)
+    db.create_all()
+    stamp()
+    click.echo("created the database")
+
+
+ratings_cli = AppGroup("ratings", help="player ratings and the leaderboard")
+
+
+@ratings_cli.command("recompute")
+@click.option("--workers", default=multiprocessing.cpu_count(), type=int)
+@click.option(
+    "--write", is_flag=True, help="replace the leaderboard with the result"
+)
+def recompute_ratings(workers, write):
+    """
+    replays every rated game in the order they finished and compares the
+    ratings with the leaderboard. players who never played each other's
+    groups don't affect each other, so groups replay in parallel
+    """
+    from app.models import db, Game, LeaderboardEntry
+
+    rows = db.session.execute(
+        db.select(Game.player1_id, Game.player2_id, Game.winner)
+        .where(
+            Game.is_human_vs_ai.is_(False),
+            Game.player2_id.is_not(None),
+            Game.winner.is_not(None),
+            Game.finished_at.is_not(None),
+        )
+        .order_by(Game.finished_at, Game.id)
+    )
+    results = []
+    for player1_id, player2_id, winner in rows:
+        players = (player1_id, player2_id)
+        results.append((players[winner], players[1 - winner]))
+    groups = independent_groups(results)
+
+    table = {}
+    if workers > 1 and len(groups) > 1:
+        with multiprocessing.Pool(workers) as pool:
+            for group_table in pool.imap_unordered(
+                replay_ratings, groups, chunksize=16
+            ):
+                table.update(group_table)
+    else:
+        for group in groups:
+            table.update(replay_ratings(group))
+
+    entries = {
+        entry.user_id: entry
+        for entry in db.session.scalars(db.select(LeaderboardEntry))
+    }
+    mismatched = [
+        user_id
+        for user_id in set(table) | set(entries)
+        if user_id not in table
+        or user_id not in entries
+        or abs(table[user_id][0].rating - entries[user_id].rating) > 1e-6
+        or table[user_id][1:] != (entries[user_id].games, entries[user_id].wins)
+    ]
+    click.echo(
+        f"{len(results)} rated games, {len(groups)} groups, "
+        f"{len(table)} players, {len(mismatched)} differ from the leaderboard"
+    )
+
+    if write and mismatched:
+        for user_id in mismatched:
+            if user_id not in table:
+                db.session.delete(entries[user_id])
+                continue
+            entry = entries.get(user_id) or LeaderboardEntry.for_user(user_id)
+            rating, games, wins = table[user_id]
+            entry.set_rating(rating)
+            entry.games = games
+            entry.wins = wins
+        db.session.commit()
+        click.echo(f"rewrote {len(mismatched)} leaderboard entries")
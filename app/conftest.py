@@ -0,0 +1,50 @@
+import importlib.util
+import os
+import sys
+import pytest
+
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    the web app on a fresh SQLite file, with AI jobs run on the test's
+    thread by LocalJobQueue.run_pending()
+    """
+    try:
+        import config  # noqa: F401
+    except ImportError:
+        # a checkout without a config.py runs on the example settings
+        root = os.path.dirname(os.path.dirname(__file__))
+        spec = importlib.util.spec_from_file_location(
+            "config", os.path.join(root, "config.example.py")
+        )
+        config = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(config)
+        sys.modules["config"] = config
+
+    from app import create_app
+    from app.api.ai_jobs import LocalJobQueue
+    from app.api.game import commit_ai_move, game_states, replay_states
+    from app.models import db
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        }
+    )
+
+    def handle_ai_result(job, code):
+        with app.app_context():
+            commit_ai_move(job, code)
+
+    app.extensions["ai_jobs"].close()
+    app.extensions["ai_jobs"] = LocalJobQueue(handle_ai_result)
+    with app.app_context():
+        db.create_all()
+    yield app
+    # game ids start again in the next test's database
+    game_states.clear()
+    replay_states.clear()
+    with app.app_context():
+        db.engine.dispose()
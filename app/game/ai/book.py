@@ -0,0 +1,324 @@
+"""
+opening book: move statistics for early positions, built offline from game
+records and looked up by the AIs before they search.
+
+positions are keyed by the zobrist hash of their canonical form (see
+app.game.symmetry), so all 32 symmetric variations share one entry, and
+moves are stored as 16 bit codes in the canonical frame. the file is a
+header followed by fixed size entries sorted by (key, move code), so
+lookups binary search a memory-mapped file without loading it:
+
+    header  b"SHBK", uint8 version, 3 reserved bytes, uint32 entry count
+    entry   uint64 key, uint16 move code, uint16 reserved, uint32 visits,
+            uint32 points (2 per win and 1 per draw for the side to move)
+
+    python -m app.game.ai.book --selfplay records.jsonl --records games.bin \\
+        --database --plies 12 --output book.bin
+"""
+
+import argparse
+import json
+import math
+import mmap
+import struct
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    cast,
+)
+from app.game.engine import (
+    BitBoards,
+    GameEngine,
+    GameState,
+    Move,
+    decode_move,
+    encode_move,
+    split_move_code,
+    zobrist_hash,
+)
+from app.game.record import open_records
+from app.game.symmetry import (
+    Transform,
+    canonical_bitboards,
+    transform_bitboards,
+    transform_move,
+    untransform_move,
+)
+from app.game.types import PlayerNumberType
+
+MAGIC = b"SHBK"
+VERSION = 1
+HEADER = struct.Struct("<4sB3xI")
+ENTRY = struct.Struct("<QH2xII")
+
+# only the first this many plies of each game go into the book
+DEFAULT_BOOK_PLIES = 12
+
+
+class BookEntry(NamedTuple):
+    # in the canonical frame
+    code: int
+    visits: int
+    points: int
+
+    @property
+    def average_result(self) -> float:
+        """
+        1 for always winning, 0.5 for even, 0 for always losing
+        """
+        return self.points / (2 * self.visits)
+
+
+def book_key(state: GameState) -> Tuple[int, Transform]:
+    boards = state.boards
+    if not isinstance(boards, BitBoards):
+        boards = BitBoards.from_boards(boards)
+    canonical, transform = canonical_bitboards(boards, state.player_turn)
+    return zobrist_hash(canonical, 0), transform
+
+
+class OpeningBook:
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("not an opening book")
+        if version != VERSION:
+            raise ValueError(f"unsupported opening book version {version}")
+        if HEADER.size + (count * ENTRY.size) > len(buffer):
+            raise ValueError("truncated opening book")
+        self._count = count
+
+    @classmethod
+    def open(cls, path: str) -> "OpeningBook":
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped)
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key_at(self, index: int) -> int:
+        return struct.unpack_from(
+            "<Q", self._buffer, HEADER.size + (index * ENTRY.size)
+        )[0]
+
+    def lookup(self, key: int) -> List[BookEntry]:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        for index in range(low, self._count):
+            entry_key, code, visits, points = ENTRY.unpack_from(
+                self._buffer, HEADER.size + (index * ENTRY.size)
+            )
+            if entry_key != key:
+                break
+            entries.append(BookEntry(code, visits, points))
+        return entries
+
+    def moves(self, state: GameState) -> List[Tuple[Move, BookEntry]]:
+        """
+        the book's moves for `state`, mapped back from the canonical frame.
+        moves that aren't legal here (a key collision) are left out
+        """
+        key, transform = book_key(state)
+        entries = self.lookup(key)
+        if not entries:
+            return []
+        boards = state.boards
+        if not isinstance(boards, BitBoards):
+            boards = BitBoards.from_boards(boards)
+        canonical = transform_bitboards(boards, transform)
+        legal = set(GameEngine._generate_moves(boards, state.player_turn))
+
+        moves = []
+        for entry in entries:
+            try:
+                canonical_move = decode_move(entry.code, canonical)
+            except ValueError:
+                continue
+            move = untransform_move(canonical_move, transform)
+            if split_move_code(encode_move(move)) in legal:
+                moves.append((move, entry))
+        return moves
+
+    def choose(self, state: GameState, min_visits: int = 4) -> Optional[Move]:
+        """
+        the book move with the best lower bound on its average result, among
+        moves played at least `min_visits` times
+        """
+        best = None
+        best_score = -math.inf
+        for move, entry in self.moves(state):
+            if entry.visits < min_visits:
+                continue
+            score = entry.average_result - (1 / math.sqrt(entry.visits))
+            if score > best_score:
+                best_score = score
+                best = move
+        return best
+
+
+def _canonical_move(
+    boards: BitBoards, player: PlayerNumberType, move: Move
+) -> Tuple[BitBoards, int]:
+    """
+    the canonical position and the move's code in it. when several
+    transforms reach the canonical position (it has symmetries of its own),
+    equivalent moves are merged under the smallest code
+    """
+    canonical, _ = canonical_bitboards(boards, player)
+    swap_colors = player == 1
+    code = None
+    for swap_shades in (False, True):
+        for geometry in range(8):
+            transform = Transform(swap_colors, swap_shades, geometry)
+            if transform_bitboards(boards, transform) == canonical:
+                candidate = encode_move(transform_move(move, transform))
+                if code is None or candidate < code:
+                    code = candidate
+    return canonical, cast(int, code)
+
+
+class BookBuilder:
+    def __init__(self, max_plies: int = DEFAULT_BOOK_PLIES):
+        self.max_plies = max_plies
+        self.games = 0
+        # (key, canonical move code) -> [visits, points]
+        self.stats: Dict[Tuple[int, int], List[int]] = {}
+
+    def add_game(
+        self, codes: Iterable[int], winner: Optional[PlayerNumberType]
+    ):
+        """
+        adds the opening of a game from the initial position, given as move
+        codes. games without a winner count as draws
+        """
+        self.games += 1
+        state = GameState.initial_state()
+        boards = BitBoards.from_boards(state.boards)
+        player = state.player_turn
+        for ply, code in enumerate(codes):
+            if ply >= self.max_plies:
+                break
+            canonical, canonical_code = _canonical_move(
+                boards, player, decode_move(code, boards)
+            )
+            stats = self.stats.setdefault(
+                (zobrist_hash(canonical, 0), canonical_code), [0, 0]
+            )
+            stats[0] += 1
+            if winner is None:
+                stats[1] += 1
+            elif winner == player:
+                stats[1] += 2
+
+            boards, won = GameEngine._apply_generated_move(
+                boards, player, *split_move_code(code)
+            )
+            if won:
+                break
+            player = 1 if player == 0 else 0
+
+    def pack(self) -> bytes:
+        chunks = [HEADER.pack(MAGIC, VERSION, len(self.stats))]
+        for (key, code), (visits, points) in sorted(self.stats.items()):
+            chunks.append(ENTRY.pack(key, code, visits, points))
+        return b"".join(chunks)
+
+    def write(self, path: str):
+        with open(path, "wb") as file:
+            file.write(self.pack())
+
+
+def selfplay_games(path: str) -> Iterator[Tuple[List[int], Optional[int]]]:
+    """
+    games from app.game.selfplay's JSON lines output
+    """
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield record["codes"], record["winner"]
+
+
+def record_games(path: str) -> Iterator[Tuple[List[int], Optional[int]]]:
+    """
+    games from a binary game record file (see app.game.record)
+    """
+    with open_records(path) as records:
+        for record in records:
+            yield record.moves.tolist(), record.winner
+
+
+def database_games() -> Iterator[Tuple[List[int], Optional[int]]]:
+    """
+    finished games from the app's database, through the game_move log
+    """
+    from app import create_app
+    from app.models import db, Game, GameMove
+
+    app = create_app()
+    with app.app_context():
+        games = db.session.scalars(
+            db.select(Game).where(Game.winner.is_not(None), Game.ply > 0)
+        )
+        for game in games:
+            moves = db.session.scalars(
+                db.select(GameMove)
+                .where(GameMove.game_id == game.id)
+                .order_by(GameMove.ply)
+            )
+            yield [
+                (passive << 10) | (active << 4) | direction
+                for passive, active, direction in (
+                    move.raw_move() for move in moves
+                )
+            ], game.winner
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="build a shobu opening book")
+    parser.add_argument("--selfplay", action="append", default=[])
+    parser.add_argument("--records", action="append", default=[])
+    parser.add_argument(
+        "--database", action="store_true", help="include finished games"
+    )
+    parser.add_argument("--plies", type=int, default=DEFAULT_BOOK_PLIES)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args(argv)
+
+    builder = BookBuilder(args.plies)
+    sources: List[Iterable[Tuple[List[int], Optional[int]]]] = []
+    sources.extend(selfplay_games(path) for path in args.selfplay)
+    sources.extend(record_games(path) for path in args.records)
+    if args.database:
+        sources.append(database_games())
+    for games in sources:
+        for codes, winner in games:
+            builder.add_game(codes, winner)
+
+    builder.write(args.output)
+    print(
+        f"{builder.games} games, {len(builder.stats)} book entries "
+        f"-> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+static evaluation for the search AIs. the features are sums and minimums of
+per-board terms, and a move changes only its passive and active boards, so
+Evaluator keeps the per-board terms and updates the two changed boards as
+moves are made and undone instead of rescoring the whole position. per-board
+terms are cached by the board's stones.
+
+features, from the point of view of the side to move:
+
+    material         own stones - opponent stones, over all boards
+    min_stones       fewest own stones on a board - fewest opponent stones
+                     on a board (a board with none loses the game)
+    mobility         own active moves - opponent active moves, counting
+                     (stone, direction) pairs on each board
+    threats_made     opponent stones the side to move can push
+    threats_faced    own stones the opponent can push
+    push_offs_made   opponent stones the side to move can push off a board
+    push_offs_faced  own stones the opponent can push off a board
+
+the score is the weighted sum of the features, with weights fitted by
+app.game.ai.tune so that a score of EVAL_SCALE is about 1 in logistic odds
+of winning.
+"""
+
+import json
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from app.game.engine import BOARD_MASK, BitBoards
+from app.game.tablebase import LOCAL_RAYS
+from app.game.types import PlayerNumberType
+
+EVAL_SCALE = 100
+
+FEATURES = (
+    "material",
+    "min_stones",
+    "mobility",
+    "threats_made",
+    "threats_faced",
+    "push_offs_made",
+    "push_offs_faced",
+)
+
+
+class Weights(NamedTuple):
+    material: int = 10
+    min_stones: int = 100
+    mobility: int = 1
+    threats_made: int = 4
+    threats_faced: int = -6
+    push_offs_made: int = 15
+    push_offs_faced: int = -25
+
+
+DEFAULT_WEIGHTS = Weights()
+
+
+def load_weights(path: str) -> Weights:
+    with open(path) as file:
+        return Weights(**json.load(file))
+
+
+def save_weights(weights: Weights, path: str):
+    with open(path, "w") as file:
+        json.dump(weights._asdict(), file, indent=2)
+
+
+# indexes into the per-board terms
+BLACK_STONES = 0
+WHITE_STONES = 1
+BLACK_MOBILITY = 2
+WHITE_MOBILITY = 3
+# white stones black can push, and the other way around
+WHITE_THREATENED = 4
+BLACK_THREATENED = 5
+WHITE_PUSH_OFFS = 6
+BLACK_PUSH_OFFS = 7
+
+BoardTerms = Tuple[int, int, int, int, int, int, int, int]
+
+
+def _side_terms(own: int, opponent: int) -> Tuple[int, int, int]:
+    # (active moves, opponent stones pushable, opponent stones pushable off)
+    occupied = own | opponent
+    mobility = 0
+    threatened = 0
+    push_offs = 0
+    stones = own
+    while stones:
+        bit = stones & -stones
+        stones ^= bit
+        for _, path, push in LOCAL_RAYS[bit.bit_length() - 1]:
+            if path & own:
+                continue
+            blocked = path & opponent
+            if not blocked:
+                mobility += 1
+            elif not (blocked & (blocked - 1)) and not (push & occupied):
+                mobility += 1
+                threatened |= blocked
+                if not push:
+                    push_offs |= blocked
+    return mobility, threatened.bit_count(), push_offs.bit_count()
+
+
+@lru_cache(maxsize=1 << 18)
+def board_terms(black: int, white: int) -> BoardTerms:
+    """
+    per-board terms for one board's 16 bit black and white stones
+    """
+    black_mobility, white_threatened, white_push_offs = _side_terms(
+        black, white
+    )
+    white_mobility, black_threatened, black_push_offs = _side_terms(
+        white, black
+    )
+    return (
+        black.bit_count(),
+        white.bit_count(),
+        black_mobility,
+        white_mobility,
+        white_threatened,
+        black_threatened,
+        white_push_offs,
+        black_push_offs,
+    )
+
+
+class Evaluator:
+    def __init__(self, weights: Weights = DEFAULT_WEIGHTS):
+        self.weights = weights
+        self._boards: List[BoardTerms] = []
+        self._totals: List[int] = [0] * 8
+        # passive board, its terms, active board, its terms from before each
+        # made move, flat so that making a move doesn't build a tuple
+        self._undo: list = []
+
+    def reset(self, boards: BitBoards) -> "Evaluator":
+        self._boards = [
+            board_terms(
+                (boards.black >> (board * 16)) & BOARD_MASK,
+                (boards.white >> (board * 16)) & BOARD_MASK,
+            )
+            for board in range(4)
+        ]
+        self._totals = [sum(column) for column in zip(*self._boards)]
+        self._undo = []
+        return self
+
+    def push(
+        self, boards: Sequence[int], passive_board: int, active_board: int
+    ):
+        """
+        updates the passive and active boards' terms for the position after
+        a move, given as BitBoards or SearchPosition.stones
+        """
+        terms = self._boards
+        passive_old = terms[passive_board]
+        active_old = terms[active_board]
+        shift = passive_board * 16
+        passive_new = board_terms(
+            (boards[0] >> shift) & BOARD_MASK, (boards[1] >> shift) & BOARD_MASK
+        )
+        shift = active_board * 16
+        active_new = board_terms(
+            (boards[0] >> shift) & BOARD_MASK, (boards[1] >> shift) & BOARD_MASK
+        )
+        undo = self._undo
+        undo.append(passive_board)
+        undo.append(passive_old)
+        undo.append(active_board)
+        undo.append(active_old)
+        terms[passive_board] = passive_new
+        terms[active_board] = active_new
+        totals = self._totals
+        for index in range(8):
+            totals[index] += (
+                passive_new[index]
+                - passive_old[index]
+                + active_new[index]
+                - active_old[index]
+            )
+
+    def pop(self):
+        undo = self._undo
+        active_old = undo.pop()
+        active_board = undo.pop()
+        passive_old = undo.pop()
+        passive_board = undo.pop()
+        terms = self._boards
+        passive_new = terms[passive_board]
+        active_new = terms[active_board]
+        totals = self._totals
+        for index in range(8):
+            totals[index] += (
+                passive_old[index]
+                - passive_new[index]
+                + active_old[index]
+                - active_new[index]
+            )
+        terms[passive_board] = passive_old
+        terms[active_board] = active_old
+
+    def features(self, player: PlayerNumberType) -> Tuple[int, ...]:
+        totals = self._totals
+        black_min = min(terms[BLACK_STONES] for terms in self._boards)
+        white_min = min(terms[WHITE_STONES] for terms in self._boards)
+        if player == 0:
+            return (
+                totals[BLACK_STONES] - totals[WHITE_STONES],
+                black_min - white_min,
+                totals[BLACK_MOBILITY] - totals[WHITE_MOBILITY],
+                totals[WHITE_THREATENED],
+                totals[BLACK_THREATENED],
+                totals[WHITE_PUSH_OFFS],
+                totals[BLACK_PUSH_OFFS],
+            )
+        return (
+            totals[WHITE_STONES] - totals[BLACK_STONES],
+            white_min - black_min,
+            totals[WHITE_MOBILITY] - totals[BLACK_MOBILITY],
+            totals[BLACK_THREATENED],
+            totals[WHITE_THREATENED],
+            totals[BLACK_PUSH_OFFS],
+            totals[WHITE_PUSH_OFFS],
+        )
+
+    def score(self, player: PlayerNumberType) -> int:
+        """
+        score from `player`'s point of view, `player` to move. the same sum
+        as the weights times features(), without building the features
+        """
+        totals = self._totals
+        weights = self.weights
+        boards = self._boards
+        # black's point of view first
+        material = totals[BLACK_STONES] - totals[WHITE_STONES]
+        min_stones = min(
+            boards[0][BLACK_STONES],
+            boards[1][BLACK_STONES],
+            boards[2][BLACK_STONES],
+            boards[3][BLACK_STONES],
+        ) - min(
+            boards[0][WHITE_STONES],
+            boards[1][WHITE_STONES],
+            boards[2][WHITE_STONES],
+            boards[3][WHITE_STONES],
+        )
+        mobility = totals[BLACK_MOBILITY] - totals[WHITE_MOBILITY]
+        if player == 0:
+            made, faced = WHITE_THREATENED, BLACK_THREATENED
+            offs_made, offs_faced = WHITE_PUSH_OFFS, BLACK_PUSH_OFFS
+        else:
+            material = -material
+            min_stones = -min_stones
+            mobility = -mobility
+            made, faced = BLACK_THREATENED, WHITE_THREATENED
+            offs_made, offs_faced = BLACK_PUSH_OFFS, WHITE_PUSH_OFFS
+        return (
+            weights.material * material
+            + weights.min_stones * min_stones
+            + weights.mobility * mobility
+            + weights.threats_made * totals[made]
+            + weights.threats_faced * totals[faced]
+            + weights.push_offs_made * totals[offs_made]
+            + weights.push_offs_faced * totals[offs_faced]
+        )
+
+
+def evaluate(
+    boards: BitBoards,
+    player: PlayerNumberType,
+    weights: Optional[Weights] = None,
+) -> int:
+    """
+    scores a single position from scratch
+    """
+    return Evaluator(weights or DEFAULT_WEIGHTS).reset(boards).score(player)
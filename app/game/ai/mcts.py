@@ -0,0 +1,339 @@
+import math
+import multiprocessing
+import random
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, cast
+from app.game.engine import (
+    ACTIVE_BOARDS,
+    HOME_BOARDS,
+    BitBoards,
+    GameEngine,
+    GameState,
+    Move,
+    RawMove,
+)
+from app.game.ai.book import OpeningBook
+from app.game.types import PlayerNumberType
+
+# (black stones, white stones, player to move, seed, ply limit)
+PlayoutJob = Tuple[int, int, PlayerNumberType, int, int]
+
+
+@dataclass(frozen=True)
+class MCTSStats:
+    playouts: int
+    seconds: float
+    playouts_per_second: float
+    playouts_per_second_per_core: float
+    workers: int
+    reused_visits: int
+
+
+def _random_move(
+    boards: BitBoards, player: PlayerNumberType, rng: random.Random
+) -> Optional[RawMove]:
+    """
+    picks a random direction first and then a random move in it. cheaper
+    than listing every legal move, at the cost of not being uniform
+    """
+    indexes = list(range(16))
+    rng.shuffle(indexes)
+    for index in indexes:
+        passives, actives = GameEngine._move_candidates(boards, player, index)
+        options = [
+            (passive_board, active_board)
+            for passive_board in HOME_BOARDS[player]
+            if passives[passive_board]
+            for active_board in ACTIVE_BOARDS[passive_board]
+            if actives[active_board]
+        ]
+        if options:
+            passive_board, active_board = rng.choice(options)
+            return (
+                rng.choice(passives[passive_board]),
+                rng.choice(actives[active_board]),
+                index,
+            )
+    return None
+
+
+def _playout(job: PlayoutJob) -> Optional[PlayerNumberType]:
+    """
+    plays random moves until someone wins, returning the winner, or None if
+    the ply limit is reached first. a player with no legal moves loses.
+    top level so it can run in a worker process
+    """
+    black, white, player, seed, max_plies = job
+    rng = random.Random(seed)
+    boards = BitBoards(black, white)
+    for _ in range(max_plies):
+        move = _random_move(boards, player, rng)
+        if move is None:
+            return 1 if player == 0 else 0
+        boards, won = GameEngine._apply_generated_move(boards, player, *move)
+        if won:
+            return player
+        player = 1 if player == 0 else 0
+    return None
+
+
+class Node:
+    __slots__ = (
+        "boards",
+        "player",
+        "key",
+        "move",
+        "parent",
+        "children",
+        "untried",
+        "visits",
+        "value",
+        "winner",
+    )
+
+    def __init__(
+        self,
+        boards: BitBoards,
+        player: PlayerNumberType,
+        key: int,
+        move: Optional[RawMove] = None,
+        parent: Optional["Node"] = None,
+        winner: Optional[PlayerNumberType] = None,
+    ):
+        self.boards = boards
+        self.player = player
+        self.key = key
+        self.move = move
+        self.parent = parent
+        self.children: List["Node"] = []
+        self.untried: Optional[List[RawMove]] = None
+        self.visits = 0
+        # total reward for the player who moved into this node
+        self.value = 0.0
+        self.winner = winner
+
+    def expand_moves(self, rng: random.Random) -> List[RawMove]:
+        if self.untried is None:
+            self.untried = list(
+                GameEngine._generate_moves(self.boards, self.player)
+            )
+            rng.shuffle(self.untried)
+            if not self.untried and not self.children:
+                # a player with no legal moves loses
+                self.winner = 1 if self.player == 0 else 0
+        return self.untried
+
+
+class MCTSAI:
+    """
+    UCT search with random playouts. playouts for a batch of leaves run on a
+    multiprocessing pool when workers > 1, with virtual loss keeping the
+    batch's selections apart. the tree is kept between moves and reused when
+    the next position is a known grandchild of the root. positions in the
+    opening book are played from the book without searching.
+    """
+
+    def __init__(
+        self,
+        exploration: float = 1.4,
+        time_budget: Optional[float] = 1.0,
+        playout_budget: Optional[int] = None,
+        workers: int = 1,
+        batch_size: Optional[int] = None,
+        max_playout_plies: int = 200,
+        reuse_tree: bool = True,
+        seed: Optional[int] = None,
+        book: Optional[OpeningBook] = None,
+    ):
+        if time_budget is None and playout_budget is None:
+            raise ValueError("set a time_budget, a playout_budget, or both")
+        self.exploration = exploration
+        self.time_budget = time_budget
+        self.playout_budget = playout_budget
+        self.workers = workers
+        self.batch_size = batch_size or max(1, workers * 4)
+        self.max_playout_plies = max_playout_plies
+        self.reuse_tree = reuse_tree
+        self.rng = random.Random(seed)
+        self.book = book
+        self.last_stats: Optional[MCTSStats] = None
+        self._root: Optional[Node] = None
+        self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def generate_move(self, state: GameState) -> Optional[Move]:
+        if state.winner is not None:
+            return None
+        if self.book is not None:
+            book_move = self.book.choose(state)
+            if book_move is not None:
+                self._root = None
+                return book_move
+        boards = state.boards
+        if not isinstance(boards, BitBoards):
+            boards = BitBoards.from_boards(boards)
+        key = cast(int, state.key)
+
+        root = self._find_reusable_root(key)
+        if root is None:
+            root = Node(boards, state.player_turn, key)
+        root.parent = None
+        reused_visits = root.visits
+
+        if not root.expand_moves(self.rng) and not root.children:
+            self._root = None
+            return None
+
+        start = time.perf_counter()
+        deadline = None
+        if self.time_budget is not None:
+            deadline = start + self.time_budget
+        playouts = 0
+
+        while True:
+            if self.playout_budget is not None:
+                remaining = self.playout_budget - playouts
+                if remaining <= 0:
+                    break
+            else:
+                remaining = self.batch_size
+            if (
+                deadline is not None
+                and playouts
+                and time.perf_counter() >= deadline
+            ):
+                break
+            playouts += self._run_batch(root, min(self.batch_size, remaining))
+
+        elapsed = time.perf_counter() - start
+        per_second = playouts / elapsed if elapsed else 0.0
+        self.last_stats = MCTSStats(
+            playouts=playouts,
+            seconds=elapsed,
+            playouts_per_second=per_second,
+            playouts_per_second_per_core=per_second / self.workers,
+            workers=self.workers,
+            reused_visits=reused_visits,
+        )
+
+        best = max(root.children, key=lambda child: child.visits)
+        self._root = best if self.reuse_tree else None
+        return GameEngine._generated_move(
+            root.boards, root.player, *cast(RawMove, best.move)
+        )
+
+    def _find_reusable_root(self, key: int) -> Optional[Node]:
+        # the stored root is the position after our last move, so the new
+        # position is one of its children
+        previous = self._root
+        if previous is None:
+            return None
+        if previous.key == key:
+            return previous
+        for child in previous.children:
+            if child.key == key:
+                return child
+        return None
+
+    def _run_batch(self, root: Node, size: int) -> int:
+        leaves: List[Node] = []
+        jobs: List[PlayoutJob] = []
+        for _ in range(size):
+            leaf = self._select_and_expand(root)
+            leaves.append(leaf)
+            if leaf.winner is None:
+                jobs.append(
+                    (
+                        leaf.boards.black,
+                        leaf.boards.white,
+                        leaf.player,
+                        self.rng.getrandbits(32),
+                        self.max_playout_plies,
+                    )
+                )
+
+        results = iter(self._run_playouts(jobs))
+        for leaf in leaves:
+            winner = leaf.winner if leaf.winner is not None else next(results)
+            self._backpropagate(leaf, winner)
+        return len(leaves)
+
+    def _run_playouts(
+        self, jobs: List[PlayoutJob]
+    ) -> List[Optional[PlayerNumberType]]:
+        if self.workers <= 1 or len(jobs) <= 1:
+            return [_playout(job) for job in jobs]
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+        return self._pool.map(_playout, jobs)
+
+    def _select_and_expand(self, root: Node) -> Node:
+        node = root
+        # virtual loss: count the visit now and add its reward once the
+        # playout is back, so the rest of the batch looks elsewhere
+        node.visits += 1
+        while node.winner is None:
+            untried = node.expand_moves(self.rng)
+            if node.winner is not None:
+                break
+            if untried:
+                move = untried.pop()
+                boards, won = GameEngine._apply_generated_move(
+                    node.boards, node.player, *move
+                )
+                key = GameEngine._generated_move_key(
+                    node.key, node.boards, node.player, *move
+                )
+                child = Node(
+                    boards,
+                    1 if node.player == 0 else 0,
+                    key,
+                    move=move,
+                    parent=node,
+                    winner=node.player if won else None,
+                )
+                node.children.append(child)
+                child.visits += 1
+                return child
+            node = self._best_child(node)
+            node.visits += 1
+        return node
+
+    def _best_child(self, node: Node) -> Node:
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        best = None
+        best_score = -math.inf
+        for child in node.children:
+            score = (child.value / child.visits) + exploration * math.sqrt(
+                log_visits / child.visits
+            )
+            if score > best_score:
+                best_score = score
+                best = child
+        return cast(Node, best)
+
+    def _backpropagate(
+        self, leaf: Node, winner: Optional[PlayerNumberType]
+    ) -> None:
+        node: Optional[Node] = leaf
+        while node is not None:
+            if node.parent is not None:
+                mover = node.parent.player
+                if winner is None:
+                    node.value += 0.5
+                elif winner == mover:
+                    node.value += 1.0
+            node = node.parent
@@ -0,0 +1,275 @@
+import time
+from typing import Dict, List, Optional, Tuple
+from app.game.engine import (
+    BitBoards,
+    GameEngine,
+    GameState,
+    Move,
+    RawMove,
+    RAY_MASKS,
+)
+from app.game.ai.book import OpeningBook
+from app.game.ai.evaluation import DEFAULT_WEIGHTS, Evaluator, Weights
+from app.game.position import SearchPosition
+from app.game.tablebase import Tablebase
+
+WIN_SCORE = 1_000_000
+# scores above this are wins found at a known distance from the root
+WIN_THRESHOLD = WIN_SCORE - 1000
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    """
+    fixed number of slots indexed by the low bits of the zobrist key. a slot
+    is overwritten by a search at least as deep, or by any entry once the
+    stored one is left over from an earlier move's search
+    """
+
+    def __init__(self, size_bits: int = 18):
+        self.mask = (1 << size_bits) - 1
+        self.slots: List[Optional[tuple]] = [None] * (1 << size_bits)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, key: int) -> Optional[tuple]:
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(
+        self,
+        key: int,
+        depth: int,
+        score: int,
+        flag: int,
+        move: Optional[RawMove],
+    ):
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, score, flag, move, self.generation)
+
+
+class SearchAI:
+    """
+    negamax alpha-beta with iterative deepening under a wall clock budget,
+    a transposition table, and move ordering by transposition table move,
+    pushes (stones pushed off the board first), killer moves and history.
+    positions in the opening book are played from the book without searching,
+    and leaves with few stones on a board are scored with the tablebase.
+    leaves are scored by an Evaluator kept in step with the search, see
+    app.game.ai.evaluation
+    """
+
+    def __init__(
+        self,
+        time_budget: float = 1.0,
+        max_depth: int = 32,
+        table_size_bits: int = 18,
+        book: Optional[OpeningBook] = None,
+        tablebase: Optional[Tablebase] = None,
+        weights: Weights = DEFAULT_WEIGHTS,
+    ):
+        self.time_budget = time_budget
+        self.book = book
+        self.tablebase = tablebase
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_size_bits)
+        self.evaluator = Evaluator(weights)
+        self.position = SearchPosition(BitBoards(0, 0), 0)
+        self.nodes = 0
+        self.depth_reached = 0
+        self._deadline = 0.0
+        self._killers: List[List[Optional[RawMove]]] = []
+        self._history: Dict[RawMove, int] = {}
+
+    def generate_move(self, state: GameState) -> Optional[Move]:
+        if state.winner is not None:
+            return None
+        boards = state.boards
+        if not isinstance(boards, BitBoards):
+            boards = BitBoards.from_boards(boards)
+        player = state.player_turn
+
+        if self.book is not None:
+            book_move = self.book.choose(state)
+            if book_move is not None:
+                return book_move
+
+        moves = list(GameEngine._generate_moves(boards, player))
+        if not moves:
+            return None
+
+        self.table.new_search()
+        self.nodes = 0
+        self.depth_reached = 0
+        self._killers = [[None, None] for _ in range(self.max_depth + 1)]
+        self._history = {}
+        # a timeout unwinds the search without unmaking its moves, so both
+        # are set up again for every search
+        self.position = SearchPosition(boards, player, state.key)
+        self.evaluator.reset(boards)
+        self._deadline = time.perf_counter() + self.time_budget
+
+        best_move = moves[0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, move = self._search_root(depth)
+            except SearchTimeout:
+                break
+            if move is not None:
+                best_move = move
+            self.depth_reached = depth
+            if abs(score) >= WIN_THRESHOLD:
+                break
+
+        return GameEngine._generated_move(boards, player, *best_move)
+
+    def _search_root(self, depth: int) -> Tuple[int, Optional[RawMove]]:
+        alpha = -WIN_SCORE - 1
+        beta = WIN_SCORE + 1
+        best_move = None
+        key = self.position.key
+        for move in self._ordered_moves(key, 0):
+            score = -self._negamax_child(move, depth, 1, -beta, -alpha)
+            if score > alpha:
+                alpha = score
+                best_move = move
+        if best_move is not None:
+            self.table.store(key, depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax_child(
+        self, move: RawMove, depth: int, ply: int, alpha: int, beta: int
+    ) -> int:
+        position = self.position
+        undo = position.make(*move)
+        if position.won:
+            position.unmake(undo)
+            # score from the child's point of view: the side to move lost
+            return -(WIN_SCORE - ply)
+        evaluator = self.evaluator
+        # a move only changes its passive and active boards
+        evaluator.push(position.stones, move[0] >> 4, move[1] >> 4)
+        score = self._negamax(depth - 1, ply, alpha, beta)
+        evaluator.pop()
+        position.unmake(undo)
+        return score
+
+    def _negamax(self, depth: int, ply: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if not (self.nodes & 1023) and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+        position = self.position
+        if depth <= 0:
+            score = self.evaluator.score(position.player)
+            if self.tablebase is not None:
+                score += self.tablebase.evaluate(
+                    position.stones, position.player
+                )
+            return score
+
+        key = position.key
+        original_alpha = alpha
+        entry = self.table.get(key)
+        if entry is not None and entry[1] >= depth:
+            score = _score_from_table(entry[2], ply)
+            flag = entry[3]
+            if flag == EXACT:
+                return score
+            if flag == LOWER_BOUND and score >= beta:
+                return score
+            if flag == UPPER_BOUND and score <= alpha:
+                return score
+
+        best_score = -WIN_SCORE - 1
+        best_move = None
+        for move in self._ordered_moves(key, ply):
+            score = -self._negamax_child(move, depth, ply + 1, -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._record_cutoff(move, depth, ply)
+                break
+
+        if best_move is None:
+            # a player with no legal moves loses
+            return -(WIN_SCORE - ply)
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table.store(
+            key, depth, _score_to_table(best_score, ply), flag, best_move
+        )
+        return best_score
+
+    def _ordered_moves(self, key: int, ply: int) -> List[RawMove]:
+        boards = self.position.stones
+        player = self.position.player
+        opponent = boards[1 - player]
+        entry = self.table.get(key)
+        table_move = entry[4] if entry is not None else None
+        killers = self._killers[ply] if ply < len(self._killers) else []
+        history = self._history
+
+        scored = []
+        for move in GameEngine._generate_moves(boards, player):
+            if move == table_move:
+                score = 1 << 30
+            else:
+                _, path, push = RAY_MASKS[move[1]][move[2]]
+                if opponent & path:
+                    # pushing a stone off the board beats pushing it along
+                    score = (1 << 28) if push == 0 else (1 << 27)
+                elif move in killers:
+                    score = 1 << 26
+                else:
+                    score = history.get(move, 0)
+            scored.append((score, move))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def _record_cutoff(self, move: RawMove, depth: int, ply: int):
+        if ply < len(self._killers):
+            killers = self._killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self._history[move] = self._history.get(move, 0) + depth * depth
+
+
+def _score_to_table(score: int, ply: int) -> int:
+    # wins are stored relative to the node, not the root
+    if score >= WIN_THRESHOLD:
+        return score + ply
+    if score <= -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_table(score: int, ply: int) -> int:
+    if score >= WIN_THRESHOLD:
+        return score - ply
+    if score <= -WIN_THRESHOLD:
+        return score + ply
+    return score
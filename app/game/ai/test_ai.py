@@ -0,0 +1,76 @@
+from app.game.engine import Boards, GameEngine, GameState
+from app.game.ai.mcts import MCTSAI
+from app.game.ai.rando import RandoAI
+from app.game.ai.search import SearchAI
+from app.game.tablebase import Tablebase, generate, pack_tablebase
+
+# black to move: a1 se1 lets c11 push the last white stone on c off c16
+# fmt: off
+WIN_IN_ONE = Boards([
+    [0, None, None, None, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+    [0, 0, 0, 0, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+    [0, None, None, None, None, None, None, None, None, None, 0, None, None, None, None, 1],
+    [0, 0, 0, 0, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+])
+# fmt: on
+
+
+def test_rando_plays_legal_moves():
+    ai = RandoAI(seed=3)
+    state = GameState.initial_state()
+    for _ in range(10):
+        move = ai.generate_move(state)
+        assert GameEngine.is_move_legal(move, state).is_legal
+        state = GameEngine.apply_move(state, move).state
+
+
+def test_search_finds_win_in_one():
+    state = GameState(boards=WIN_IN_ONE, player_turn=0)
+    move = SearchAI(time_budget=5.0, max_depth=3).generate_move(state)
+
+    assert GameEngine.apply_move(state, move).state.winner == 0
+
+
+def test_search_returns_none_when_game_is_over():
+    state = GameState(boards=WIN_IN_ONE, player_turn=0, winner=0)
+    assert SearchAI(time_budget=0.1).generate_move(state) is None
+
+
+def test_mcts_finds_win_in_one():
+    state = GameState(boards=WIN_IN_ONE, player_turn=0)
+    ai = MCTSAI(time_budget=None, playout_budget=600, seed=5)
+    move = ai.generate_move(state)
+
+    assert GameEngine.apply_move(state, move).state.winner == 0
+    assert ai.last_stats.playouts == 600
+    assert ai.last_stats.playouts_per_second > 0
+
+
+def test_mcts_reuses_tree():
+    ai = MCTSAI(time_budget=None, playout_budget=300, seed=5)
+    state = GameState.initial_state()
+    move = ai.generate_move(state)
+    state = GameEngine.apply_move(state, move).state
+
+    # reply with the opponent move the tree explored the most
+    root = ai._root
+    reply = max(root.children, key=lambda child: child.visits)
+    reply_move = GameEngine._generated_move(
+        root.boards, root.player, *reply.move
+    )
+    state = GameEngine.apply_move(state, reply_move).state
+    visits = reply.visits
+
+    ai.generate_move(state)
+    assert ai.last_stats.reused_visits == visits > 0
+
+
+def test_search_with_tablebase():
+    tablebase = Tablebase(pack_tablebase(generate(3), 3))
+    state = GameState(boards=WIN_IN_ONE, player_turn=0)
+    # board c holds 2 black stones and 1 white one, which black wins locally
+    assert tablebase.analyze(state)[2] == 1
+    ai = SearchAI(time_budget=5.0, max_depth=3, tablebase=tablebase)
+    move = ai.generate_move(state)
+
+    assert GameEngine.apply_move(state, move).state.winner == 0
@@ -0,0 +1,65 @@
+import random
+from app.game.ai.book import BookBuilder, OpeningBook, book_key
+from app.game.ai.search import SearchAI
+from app.game.engine import GameEngine, GameState, decode_move, encode_move
+from app.game.symmetry import Transform, transform_state
+from app.game.testing import random_walk
+
+
+def book_codes(book, state):
+    return {encode_move(move): entry for move, entry in book.moves(state)}
+
+
+def test_book_lookup_and_symmetry():
+    rng = random.Random(5)
+    games = [
+        [encode_move(move) for move in random_walk(rng, plies=8)[0]]
+        for _ in range(20)
+    ]
+    builder = BookBuilder(max_plies=6)
+    for codes in games:
+        builder.add_game(codes, winner=0)
+    for _ in range(5):
+        builder.add_game(games[0], winner=1)
+    book = OpeningBook(builder.pack())
+    assert len(book) == len(builder.stats)
+
+    # the initial position is its own mirror image, so mirrored first
+    # moves share an entry
+    initial = GameState.initial_state()
+    entries = book_codes(book, initial)
+    assert sum(entry.visits for entry in entries.values()) == 25
+    assert max(entry.visits for entry in entries.values()) >= 6
+    assert book.choose(initial) is not None
+
+    # a symmetric position finds the same statistics
+    state = initial
+    for code in games[0][:3]:
+        move = decode_move(code, state.boards)
+        state = GameEngine.apply_move(state, move).state
+    moves = book_codes(book, state)
+    move = decode_move(games[0][3], state.boards)
+    entry = moves[encode_move(move)]
+    # white is to move, and won the repeated games
+    assert entry.visits >= 6 and entry.average_result > 0.5
+    for transform in (Transform(False, True, 3), Transform(True, False, 6)):
+        mirrored = book_codes(book, transform_state(state, transform))
+        assert sorted(mirrored.values()) == sorted(moves.values())
+
+
+def test_search_plays_from_the_book():
+    state = GameState.initial_state()
+    move = list(GameEngine.legal_moves(state))[17]
+    builder = BookBuilder()
+    for _ in range(10):
+        builder.add_game([encode_move(move)], winner=0)
+
+    ai = SearchAI(time_budget=5.0, book=OpeningBook(builder.pack()))
+    book_move = ai.generate_move(state)
+    assert ai.nodes == 0
+    # the initial position is symmetric, so the book may pick a mirror image
+    # of the move
+    assert (
+        book_key(GameEngine.apply_move(state, book_move).state)[0]
+        == book_key(GameEngine.apply_move(state, move).state)[0]
+    )
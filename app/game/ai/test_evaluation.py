@@ -0,0 +1,88 @@
+import random
+from app.game.ai.evaluation import Evaluator, Weights, board_terms, evaluate
+from app.game.ai.tune import game_positions
+from app.game.engine import BitBoards, GameEngine, GameState, encode_move
+from app.game.tablebase import local_moves
+
+
+def test_board_terms_match_local_moves():
+    rng = random.Random(3)
+    for _ in range(200):
+        squares = rng.sample(range(16), rng.randint(2, 8))
+        split = rng.randint(1, len(squares) - 1)
+        black = sum(1 << square for square in squares[:split])
+        white = sum(1 << square for square in squares[split:])
+        terms = board_terms(black, white)
+        black_moves = list(local_moves(black, white))
+        white_moves = list(local_moves(white, black))
+        assert terms[:4] == (
+            black.bit_count(),
+            white.bit_count(),
+            len(black_moves),
+            len(white_moves),
+        )
+        # the stones that can be pushed are the ones some move displaces
+        pushed = 0
+        for _, opponent in black_moves:
+            pushed |= white & ~opponent
+        assert terms[4] == pushed.bit_count()
+
+
+def test_incremental_updates_match_full_evaluation():
+    rng = random.Random(11)
+    boards = BitBoards.from_boards(GameState.initial_state().boards)
+    player = 0
+    evaluator = Evaluator().reset(boards)
+    history = []
+    for _ in range(40):
+        moves = list(GameEngine._generate_moves(boards, player))
+        move = rng.choice(moves)
+        child, won = GameEngine._apply_generated_move(boards, player, *move)
+        if won:
+            break
+        history.append(boards)
+        evaluator.push(child, move[0] >> 4, move[1] >> 4)
+        boards = child
+        player = 1 - player
+        for side in (0, 1):
+            assert evaluator.score(side) == evaluate(boards, side)
+
+    # undoing the moves gets back each earlier position's features
+    while history:
+        evaluator.pop()
+        previous = history.pop()
+        assert evaluator.features(0) == Evaluator().reset(previous).features(0)
+
+
+def test_game_positions_label_the_side_to_move():
+    rng = random.Random(7)
+    state = GameState.initial_state()
+    codes = []
+    for _ in range(10):
+        move = rng.choice(list(GameEngine.legal_moves(state)))
+        codes.append(encode_move(move))
+        state = GameEngine.apply_move(state, move).state
+
+    positions = list(game_positions(codes, winner=1, skip_plies=2))
+    assert len(positions) == 8
+    # black moves at even plies
+    assert [result for _, result in positions] == [0.0, 1.0] * 4
+
+
+def test_score_is_the_weighted_features():
+    rng = random.Random(2)
+    weights = Weights(*(rng.randint(-50, 50) for _ in Weights._fields))
+    boards = BitBoards.from_boards(GameState.initial_state().boards)
+    player = 0
+    for _ in range(30):
+        move = rng.choice(list(GameEngine._generate_moves(boards, player)))
+        boards, won = GameEngine._apply_generated_move(boards, player, *move)
+        if won:
+            break
+        player = 1 - player
+        evaluator = Evaluator(weights).reset(boards)
+        for side in (0, 1):
+            assert evaluator.score(side) == sum(
+                weight * feature
+                for weight, feature in zip(weights, evaluator.features(side))
+            )
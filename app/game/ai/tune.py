@@ -0,0 +1,135 @@
+"""
+fits the evaluation weights (see app.game.ai.evaluation) to game results.
+positions are sampled from recorded games, labelled 1 / 0.5 / 0 for a win /
+draw / loss of the side to move, and the weights are fitted by logistic
+regression of the labels on the features, scaled so that EVAL_SCALE points
+of score are one unit of log odds:
+
+    python -m app.game.ai.tune --selfplay records.jsonl --records games.bin \\
+        --output weights.json
+"""
+
+import argparse
+import sys
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from app.game.ai.book import database_games, record_games, selfplay_games
+from app.game.ai.evaluation import (
+    EVAL_SCALE,
+    FEATURES,
+    Evaluator,
+    Weights,
+    save_weights,
+)
+from app.game.engine import BitBoards, GameEngine, GameState, split_move_code
+
+# the opening is mostly book territory and says little about the weights
+DEFAULT_SKIP_PLIES = 4
+
+
+def game_positions(
+    codes: List[int],
+    winner: Optional[int],
+    skip_plies: int = DEFAULT_SKIP_PLIES,
+    every: int = 1,
+) -> Iterable[Tuple[Tuple[int, ...], float]]:
+    """
+    (features, result) for the side to move in positions of one game
+    """
+    state = GameState.initial_state()
+    boards = BitBoards.from_boards(state.boards)
+    player = state.player_turn
+    evaluator = Evaluator().reset(boards)
+    for ply, code in enumerate(codes):
+        if ply >= skip_plies and not (ply - skip_plies) % every:
+            if winner is None:
+                result = 0.5
+            else:
+                result = 1.0 if winner == player else 0.0
+            yield evaluator.features(player), result
+        move = split_move_code(code)
+        boards, won = GameEngine._apply_generated_move(boards, player, *move)
+        if won:
+            break
+        evaluator.push(boards, move[0] >> 4, move[1] >> 4)
+        player = 1 if player == 0 else 0
+
+
+def fit_weights(
+    features: np.ndarray,
+    results: np.ndarray,
+    regularization: float = 1e-3,
+    iterations: int = 25,
+) -> np.ndarray:
+    """
+    logistic regression without an intercept (the features are antisymmetric
+    between the players, so an even position scores 0) by newton's method,
+    with a little L2 to keep rarely seen features in check
+    """
+    count, width = features.shape
+    coefficients = np.zeros(width)
+    penalty = regularization * count * np.eye(width)
+    for _ in range(iterations):
+        predicted = 1 / (1 + np.exp(-(features @ coefficients)))
+        gradient = features.T @ (predicted - results) + (penalty @ coefficients)
+        curvature = (features.T * (predicted * (1 - predicted))) @ features
+        step = np.linalg.solve(curvature + penalty, gradient)
+        coefficients -= step
+        if np.abs(step).max() < 1e-6:
+            break
+    return coefficients
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="fit shobu evaluation weights to game results"
+    )
+    parser.add_argument("--selfplay", action="append", default=[])
+    parser.add_argument("--records", action="append", default=[])
+    parser.add_argument(
+        "--database", action="store_true", help="include finished games"
+    )
+    parser.add_argument("--skip-plies", type=int, default=DEFAULT_SKIP_PLIES)
+    parser.add_argument(
+        "--every", type=int, default=1, help="sample every nth position"
+    )
+    parser.add_argument("--regularization", type=float, default=1e-3)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args(argv)
+
+    sources: List[Iterable[Tuple[List[int], Optional[int]]]] = []
+    sources.extend(selfplay_games(path) for path in args.selfplay)
+    sources.extend(record_games(path) for path in args.records)
+    if args.database:
+        sources.append(database_games())
+
+    rows: List[Tuple[int, ...]] = []
+    results: List[float] = []
+    games = 0
+    for source in sources:
+        for codes, winner in source:
+            games += 1
+            for features, result in game_positions(
+                codes, winner, args.skip_plies, args.every
+            ):
+                rows.append(features)
+                results.append(result)
+    if not rows:
+        parser.error("no positions to fit")
+
+    coefficients = fit_weights(
+        np.array(rows, dtype=float),
+        np.array(results),
+        args.regularization,
+    )
+    weights = Weights(
+        *(int(round(value * EVAL_SCALE)) for value in coefficients)
+    )
+    save_weights(weights, args.output)
+    print(f"{games} games, {len(rows)} positions", file=sys.stderr)
+    for name, value in zip(FEATURES, weights):
+        print(f"{name:>16} {value:6d}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+vectorized versions of the GameEngine rules for many positions at once, for
+self-play data generation and bulk analysis.
+
+positions are (N, 4, 16) int8 arrays holding 0 / 1 for black / white stones
+and EMPTY (-1) for empty squares. moves are (N, 5) int arrays of
+(passive board, passive origin, active board, active origin, direction
+index), with direction index = (cardinal * 2) + length - 1.
+"""
+
+from typing import List, Sequence, Tuple, Union
+import numpy as np
+from app.game.engine import (
+    ACTIVE_BOARDS,
+    HOME_BOARDS,
+    RAYS,
+    BitBoards,
+    Boards,
+    Move,
+)
+from app.game.types import BoardsType
+
+EMPTY = -1
+
+# column appended to each board so that off-board lookups read as empty
+_OFF_BOARD = 16
+
+
+def _build_ray_indexes() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    destinations = np.full((16, 16), -1, dtype=np.intp)
+    midpoints = np.full((16, 16), _OFF_BOARD, dtype=np.intp)
+    push_destinations = np.full((16, 16), _OFF_BOARD, dtype=np.intp)
+    for origin in range(16):
+        for cardinal in range(8):
+            for length in (1, 2):
+                index = (cardinal * 2) + length - 1
+                ray = RAYS[origin][cardinal][length]
+                if ray.destination is None:
+                    continue
+                destinations[origin, index] = ray.destination
+                if ray.midpoint is not None:
+                    midpoints[origin, index] = ray.midpoint
+                if ray.push_destination is not None:
+                    push_destinations[origin, index] = ray.push_destination
+    return destinations, midpoints, push_destinations
+
+
+# [origin, direction index] lookups. destinations are -1 off the board,
+# midpoints and push destinations point at the padding column when missing
+DESTINATIONS, MIDPOINTS, PUSH_DESTINATIONS = _build_ray_indexes()
+_ON_BOARD = DESTINATIONS >= 0
+_DESTINATIONS = np.where(_ON_BOARD, DESTINATIONS, _OFF_BOARD)
+
+# HOME[player, board]
+HOME = np.zeros((2, 4), dtype=bool)
+for _player, _boards in enumerate(HOME_BOARDS):
+    HOME[_player, list(_boards)] = True
+
+# BOARD_PAIRS[passive board, active board]
+BOARD_PAIRS = np.zeros((4, 4), dtype=np.int64)
+for _passive, _actives in enumerate(ACTIVE_BOARDS):
+    BOARD_PAIRS[_passive, list(_actives)] = 1
+
+
+def boards_to_array(
+    boards_list: Sequence[Union[BoardsType, BitBoards]],
+) -> np.ndarray:
+    positions = np.full((len(boards_list), 4, 16), EMPTY, dtype=np.int8)
+    for n, boards in enumerate(boards_list):
+        if isinstance(boards, BitBoards):
+            boards = boards.to_boards()
+        for board_id, board in enumerate(boards):
+            for coordinate, cell in enumerate(board):
+                if cell is not None:
+                    positions[n, board_id, coordinate] = cell
+    return positions
+
+
+def array_to_boards(positions: np.ndarray) -> List[Boards]:
+    return [
+        Boards(
+            [
+                [None if cell == EMPTY else int(cell) for cell in board]
+                for board in position
+            ]
+        )
+        for position in positions
+    ]
+
+
+def moves_to_array(moves: Sequence[Move]) -> np.ndarray:
+    return np.array(
+        [
+            (
+                move.passive.board,
+                move.passive.origin,
+                move.active.board,
+                move.active.origin,
+                (move.direction.cardinal * 2) + move.direction.length - 1,
+            )
+            for move in moves
+        ],
+        dtype=np.intp,
+    ).reshape(-1, 5)
+
+
+def _pad(positions: np.ndarray) -> np.ndarray:
+    padding = np.full(positions.shape[:2] + (1,), EMPTY, dtype=positions.dtype)
+    return np.concatenate([positions, padding], axis=2)
+
+
+def legal_move_masks(
+    positions: np.ndarray, players: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    returns (passive, active) boolean masks of shape (N, 4, 16, 16), indexed
+    [position, board, origin, direction index]. a move is legal when both its
+    passive and active parts are set for the same direction and the boards
+    pair up (see BOARD_PAIRS). positions that are already won aren't special
+    cased
+    """
+    players = np.asarray(players, dtype=np.int8)
+    own_value = players[:, None, None, None]
+    opponent_value = (1 - players)[:, None, None, None]
+    padded = _pad(positions)
+
+    # cells[n, board, origin, direction]
+    origin_cells = positions[:, :, :, None]
+    destination_cells = padded[:, :, _DESTINATIONS]
+    midpoint_cells = padded[:, :, MIDPOINTS]
+    push_cells = padded[:, :, PUSH_DESTINATIONS]
+
+    movable = (origin_cells == own_value) & _ON_BOARD
+    path_clear = (destination_cells == EMPTY) & (midpoint_cells == EMPTY)
+
+    passive = movable & path_clear & HOME[players][:, :, None, None]
+
+    blocked_by_own = (destination_cells == own_value) | (
+        midpoint_cells == own_value
+    )
+    opponent_stones = (destination_cells == opponent_value).astype(np.int8) + (
+        midpoint_cells == opponent_value
+    )
+    single_push = (opponent_stones == 1) & (push_cells == EMPTY)
+    active = movable & ~blocked_by_own & ((opponent_stones == 0) | single_push)
+
+    return passive, active
+
+
+def legal_move_counts(positions: np.ndarray, players: np.ndarray) -> np.ndarray:
+    passive, active = legal_move_masks(positions, players)
+    passive_counts = passive.sum(axis=2, dtype=np.int64)
+    active_counts = active.sum(axis=2, dtype=np.int64)
+    return np.einsum(
+        "npd,pa,nad->n", passive_counts, BOARD_PAIRS, active_counts
+    )
+
+
+def apply_moves(
+    positions: np.ndarray, players: np.ndarray, moves: np.ndarray
+) -> np.ndarray:
+    """
+    plays one move per position and returns the new positions. moves are
+    trusted to be legal, eg. picked from legal_move_masks
+    """
+    players = np.asarray(players, dtype=np.int8)
+    opponents = 1 - players
+    moves = np.asarray(moves, dtype=np.intp)
+    rows = np.arange(len(positions))
+    passive_board, passive_origin, active_board, active_origin, index = moves.T
+
+    passive_destination = DESTINATIONS[passive_origin, index]
+    active_destination = DESTINATIONS[active_origin, index]
+    midpoint = MIDPOINTS[active_origin, index]
+    push_destination = PUSH_DESTINATIONS[active_origin, index]
+
+    padded = _pad(positions)
+    pushed = (padded[rows, active_board, midpoint] == opponents) | (
+        padded[rows, active_board, active_destination] == opponents
+    )
+
+    result = padded.copy()
+    result[rows, passive_board, passive_origin] = EMPTY
+    result[rows, passive_board, passive_destination] = players
+    result[rows, active_board, active_origin] = EMPTY
+    result[rows, active_board, midpoint] = EMPTY
+    result[rows, active_board, active_destination] = players
+    result[rows[pushed], active_board[pushed], push_destination[pushed]] = (
+        opponents[pushed]
+    )
+    return np.ascontiguousarray(result[:, :, :16])
+
+
+def winners(positions: np.ndarray) -> np.ndarray:
+    """
+    (N,) int8 array of the winner of each position, or EMPTY if there is
+    none, matching GameEngine.check_winner
+    """
+    black_missing = ~(positions == 0).any(axis=2).all(axis=1)
+    white_missing = ~(positions == 1).any(axis=2).all(axis=1)
+    result = np.full(len(positions), EMPTY, dtype=np.int8)
+    result[black_missing] = 1
+    result[white_missing] = 0
+    return result
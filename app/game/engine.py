@@ -1,5 +1,6 @@
-from dataclasses import dataclass, replace
-from typing import Optional, Literal, NamedTuple, cast
+from dataclasses import dataclass, field
+import random
+from typing import Iterator, Optional, Literal, NamedTuple, Union, cast
 from copy import deepcopy
 from app.game.types import (
     GameEndType,
@@ -56,8 +57,18 @@ def player_number_to_color(player_number: PlayerNumberType) -> PlayerColorType:
     return "black" if player_number == 0 else "white"
 
 
-@dataclass(frozen=True)
+# sets a field of a frozen dataclass, for the trusted constructors
+_set = object.__setattr__
+
+
+@dataclass(frozen=True, slots=True)
 class BoardMove:
+    """
+    the constructor validates its fields, for moves from the API and the
+    terminal. moves built from generated moves use trusted() or the interned
+    BOARD_MOVES, which skip the checks
+    """
+
     board: BoardNumberType
     origin: CoordinateType
     destination: CoordinateType
@@ -76,17 +87,17 @@ class BoardMove:
         )
 
     def __post_init__(self):
-        if not (self.board in list(range(4))):
+        if not (self.board in range(4)):
             raise ValueError(
                 f"board must be an int between 0 and 3, got {self.board}"
             )
 
-        if not (self.origin in list(range(16))):
+        if not (self.origin in range(16)):
             raise ValueError(
                 f"origin must be an int between 0 and 15, got {self.origin}"
             )
 
-        if not (self.destination in list(range(16))):
+        if not (self.destination in range(16)):
             raise ValueError(
                 f"destination must be an int between 0 and 15, got {self.destination}"
             )
@@ -97,14 +108,35 @@ class BoardMove:
             )
 
         if self.push_destination is not None and not (
-            self.push_destination in list(range(16))
+            self.push_destination in range(16)
         ):
             raise ValueError(
                 f"push_destination must be None, or an int between 0 and 15, got {self.push_destination}"
             )
 
+    @classmethod
+    def trusted(
+        cls,
+        board: BoardNumberType,
+        origin: CoordinateType,
+        destination: CoordinateType,
+        is_push: Optional[bool] = None,
+        push_destination: Optional[CoordinateType] = None,
+    ) -> "BoardMove":
+        """
+        builds a BoardMove without validating it, for fields that are known
+        to be in range
+        """
+        board_move = object.__new__(cls)
+        _set(board_move, "board", board)
+        _set(board_move, "origin", origin)
+        _set(board_move, "destination", destination)
+        _set(board_move, "is_push", is_push)
+        _set(board_move, "push_destination", push_destination)
+        return board_move
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class Direction:
     cardinal: CardinalNumberType
     length: MoveLengthType
@@ -118,7 +150,7 @@ class Direction:
         )
 
     def __post_init__(self):
-        if not (self.cardinal in list(range(8))):
+        if not (self.cardinal in range(8)):
             raise ValueError(
                 f"cardinal must be an int between 0 and 7, got {self.cardinal}"
             )
@@ -127,7 +159,124 @@ class Direction:
             raise ValueError(f"length must be 1 or 2, got {self.length}")
 
 
-@dataclass(frozen=True)
+# (x, y) step for each cardinal index, with y increasing towards the bottom
+# of the board (the white side)
+CARDINAL_STEPS = (
+    (0, -1),
+    (1, -1),
+    (1, 0),
+    (1, 1),
+    (0, 1),
+    (-1, 1),
+    (-1, 0),
+    (-1, -1),
+)
+
+
+class Ray(NamedTuple):
+    destination: Optional[CoordinateType]
+    midpoint: Optional[CoordinateType]
+    push_destination: Optional[CoordinateType]
+
+
+def _step(origin: int, cardinal: int, length: int) -> Optional[CoordinateType]:
+    x_step, y_step = CARDINAL_STEPS[cardinal]
+    x = (origin % 4) + (x_step * length)
+    y = (origin // 4) + (y_step * length)
+    if x < 0 or y < 0 or x > 3 or y > 3:
+        return None
+    return cast(CoordinateType, (y * 4) + x)
+
+
+def _build_ray(origin: int, cardinal: int, length: int) -> Ray:
+    destination = _step(origin, cardinal, length)
+    if destination is None:
+        return Ray(None, None, None)
+    if length == 3:
+        # only used to look up push destinations
+        return Ray(destination, None, None)
+    midpoint = _step(origin, cardinal, 1) if length == 2 else None
+    return Ray(destination, midpoint, _step(origin, cardinal, length + 1))
+
+
+# RAYS[origin][cardinal][length], for length 1 to 3 (index 0 is unused).
+# destination is None when the move would leave the board
+RAYS = tuple(
+    tuple(
+        (None,)
+        + tuple(_build_ray(origin, cardinal, length) for length in range(1, 4))
+        for cardinal in range(8)
+    )
+    for origin in range(16)
+)
+
+DIRECTIONS = tuple(
+    tuple(
+        Direction(
+            cardinal=cast(CardinalNumberType, cardinal),
+            length=cast(MoveLengthType, length),
+        )
+        for length in (1, 2)
+    )
+    for cardinal in range(8)
+)
+
+
+def _build_move_directions(origin: int) -> tuple[Optional[Direction], ...]:
+    directions: list[Optional[Direction]] = [None] * 16
+    for cardinal in range(8):
+        for length in (1, 2):
+            destination = RAYS[origin][cardinal][length].destination
+            if destination is not None:
+                directions[destination] = DIRECTIONS[cardinal][length - 1]
+    return tuple(directions)
+
+
+# MOVE_DIRECTIONS[origin][destination], None unless the two coordinates are
+# a legal move (length 1 or 2) apart
+MOVE_DIRECTIONS = tuple(_build_move_directions(origin) for origin in range(16))
+
+
+def _build_board_moves(
+    square: int, is_push: bool
+) -> tuple[Optional[BoardMove], ...]:
+    board_moves: list[Optional[BoardMove]] = []
+    for index in range(16):
+        ray = RAYS[square & 15][index >> 1][(index & 1) + 1]
+        if ray.destination is None:
+            board_moves.append(None)
+        elif is_push:
+            board_moves.append(
+                BoardMove(
+                    board=cast(BoardNumberType, square >> 4),
+                    origin=cast(CoordinateType, square & 15),
+                    destination=ray.destination,
+                    is_push=True,
+                    push_destination=ray.push_destination,
+                )
+            )
+        else:
+            board_moves.append(
+                BoardMove(
+                    board=cast(BoardNumberType, square >> 4),
+                    origin=cast(CoordinateType, square & 15),
+                    destination=ray.destination,
+                )
+            )
+    return tuple(board_moves)
+
+
+# BOARD_MOVES[square][direction index] and the same move as a push, for
+# square = board * 16 + origin and direction index = cardinal * 2 + length - 1.
+# moves are immutable, so generated moves share these instead of building
+# their own. None where the move leaves the board
+BOARD_MOVES = tuple(_build_board_moves(square, False) for square in range(64))
+PUSH_BOARD_MOVES = tuple(
+    _build_board_moves(square, True) for square in range(64)
+)
+
+
+@dataclass(frozen=True, slots=True)
 class Move:
     player: PlayerNumberType
     passive: BoardMove
@@ -148,6 +297,36 @@ class Move:
         if not (self.player == 0 or self.player == 1):
             raise ValueError(f"player must be 0 or 1, got {self.player}")
 
+    @classmethod
+    def trusted(
+        cls,
+        player: PlayerNumberType,
+        passive: BoardMove,
+        active: BoardMove,
+        direction: Direction,
+    ) -> "Move":
+        """
+        builds a Move without validating it, from parts that are already
+        valid
+        """
+        move = object.__new__(cls)
+        _set(move, "player", player)
+        _set(move, "passive", passive)
+        _set(move, "active", active)
+        _set(move, "direction", direction)
+        return move
+
+
+def move_notation(move: Move) -> str:
+    """
+    formats a move the way the terminal game reads it, eg. "a1s2 c1"
+    """
+    return (
+        f"{index_to_board_letter(move.passive.board)}{move.passive.origin + 1}"
+        f"{index_to_cardinal(move.direction.cardinal)}{move.direction.length}"
+        f" {index_to_board_letter(move.active.board)}{move.active.origin + 1}"
+    )
+
 
 class Boards(list):
     def __init__(self, boards: BoardsType):
@@ -174,11 +353,134 @@ class Boards(list):
         return "\n".join(result)
 
 
+# bitboard layout: one int per player, bit (board * 16 + coordinate) is set
+# when that player has a stone on that square
+BOARD_MASK = 0xFFFF
+BOARD_MASKS = tuple(BOARD_MASK << (board * 16) for board in range(4))
+
+
+def square_bit(board: BoardNumberType, coordinate: CoordinateType) -> int:
+    return 1 << ((board * 16) + coordinate)
+
+
+def _build_ray_masks(square: int) -> tuple[Optional[tuple[int, int, int]], ...]:
+    board = square // 16
+    origin = square % 16
+    masks: list[Optional[tuple[int, int, int]]] = []
+    for cardinal in range(8):
+        for length in (1, 2):
+            ray = RAYS[origin][cardinal][length]
+            if ray.destination is None:
+                masks.append(None)
+                continue
+            destination = 1 << ((board * 16) + ray.destination)
+            path = destination
+            if ray.midpoint is not None:
+                path |= 1 << ((board * 16) + ray.midpoint)
+            push = 0
+            if ray.push_destination is not None:
+                push = 1 << ((board * 16) + ray.push_destination)
+            masks.append((destination, path, push))
+    return tuple(masks)
+
+
+# RAY_MASKS[square][direction_index] for a bitboard square (board * 16 +
+# coordinate) and direction_index = (cardinal * 2) + length - 1. each entry
+# is (destination bit, bits travelled through including the destination, push
+# destination bit or 0 when pushing off the board), or None off the board
+RAY_MASKS = tuple(_build_ray_masks(square) for square in range(64))
+
+HOME_BOARDS = ((0, 1), (2, 3))
+
+# boards an active move can be played on for a passive move on the given
+# board: a different board of the opposite shade
+ACTIVE_BOARDS = tuple(
+    tuple(
+        active
+        for active in range(4)
+        if active != passive and active + passive != 3
+    )
+    for passive in range(4)
+)
+
+
+class BitBoards(NamedTuple):
+    """
+    packed form of Boards: indexing with a player number gives that player's
+    stones on all four boards as a single 64-bit int
+    """
+
+    black: int
+    white: int
+
+    @classmethod
+    def from_boards(cls, boards: BoardsType) -> "BitBoards":
+        black = 0
+        white = 0
+        for board_id, board in enumerate(boards):
+            for coordinate, cell in enumerate(board):
+                if cell == 0:
+                    black |= 1 << ((board_id * 16) + coordinate)
+                elif cell == 1:
+                    white |= 1 << ((board_id * 16) + coordinate)
+        return cls(black, white)
+
+    def to_boards(self) -> Boards:
+        return Boards([self.get_board(board) for board in range(4)])
+
+    def get_board(self, board_id: int) -> BoardType:
+        black = self.black >> (board_id * 16)
+        white = self.white >> (board_id * 16)
+        board: BoardType = []
+        for coordinate in range(16):
+            if (black >> coordinate) & 1:
+                board.append(0)
+            elif (white >> coordinate) & 1:
+                board.append(1)
+            else:
+                board.append(None)
+        return board
+
+    def __repr__(self) -> str:
+        return repr(self.to_boards())
+
+
+def _build_zobrist_keys() -> tuple[tuple[tuple[int, ...], ...], int]:
+    # fixed seed, so keys are stable across processes and can be stored
+    rng = random.Random(0x5B0B)
+    squares = tuple(
+        tuple(rng.getrandbits(64) for _ in range(64)) for _ in range(2)
+    )
+    return squares, rng.getrandbits(64)
+
+
+# ZOBRIST_KEYS[player][square] for bitboard squares (board * 16 + coordinate),
+# XORed together with ZOBRIST_WHITE_TO_MOVE when it's white's turn
+ZOBRIST_KEYS, ZOBRIST_WHITE_TO_MOVE = _build_zobrist_keys()
+
+
+def zobrist_hash(
+    boards: Union[BoardsType, BitBoards], player_turn: PlayerNumberType
+) -> int:
+    if not isinstance(boards, BitBoards):
+        boards = BitBoards.from_boards(boards)
+    key = ZOBRIST_WHITE_TO_MOVE if player_turn == 1 else 0
+    for player in (0, 1):
+        stones = boards[player]
+        while stones:
+            bit = stones & -stones
+            stones ^= bit
+            key ^= ZOBRIST_KEYS[player][bit.bit_length() - 1]
+    return key
+
+
 @dataclass(frozen=True)
 class GameState:
-    boards: Boards
+    boards: Union[Boards, BitBoards]
     player_turn: PlayerNumberType
     winner: Optional[GameEndType] = None
+    # zobrist hash of the position, computed from the boards when not given
+    key: Optional[int] = field(default=None, compare=False, repr=False)
 
     @classmethod
     def initial_state(cls) -> "GameState":
@@ -196,6 +498,10 @@ class GameState:
         if not (self.player_turn == 0 or self.player_turn == 1):
             raise ValueError(f"player must be 0 or 1, got {self.player_turn}")
 
+        if self.key is None:
+            key = zobrist_hash(self.boards, self.player_turn)
+            object.__setattr__(self, "key", key)
+
 
 class ValidationResult(NamedTuple):
     is_legal: bool
@@ -213,6 +519,11 @@ class GameError(Exception):
     pass
 
 
+# (passive square, active square, direction index), as produced by
+# GameEngine._generate_moves
+RawMove = tuple[int, int, int]
+
+
 class GameEngine:
     @staticmethod
     def apply_move(state: GameState, move: Move) -> GameResult:
@@ -235,9 +546,12 @@ class GameEngine:
         )
         winner = GameEngine.check_winner(new_boards)
         new_turn = (state.player_turn + 1) % 2
+        new_key = GameEngine.update_key(
+            cast(int, state.key), state.boards, move, state.player_turn
+        )
 
         new_state = GameState(
-            boards=new_boards, player_turn=new_turn, winner=winner
+            boards=new_boards, player_turn=new_turn, winner=winner, key=new_key
         )
 
         message = None
@@ -246,18 +560,250 @@ class GameEngine:
 
         return GameResult(state=new_state, message=message)
 
+    @staticmethod
+    def update_key(
+        key: int,
+        boards: Union[BoardsType, BitBoards],
+        move: Move,
+        player: PlayerNumberType,
+    ) -> int:
+        """
+        zobrist hash after `move`, given the hash and boards before it. only
+        the squares the move touches are XORed in and out
+        """
+        own_keys = ZOBRIST_KEYS[player]
+        opponent_keys = ZOBRIST_KEYS[1 - player]
+        passive = move.passive
+        active = move.active
+        passive_base = passive.board * 16
+        active_base = active.board * 16
+
+        key ^= (
+            own_keys[passive_base + passive.origin]
+            ^ own_keys[passive_base + passive.destination]
+            ^ own_keys[active_base + active.origin]
+            ^ own_keys[active_base + active.destination]
+            ^ ZOBRIST_WHITE_TO_MOVE
+        )
+
+        direction = GameEngine.get_move_direction(
+            active.origin, active.destination
+        )
+        ray = RAYS[active.origin][direction.cardinal][direction.length]
+        board = GameEngine.get_board(boards, active.board)
+        for coordinate in (ray.midpoint, active.destination):
+            if coordinate is not None and board[coordinate] == 1 - player:
+                key ^= opponent_keys[active_base + coordinate]
+                if ray.push_destination is not None:
+                    key ^= opponent_keys[active_base + ray.push_destination]
+
+        return key
+
+    @staticmethod
+    def legal_moves(state: GameState) -> Iterator[Move]:
+        if state.winner is not None:
+            return
+        player = state.player_turn
+        boards = state.boards
+        if not isinstance(boards, BitBoards):
+            boards = BitBoards.from_boards(boards)
+
+        for passive_square, active_square, index in GameEngine._generate_moves(
+            boards, player
+        ):
+            yield GameEngine._generated_move(
+                boards, player, passive_square, active_square, index
+            )
+
+    @staticmethod
+    def _generated_move(
+        boards: BitBoards,
+        player: PlayerNumberType,
+        passive_square: int,
+        active_square: int,
+        index: int,
+    ) -> Move:
+        """
+        builds the Move for a (passive square, active square, direction
+        index) triple from _generate_moves
+        """
+        _, path, _ = RAY_MASKS[active_square][index]
+        if boards[1 - player] & path:
+            active = PUSH_BOARD_MOVES[active_square][index]
+        else:
+            active = BOARD_MOVES[active_square][index]
+        return Move.trusted(
+            player,
+            cast(BoardMove, BOARD_MOVES[passive_square][index]),
+            cast(BoardMove, active),
+            DIRECTIONS[index >> 1][index & 1],
+        )
+
+    @staticmethod
+    def count_legal_moves(state: GameState) -> int:
+        if state.winner is not None:
+            return 0
+        boards = state.boards
+        if not isinstance(boards, BitBoards):
+            boards = BitBoards.from_boards(boards)
+        return GameEngine._count_moves(boards, state.player_turn)
+
+    @staticmethod
+    def _move_candidates(
+        boards: BitBoards, player: PlayerNumberType, index: int
+    ) -> tuple[list[list[int]], list[list[int]]]:
+        """
+        squares (board * 16 + coordinate) of stones that can make a passive
+        and an active move in direction `index`, grouped by board
+        """
+        own = boards[player]
+        opponent = boards[1 - player]
+        occupied = own | opponent
+        passives: list[list[int]] = [[], [], [], []]
+        actives: list[list[int]] = [[], [], [], []]
+
+        stones = own
+        while stones:
+            bit = stones & -stones
+            stones ^= bit
+            square = bit.bit_length() - 1
+            masks = RAY_MASKS[square][index]
+            if masks is None:
+                continue
+            _, path, push = masks
+            if path & own:
+                continue
+            board = square >> 4
+            blocked = path & opponent
+            if not blocked:
+                actives[board].append(square)
+                if board in HOME_BOARDS[player]:
+                    passives[board].append(square)
+            elif not (blocked & (blocked - 1)) and not (push & occupied):
+                # exactly one opponent stone, with room to push it
+                actives[board].append(square)
+
+        return passives, actives
+
+    @staticmethod
+    def _generate_moves(
+        boards: BitBoards, player: PlayerNumberType
+    ) -> Iterator[RawMove]:
+        """
+        yields (passive square, active square, direction index) for every
+        legal move, without building Move objects
+        """
+        for index in range(16):
+            passives, actives = GameEngine._move_candidates(
+                boards, player, index
+            )
+            for passive_board in HOME_BOARDS[player]:
+                if not passives[passive_board]:
+                    continue
+                for active_board in ACTIVE_BOARDS[passive_board]:
+                    for passive_square in passives[passive_board]:
+                        for active_square in actives[active_board]:
+                            yield passive_square, active_square, index
+
+    @staticmethod
+    def _count_moves(boards: BitBoards, player: PlayerNumberType) -> int:
+        count = 0
+        for index in range(16):
+            passives, actives = GameEngine._move_candidates(
+                boards, player, index
+            )
+            for passive_board in HOME_BOARDS[player]:
+                if not passives[passive_board]:
+                    continue
+                count += len(passives[passive_board]) * sum(
+                    len(actives[active_board])
+                    for active_board in ACTIVE_BOARDS[passive_board]
+                )
+        return count
+
+    @staticmethod
+    def _apply_generated_move(
+        boards: BitBoards,
+        player: PlayerNumberType,
+        passive_square: int,
+        active_square: int,
+        index: int,
+    ) -> tuple[BitBoards, bool]:
+        """
+        applies a move from _generate_moves without validating it, returning
+        the new boards and whether the move won the game
+        """
+        own = boards[player]
+        opponent = boards[1 - player]
+        passive_destination, _, _ = RAY_MASKS[passive_square][index]
+        active_destination, path, push = RAY_MASKS[active_square][index]
+
+        own ^= (
+            (1 << passive_square)
+            | passive_destination
+            | (1 << active_square)
+            | active_destination
+        )
+        pushed = opponent & path
+        if pushed:
+            opponent ^= pushed | push
+
+        won = not (opponent & BOARD_MASKS[active_square >> 4])
+        if player == 0:
+            return BitBoards(own, opponent), won
+        return BitBoards(opponent, own), won
+
+    @staticmethod
+    def _generated_move_key(
+        key: int,
+        boards: BitBoards,
+        player: PlayerNumberType,
+        passive_square: int,
+        active_square: int,
+        index: int,
+    ) -> int:
+        """
+        update_key for a move from _generate_moves, given the boards before it
+        """
+        own_keys = ZOBRIST_KEYS[player]
+        passive_destination, _, _ = RAY_MASKS[passive_square][index]
+        active_destination, path, push = RAY_MASKS[active_square][index]
+
+        key ^= (
+            own_keys[passive_square]
+            ^ own_keys[passive_destination.bit_length() - 1]
+            ^ own_keys[active_square]
+            ^ own_keys[active_destination.bit_length() - 1]
+            ^ ZOBRIST_WHITE_TO_MOVE
+        )
+        pushed = boards[1 - player] & path
+        if pushed:
+            opponent_keys = ZOBRIST_KEYS[1 - player]
+            key ^= opponent_keys[pushed.bit_length() - 1]
+            if push:
+                key ^= opponent_keys[push.bit_length() - 1]
+        return key
+
     @staticmethod
     def _update_boards(
-        boards: BoardsType, input_move: Move, player: PlayerNumberType
-    ) -> Boards:
-        print("wtf", input_move)
+        boards: Union[BoardsType, BitBoards],
+        input_move: Move,
+        player: PlayerNumberType,
+    ) -> Union[Boards, BitBoards]:
+        if isinstance(boards, BitBoards):
+            return GameEngine._update_bitboards(boards, input_move, player)
+
         new_boards = deepcopy(boards)
         active_move = GameEngine.validate_board_move(
             input_move.active, boards[input_move.active.board]
         )
-        move = replace(input_move, active=active_move)
+        move = Move.trusted(
+            input_move.player,
+            input_move.passive,
+            active_move,
+            input_move.direction,
+        )
 
-        print("now what", move)
         new_boards[move.passive.board][move.passive.origin] = None
         new_boards[move.passive.board][move.passive.destination] = player
         new_boards[move.active.board][move.active.origin] = None
@@ -279,7 +825,52 @@ class GameEngine:
         return Boards(new_boards)
 
     @staticmethod
-    def check_winner(boards: BoardsType) -> Optional[PlayerNumberType]:
+    def _update_bitboards(
+        boards: BitBoards, move: Move, player: PlayerNumberType
+    ) -> BitBoards:
+        own = boards[player]
+        opponent = boards[1 - player]
+        passive = move.passive
+        active = move.active
+
+        own &= ~(
+            square_bit(passive.board, passive.origin)
+            | square_bit(active.board, active.origin)
+        )
+        own |= square_bit(passive.board, passive.destination) | square_bit(
+            active.board, active.destination
+        )
+
+        # stones in the path of the active move are pushed one square past
+        # the destination, or off the board
+        direction = GameEngine.get_move_direction(
+            active.origin, active.destination
+        )
+        ray = RAYS[active.origin][direction.cardinal][direction.length]
+        path = square_bit(active.board, active.destination)
+        if ray.midpoint is not None:
+            path |= square_bit(active.board, ray.midpoint)
+        if opponent & path:
+            opponent &= ~path
+            if ray.push_destination is not None:
+                opponent |= square_bit(active.board, ray.push_destination)
+
+        if player == 0:
+            return BitBoards(own, opponent)
+        return BitBoards(opponent, own)
+
+    @staticmethod
+    def check_winner(
+        boards: Union[BoardsType, BitBoards],
+    ) -> Optional[PlayerNumberType]:
+        if isinstance(boards, BitBoards):
+            black, white = boards
+            if any(not (white & mask) for mask in BOARD_MASKS):
+                return 0
+            elif any(not (black & mask) for mask in BOARD_MASKS):
+                return 1
+            return None
+
         if any(1 not in board for board in boards):
             return 0
         elif any(0 not in board for board in boards):
@@ -287,6 +878,40 @@ class GameEngine:
         else:
             return None
 
+    @staticmethod
+    def changed_squares(
+        before: Union[BoardsType, BitBoards],
+        after: Union[BoardsType, BitBoards],
+    ) -> list[tuple[int, Optional[PlayerNumberType]]]:
+        """
+        (square, new cell) for every square that differs, with squares as
+        board * 16 + coordinate. a move changes at most 6 squares
+        """
+        if not isinstance(before, BitBoards):
+            before = BitBoards.from_boards(before)
+        if not isinstance(after, BitBoards):
+            after = BitBoards.from_boards(after)
+        changed = (before.black ^ after.black) | (before.white ^ after.white)
+        changes: list[tuple[int, Optional[PlayerNumberType]]] = []
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            cell: Optional[PlayerNumberType] = None
+            if after.black & bit:
+                cell = 0
+            elif after.white & bit:
+                cell = 1
+            changes.append((bit.bit_length() - 1, cell))
+        return changes
+
+    @staticmethod
+    def get_board(
+        boards: Union[BoardsType, BitBoards], board_id: BoardNumberType
+    ) -> BoardType:
+        if isinstance(boards, BitBoards):
+            return boards.get_board(board_id)
+        return boards[board_id]
+
     @staticmethod
     def validate_board_move(
         board_move: BoardMove, board: BoardType
@@ -298,15 +923,11 @@ class GameEngine:
             raise ValueError(f"length must be 1 or 2, got {direction.length}")
 
         if GameEngine.is_move_push(board_move, board):
-            push_destination = GameEngine.get_destination_coordinate(
-                board_move.origin,
-                direction.cardinal,
-                direction.length + 1,
-            )
-            print("what is push_destination?", push_destination)
-
-            return replace(
-                board_move, is_push=True, push_destination=push_destination
+            return cast(
+                BoardMove,
+                PUSH_BOARD_MOVES[(board_move.board * 16) + board_move.origin][
+                    (direction.cardinal * 2) + direction.length - 1
+                ],
             )
 
         return board_move
@@ -322,6 +943,18 @@ class GameEngine:
                 f"it's not {player_number_to_color(move.player)}'s turn to move",
             )
 
+        passive_direction = GameEngine.get_move_direction(
+            move.passive.origin, move.passive.destination
+        )
+        active_direction = GameEngine.get_move_direction(
+            move.active.origin, move.active.destination
+        )
+        if not (passive_direction == active_direction == move.direction):
+            return ValidationResult(
+                False,
+                "the passive and active moves must go the same direction and distance",
+            )
+
         is_legal, reason = GameEngine.is_passive_legal(move.passive, state)
         if not is_legal:
             return ValidationResult(is_legal, reason)
@@ -335,9 +968,8 @@ class GameEngine:
     def is_passive_legal(
         passive_move_input: BoardMove, state: GameState
     ) -> ValidationResult:
-        passive_move = GameEngine.validate_board_move(
-            passive_move_input, state.boards[passive_move_input.board]
-        )
+        board = GameEngine.get_board(state.boards, passive_move_input.board)
+        passive_move = GameEngine.validate_board_move(passive_move_input, board)
         if passive_move.is_push:
             return ValidationResult(
                 False, "you can't push stones with the passive move"
@@ -353,17 +985,14 @@ class GameEngine:
             message = f"the passive (first) move must be in one of your home boards.  player is {player_number_to_color(state.player_turn)}, home boards are {home_boards}"
             return ValidationResult(False, message)
 
-        if state.boards[passive_move.board][passive_move.origin] is None:
+        if board[passive_move.origin] is None:
             board_letter = index_to_board_letter(passive_move.board)
             message = (
                 f"no stone exists on {board_letter}{passive_move.origin + 1}"
             )
             return ValidationResult(False, message)
 
-        if (
-            state.boards[passive_move.board][passive_move.origin]
-            != state.player_turn
-        ):
+        if board[passive_move.origin] != state.player_turn:
             board_letter = index_to_board_letter(passive_move.board)
             message = f"{board_letter}{passive_move.origin + 1} does not belong to {player_number_to_color(state.player_turn)}"
             return ValidationResult(False, message)
@@ -374,9 +1003,8 @@ class GameEngine:
     def is_active_legal(
         active_move_input: BoardMove, passive_move: BoardMove, state: GameState
     ) -> ValidationResult:
-        active_move = GameEngine.validate_board_move(
-            active_move_input, state.boards[active_move_input.board]
-        )
+        board = GameEngine.get_board(state.boards, active_move_input.board)
+        active_move = GameEngine.validate_board_move(active_move_input, board)
         if passive_move.board == active_move.board:
             return ValidationResult(
                 False, "active and passive moves must be on different boards"
@@ -388,17 +1016,14 @@ class GameEngine:
                 "active and passive moves can't be on the same shade of board",
             )
 
-        if state.boards[active_move.board][active_move.origin] is None:
+        if board[active_move.origin] is None:
             board_letter = index_to_board_letter(active_move.board)
             message = (
                 f"no stone exists on {board_letter}{active_move.origin + 1}"
             )
             return ValidationResult(False, message)
 
-        if (
-            state.boards[active_move.board][active_move.origin]
-            != state.player_turn
-        ):
+        if board[active_move.origin] != state.player_turn:
             board_letter = index_to_board_letter(active_move.board)
             message = f"{board_letter}{active_move.origin + 1} does not belong to {player_number_to_color(state.player_turn)}"
             return ValidationResult(False, message)
@@ -407,26 +1032,17 @@ class GameEngine:
             direction = GameEngine.get_move_direction(
                 active_move.origin, active_move.destination
             )
+            midpoint = RAYS[active_move.origin][direction.cardinal][
+                direction.length
+            ].midpoint
 
-            stones = int(
-                bool(state.boards[active_move.board][active_move.destination])
-            )
+            stones = int(board[active_move.destination] is not None)
 
-            midpoint = None
-            if direction.length == 2:
-                midpoint = GameEngine.get_move_midpoint(
-                    active_move.origin, active_move.destination
-                )
-                stones += int(bool(state.boards[active_move.board][midpoint]))
+            if midpoint is not None:
+                stones += int(board[midpoint] is not None)
 
             if active_move.push_destination is not None:
-                stones += int(
-                    bool(
-                        state.boards[active_move.board][
-                            active_move.push_destination
-                        ]
-                    )
-                )
+                stones += int(board[active_move.push_destination] is not None)
 
             if stones > 1:
                 return ValidationResult(
@@ -434,12 +1050,8 @@ class GameEngine:
                 )
 
             if (
-                midpoint is not None
-                and state.boards[active_move.board][midpoint]
-                == state.player_turn
-            ) or state.boards[active_move.board][
-                active_move.destination
-            ] == state.player_turn:
+                midpoint is not None and board[midpoint] == state.player_turn
+            ) or board[active_move.destination] == state.player_turn:
                 return ValidationResult(
                     False, "you can't push your own color stones"
                 )
@@ -449,21 +1061,22 @@ class GameEngine:
     @staticmethod
     def is_move_push(move: BoardMove, board: BoardType) -> bool:
         direction = GameEngine.get_move_direction(move.origin, move.destination)
-        if direction.length == 2:
-            midpoint = GameEngine.get_move_midpoint(
-                move.origin, move.destination
-            )
-            if board[midpoint] is not None:
-                return True
+        midpoint = RAYS[move.origin][direction.cardinal][
+            direction.length
+        ].midpoint
+        if midpoint is not None and board[midpoint] is not None:
+            return True
         if board[move.destination] is not None:
             return True
         return False
 
+    # only meaningful for length 2 moves
     @staticmethod
     def get_move_midpoint(
         origin: CoordinateType, destination: CoordinateType
     ) -> CoordinateType:
-        midpoint = origin + ((destination - origin) // 2)
+        direction = GameEngine.get_move_direction(origin, destination)
+        midpoint = RAYS[origin][direction.cardinal][direction.length].midpoint
         return cast(CoordinateType, midpoint)
 
     # length is Literal[1, 2, 3] so that this function can also calculate a push coordinate
@@ -473,65 +1086,66 @@ class GameEngine:
         direction: CardinalNumberType,
         length: Literal[1, 2, 3],
     ) -> Optional[CoordinateType]:
-        x = origin % 4
-        y = origin // 4
-
-        if direction == 7 or direction < 2:
-            y -= length
-        if direction > 2 and direction < 6:
-            y += length
-        if direction > 4:
-            x -= length
-        if direction > 0 and direction < 4:
-            x += length
-
-        if x < 0 or y < 0 or x > 3 or y > 3:
-            # out of bounds
-            return None
-        else:
-            return cast(CoordinateType, (y * 4) + x)
+        return RAYS[origin][direction][length].destination
 
     @staticmethod
-    def get_move_direction(origin: CoordinateType, destination: CoordinateType):
-        origin_x = origin % 4
-        origin_y = origin // 4
-        destination_x = destination % 4
-        destination_y = destination // 4
-        x_move = abs(origin_x - destination_x)
-        y_move = abs(origin_y - destination_y)
-        move_length = max(x_move, y_move)
-
-        if (x_move == 0 and y_move == 0) or (
-            x_move > 0 and y_move > 0 and x_move != y_move
-        ):
-            # only allow non-null, pure othogonal / diagonal moves
-            raise Exception(
-                f"invalid direction: origin: {origin}, destination: {destination}"
-            )
+    def get_move_direction(
+        origin: CoordinateType, destination: CoordinateType
+    ) -> Direction:
+        direction = MOVE_DIRECTIONS[origin][destination]
+        if direction is not None:
+            return direction
 
-        cardinal = 0
-        if origin_x == destination_x:
-            if origin_y > destination_y:
-                cardinal = 0  # north
-            if origin_y < destination_y:
-                cardinal = 4  # south
-        if origin_y == destination_y:
-            if origin_x < destination_x:
-                cardinal = 2  # east
-            if origin_x > destination_x:
-                cardinal = 6  # west
-        if origin_x < destination_x:
-            if origin_y > destination_y:
-                cardinal = 1  # north-east
-            if origin_y < destination_y:
-                cardinal = 3  # south-east
-        if origin_x > destination_x:
-            if origin_y < destination_y:
-                cardinal = 5  # south-west
-            if origin_y > destination_y:
-                cardinal = 7  # north-west
-
-        return Direction(
-            cardinal=cast(CardinalNumberType, cardinal),
-            length=cast(MoveLengthType, move_length),
+        if any(RAYS[origin][i][3].destination == destination for i in range(8)):
+            raise ValueError("length must be 1 or 2, got 3")
+
+        # only allow non-null, pure othogonal / diagonal moves
+        raise Exception(
+            f"invalid direction: origin: {origin}, destination: {destination}"
         )
+
+
+# 16 bit move codes: passive square (6 bits), active square (6 bits) and
+# direction index (4 bits), with squares as board * 16 + coordinate and the
+# direction index as cardinal * 2 + length - 1. the player is implied by the
+# passive board, and whether the active part pushes by the position
+MOVE_CODE_LIMIT = 1 << 16
+
+
+def encode_move(move: Move) -> int:
+    return (
+        (((move.passive.board * 16) + move.passive.origin) << 10)
+        | (((move.active.board * 16) + move.active.origin) << 4)
+        | ((move.direction.cardinal * 2) + move.direction.length - 1)
+    )
+
+
+def split_move_code(code: int) -> RawMove:
+    """
+    (passive square, active square, direction index), the triple used by
+    GameEngine._generate_moves
+    """
+    return code >> 10, (code >> 4) & 63, code & 15
+
+
+def decode_move(code: int, boards: Union[BoardsType, BitBoards]) -> Move:
+    """
+    builds the Move for `code` in the position `boards`. the move isn't
+    checked for legality, only for fitting on the boards
+    """
+    if not 0 <= code < MOVE_CODE_LIMIT:
+        raise ValueError(f"move code out of range: {code}")
+    passive_square, active_square, index = split_move_code(code)
+    passive_board = passive_square >> 4
+    player = cast(PlayerNumberType, passive_board >> 1)
+    if (active_square >> 4) not in ACTIVE_BOARDS[passive_board]:
+        raise ValueError(f"move code pairs the wrong boards: {code}")
+    if RAY_MASKS[passive_square][index] is None or (
+        RAY_MASKS[active_square][index] is None
+    ):
+        raise ValueError(f"move code leaves the board: {code}")
+    if not isinstance(boards, BitBoards):
+        boards = BitBoards.from_boards(boards)
+    return GameEngine._generated_move(
+        boards, player, passive_square, active_square, index
+    )
@@ -0,0 +1,107 @@
+"""
+perft: counts the leaf nodes of the legal move tree to a fixed depth. the
+counts are checked against a known table in test_engine.py, and the
+benchmark mode tracks move generation throughput.
+
+    python -m app.game.perft --depth 2
+    python -m app.game.perft --depth 2 --divide
+    python -m app.game.perft --depth 3 --bench
+"""
+
+import argparse
+import time
+from typing import Dict
+from app.game.engine import (
+    BitBoards,
+    GameEngine,
+    GameState,
+    move_notation,
+)
+from app.game.types import PlayerNumberType
+
+
+def perft(state: GameState, depth: int) -> int:
+    if depth == 0:
+        return 1
+    if state.winner is not None:
+        return 0
+    boards = state.boards
+    if not isinstance(boards, BitBoards):
+        boards = BitBoards.from_boards(boards)
+    return _perft(boards, state.player_turn, depth)
+
+
+def _perft(boards: BitBoards, player: PlayerNumberType, depth: int) -> int:
+    if depth == 1:
+        return GameEngine._count_moves(boards, player)
+
+    nodes = 0
+    opponent: PlayerNumberType = 1 if player == 0 else 0
+    for passive_square, active_square, index in GameEngine._generate_moves(
+        boards, player
+    ):
+        child, won = GameEngine._apply_generated_move(
+            boards, player, passive_square, active_square, index
+        )
+        if not won:
+            nodes += _perft(child, opponent, depth - 1)
+    return nodes
+
+
+def divide(state: GameState, depth: int) -> Dict[str, int]:
+    """
+    perft broken down by root move, keyed by move notation
+    """
+    results: Dict[str, int] = {}
+    for move in GameEngine.legal_moves(state):
+        child = GameEngine.apply_move(state, move).state
+        results[move_notation(move)] = perft(child, depth - 1)
+    return results
+
+
+def benchmark(state: GameState, depth: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    nodes = perft(state, depth)
+    elapsed = time.perf_counter() - start
+    return {
+        "nodes": nodes,
+        "seconds": elapsed,
+        "nodes_per_second": nodes / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="shobu move generator perft")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument(
+        "--divide", action="store_true", help="break counts down by root move"
+    )
+    parser.add_argument(
+        "--bench", action="store_true", help="report nodes per second"
+    )
+    args = parser.parse_args()
+
+    state = GameState.initial_state()
+    state = GameState(
+        boards=BitBoards.from_boards(state.boards),
+        player_turn=state.player_turn,
+    )
+
+    if args.divide:
+        results = divide(state, args.depth)
+        for notation, nodes in sorted(results.items()):
+            print(f"{notation}: {nodes}")
+        print(f"moves: {len(results)}")
+        print(f"nodes: {sum(results.values())}")
+    elif args.bench:
+        result = benchmark(state, args.depth)
+        print(
+            f"depth {args.depth}: {result['nodes']} nodes in "
+            f"{result['seconds']:.3f}s ({result['nodes_per_second']:,.0f} nodes/s)"
+        )
+    else:
+        print(perft(state, args.depth))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+mutable position for search. GameEngine.apply_move validates the move and
+builds a new GameState with copied boards on every call, which is right for
+the web layer but too slow for a search that visits millions of positions.
+SearchPosition changes its stones and zobrist key in place instead: make()
+applies a move from GameEngine._generate_moves without validating it and
+returns a small int that unmake() uses to take the move back.
+"""
+
+from typing import List, Optional
+from app.game.engine import (
+    BOARD_MASKS,
+    RAY_MASKS,
+    ZOBRIST_KEYS,
+    ZOBRIST_WHITE_TO_MOVE,
+    BitBoards,
+    GameState,
+    zobrist_hash,
+)
+from app.game.types import PlayerNumberType
+
+# undo info packs the move code (passive square << 10 | active square << 4 |
+# direction index) in the low 16 bits, then the square + 1 of the stone the
+# move pushed and the square + 1 it was pushed to, 7 bits each (0 for none)
+_PUSHED_SHIFT = 16
+_PUSHED_TO_SHIFT = 23
+
+
+class SearchPosition:
+    __slots__ = ("stones", "player", "key", "won")
+
+    def __init__(
+        self,
+        boards: BitBoards,
+        player: PlayerNumberType,
+        key: Optional[int] = None,
+    ):
+        # [black, white] bitboards, indexable by player like BitBoards, so
+        # GameEngine._generate_moves can read them directly
+        self.stones: List[int] = [boards.black, boards.white]
+        self.player = player
+        self.key = zobrist_hash(boards, player) if key is None else key
+        # whether the last move made won the game
+        self.won = False
+
+    @classmethod
+    def from_state(cls, state: GameState) -> "SearchPosition":
+        boards = state.boards
+        if not isinstance(boards, BitBoards):
+            boards = BitBoards.from_boards(boards)
+        return cls(boards, state.player_turn, state.key)
+
+    @property
+    def boards(self) -> BitBoards:
+        return BitBoards(self.stones[0], self.stones[1])
+
+    def make(self, passive_square: int, active_square: int, index: int) -> int:
+        """
+        plays a move from GameEngine._generate_moves for the player to move
+        and returns the undo info for unmake()
+        """
+        player = self.player
+        opponent = 1 - player
+        stones = self.stones
+        own_keys = ZOBRIST_KEYS[player]
+        passive_destination = RAY_MASKS[passive_square][index][0]
+        active_destination, path, push = RAY_MASKS[active_square][index]
+
+        stones[player] ^= (
+            (1 << passive_square)
+            | passive_destination
+            | (1 << active_square)
+            | active_destination
+        )
+        key = (
+            self.key
+            ^ own_keys[passive_square]
+            ^ own_keys[passive_destination.bit_length() - 1]
+            ^ own_keys[active_square]
+            ^ own_keys[active_destination.bit_length() - 1]
+            ^ ZOBRIST_WHITE_TO_MOVE
+        )
+        undo = (passive_square << 10) | (active_square << 4) | index
+
+        pushed = stones[opponent] & path
+        if pushed:
+            opponent_keys = ZOBRIST_KEYS[opponent]
+            stones[opponent] ^= pushed | push
+            key ^= opponent_keys[pushed.bit_length() - 1]
+            undo |= pushed.bit_length() << _PUSHED_SHIFT
+            if push:
+                key ^= opponent_keys[push.bit_length() - 1]
+                undo |= push.bit_length() << _PUSHED_TO_SHIFT
+            self.won = not (stones[opponent] & BOARD_MASKS[active_square >> 4])
+        else:
+            self.won = False
+
+        self.key = key
+        self.player = opponent
+        return undo
+
+    def unmake(self, undo: int):
+        """
+        takes back the move that returned `undo`, which must be the last
+        move made
+        """
+        opponent = self.player
+        player = 1 - opponent
+        stones = self.stones
+        own_keys = ZOBRIST_KEYS[player]
+        passive_square = (undo >> 10) & 0x3F
+        active_square = (undo >> 4) & 0x3F
+        index = undo & 0xF
+        passive_destination = RAY_MASKS[passive_square][index][0]
+        active_destination = RAY_MASKS[active_square][index][0]
+
+        stones[player] ^= (
+            (1 << passive_square)
+            | passive_destination
+            | (1 << active_square)
+            | active_destination
+        )
+        key = (
+            self.key
+            ^ own_keys[passive_square]
+            ^ own_keys[passive_destination.bit_length() - 1]
+            ^ own_keys[active_square]
+            ^ own_keys[active_destination.bit_length() - 1]
+            ^ ZOBRIST_WHITE_TO_MOVE
+        )
+
+        pushed = (undo >> _PUSHED_SHIFT) & 0x7F
+        if pushed:
+            opponent_keys = ZOBRIST_KEYS[opponent]
+            stones[opponent] ^= 1 << (pushed - 1)
+            key ^= opponent_keys[pushed - 1]
+            pushed_to = undo >> _PUSHED_TO_SHIFT
+            if pushed_to:
+                stones[opponent] ^= 1 << (pushed_to - 1)
+                key ^= opponent_keys[pushed_to - 1]
+
+        self.key = key
+        self.player = player
+        self.won = False
@@ -0,0 +1,150 @@
+"""
+glicko-2 player ratings (glickman, "example of the glicko-2 system"). every
+rated game is its own rating period, so both players' ratings move as soon
+as it finishes. the leaderboard ranks players by the conservative rating,
+rating - 2 * deviation, so a few lucky games don't top it.
+
+replay_ratings() recomputes ratings from a list of results and is top level,
+so the batch recompute can run it per group of players in worker processes.
+"""
+
+import math
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+# glicko-1 scale, and the glicko-2 scale's factor from it
+DEFAULT_RATING = 1500.0
+DEFAULT_DEVIATION = 350.0
+DEFAULT_VOLATILITY = 0.06
+SCALE = 173.7178
+# constrains the change in volatility, glickman suggests 0.3 to 1.2
+TAU = 0.5
+CONVERGENCE = 1e-6
+
+
+class Rating(NamedTuple):
+    rating: float = DEFAULT_RATING
+    deviation: float = DEFAULT_DEVIATION
+    volatility: float = DEFAULT_VOLATILITY
+
+    @property
+    def conservative(self) -> float:
+        return self.rating - (2 * self.deviation)
+
+
+def _g(phi: float) -> float:
+    return 1 / math.sqrt(1 + (3 * phi * phi / (math.pi * math.pi)))
+
+
+def _volatility(sigma: float, phi: float, v: float, delta: float) -> float:
+    # step 5: solve for the new volatility with the illinois algorithm
+    a = math.log(sigma * sigma)
+
+    def f(x: float) -> float:
+        ex = math.exp(x)
+        return (ex * (delta * delta - phi * phi - v - ex)) / (
+            2 * (phi * phi + v + ex) ** 2
+        ) - ((x - a) / (TAU * TAU))
+
+    low = a
+    if delta * delta > phi * phi + v:
+        high = math.log(delta * delta - phi * phi - v)
+    else:
+        k = 1
+        while f(a - (k * TAU)) < 0:
+            k += 1
+        high = a - (k * TAU)
+
+    f_low = f(low)
+    f_high = f(high)
+    while abs(high - low) > CONVERGENCE:
+        middle = low + ((low - high) * f_low / (f_high - f_low))
+        f_middle = f(middle)
+        if f_middle * f_high <= 0:
+            low, f_low = high, f_high
+        else:
+            f_low /= 2
+        high, f_high = middle, f_middle
+    return math.exp(low / 2)
+
+
+def update(player: Rating, results: Iterable[Tuple[Rating, float]]) -> Rating:
+    """
+    `player`'s rating after a rating period with (opponent, score) results,
+    scoring 1 for a win and 0 for a loss
+    """
+    mu = (player.rating - DEFAULT_RATING) / SCALE
+    phi = player.deviation / SCALE
+    terms = []
+    for opponent, score in results:
+        g = _g(opponent.deviation / SCALE)
+        expected = 1 / (
+            1
+            + math.exp(-g * (mu - ((opponent.rating - DEFAULT_RATING) / SCALE)))
+        )
+        terms.append((g, expected, score))
+    if not terms:
+        # step 6 only: the deviation grows while a player sits out
+        phi = math.sqrt(phi * phi + player.volatility * player.volatility)
+        return Rating(player.rating, phi * SCALE, player.volatility)
+
+    v = 1 / sum(g * g * expected * (1 - expected) for g, expected, _ in terms)
+    improvement = sum(g * (score - expected) for g, expected, score in terms)
+    sigma = _volatility(player.volatility, phi, v, v * improvement)
+    phi_star = math.sqrt(phi * phi + sigma * sigma)
+    new_phi = 1 / math.sqrt((1 / (phi_star * phi_star)) + (1 / v))
+    new_mu = mu + (new_phi * new_phi * improvement)
+    return Rating((new_mu * SCALE) + DEFAULT_RATING, new_phi * SCALE, sigma)
+
+
+def rate_game(winner: Rating, loser: Rating) -> Tuple[Rating, Rating]:
+    """
+    both players' new ratings after one game, each from the ratings before it
+    """
+    return update(winner, [(loser, 1.0)]), update(loser, [(winner, 0.0)])
+
+
+# (rating, games, wins) per player
+RatingTable = Dict[int, Tuple[Rating, int, int]]
+
+
+def replay_ratings(results: List[Tuple[int, int]]) -> RatingTable:
+    """
+    ratings from scratch for (winner id, loser id) results in the order the
+    games finished
+    """
+    table: RatingTable = {}
+    new_player = (Rating(), 0, 0)
+    for winner_id, loser_id in results:
+        winner, winner_games, wins = table.get(winner_id, new_player)
+        loser, loser_games, loser_wins = table.get(loser_id, new_player)
+        winner, loser = rate_game(winner, loser)
+        table[winner_id] = (winner, winner_games + 1, wins + 1)
+        table[loser_id] = (loser, loser_games + 1, loser_wins)
+    return table
+
+
+def independent_groups(
+    results: List[Tuple[int, int]],
+) -> List[List[Tuple[int, int]]]:
+    """
+    splits results into groups of players that never played anyone outside
+    their group, keeping each group's order. ratings in one group don't
+    depend on any other, so groups can be replayed in parallel
+    """
+    parent: Dict[int, int] = {}
+
+    def find(player: int) -> int:
+        root = parent.setdefault(player, player)
+        while root != parent[root]:
+            root = parent[root]
+        while player != root:
+            parent[player], player = root, parent[player]
+        return root
+
+    for winner_id, loser_id in results:
+        parent[find(winner_id)] = find(loser_id)
+
+    groups: Dict[int, List[Tuple[int, int]]] = {}
+    for result in results:
+        groups.setdefault(find(result[0]), []).append(result)
+    return list(groups.values())
@@ -0,0 +1,144 @@
+"""
+binary game records. a record is a 12 byte header followed by the game's
+moves as little endian 16 bit move codes (see engine.encode_move), starting
+from the initial position:
+
+    magic    4 bytes  b"SHBR"
+    version  uint8
+    winner   int8     0 / 1, or -1 for none
+    reserved uint16
+    plies    uint32
+
+records can be concatenated into one file, and open_records memory-maps it
+and hands out each record's moves as a memoryview without copying or
+parsing them.
+"""
+
+import mmap
+import struct
+import sys
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional
+from app.game.engine import (
+    BitBoards,
+    GameEngine,
+    GameState,
+    Move,
+    decode_move,
+    encode_move,
+    split_move_code,
+)
+from app.game.types import PlayerNumberType
+
+MAGIC = b"SHBR"
+VERSION = 1
+HEADER = struct.Struct("<4sBbHI")
+
+
+class GameRecord(NamedTuple):
+    winner: Optional[PlayerNumberType]
+    # uint16 move codes
+    moves: memoryview
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+
+def pack_record(
+    moves: Iterable[Move], winner: Optional[PlayerNumberType] = None
+) -> bytes:
+    codes = [encode_move(move) for move in moves]
+    header = HEADER.pack(
+        MAGIC, VERSION, -1 if winner is None else winner, 0, len(codes)
+    )
+    return header + struct.pack(f"<{len(codes)}H", *codes)
+
+
+def write_record(
+    file: BinaryIO,
+    moves: Iterable[Move],
+    winner: Optional[PlayerNumberType] = None,
+):
+    file.write(pack_record(moves, winner))
+
+
+def _move_codes(buffer: memoryview) -> memoryview:
+    if sys.byteorder == "little":
+        return buffer.cast("H")
+    # big endian hosts pay for one copy
+    codes = struct.unpack(f"<{len(buffer) // 2}H", buffer)
+    return memoryview(struct.pack(f"={len(codes)}H", *codes)).cast("H")
+
+
+def read_records(buffer) -> Iterator[GameRecord]:
+    view = memoryview(buffer).cast("B")
+    offset = 0
+    while offset < len(view):
+        magic, version, winner, _, plies = HEADER.unpack_from(view, offset)
+        if magic != MAGIC:
+            raise ValueError(f"not a game record at byte {offset}")
+        if version != VERSION:
+            raise ValueError(f"unsupported record version {version}")
+        start = offset + HEADER.size
+        end = start + (plies * 2)
+        if end > len(view):
+            raise ValueError(f"truncated game record at byte {offset}")
+        yield GameRecord(
+            winner=None if winner == -1 else winner,
+            moves=_move_codes(view[start:end]),
+        )
+        offset = end
+
+
+@contextmanager
+def open_records(path: str) -> Iterator[Iterator[GameRecord]]:
+    """
+    memory-maps a record file and iterates over its records
+    """
+    with open(path, "rb") as file:
+        if file.seek(0, 2) == 0:
+            yield iter(())
+            return
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    records = read_records(mapped)
+    try:
+        yield records
+    finally:
+        records.close()
+        try:
+            mapped.close()
+        except BufferError:
+            # the caller still holds a moves view, the map is released
+            # along with it
+            pass
+
+
+def replay(record: GameRecord) -> Iterator[GameState]:
+    """
+    the position after each move of the record, starting with the initial
+    position
+    """
+    state = GameState.initial_state()
+    boards = BitBoards.from_boards(state.boards)
+    player = state.player_turn
+    yield GameState(boards=boards, player_turn=player)
+    for code in record.moves:
+        boards, won = GameEngine._apply_generated_move(
+            boards, player, *split_move_code(code)
+        )
+        player = 1 if player == 0 else 0
+        yield GameState(
+            boards=boards,
+            player_turn=player,
+            winner=(1 - player) if won else None,
+        )
+
+
+def record_moves(record: GameRecord) -> Iterator[Move]:
+    boards = BitBoards.from_boards(GameState.initial_state().boards)
+    for code in record.moves:
+        move = decode_move(code, boards)
+        boards, _ = GameEngine._apply_generated_move(
+            boards, move.player, *split_move_code(code)
+        )
+        yield move
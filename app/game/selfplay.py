@@ -0,0 +1,218 @@
+"""
+plays AI vs AI games over a process pool and streams one JSON record per
+game to disk as games finish, then reports games/s, average plies and win
+rates per pairing. runs headless: no flask app or database.
+
+    python -m app.game.selfplay --pairing rando:search --games 200 \\
+        --workers 8 --move-time 0.05 --output records.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from app.game.engine import GameEngine, GameState, encode_move, move_notation
+from app.game.ai.mcts import MCTSAI
+from app.game.ai.rando import RandoAI
+from app.game.ai.search import SearchAI
+
+
+def _make_rando(move_time: float, seed: int):
+    return RandoAI(seed=seed)
+
+
+def _make_search(move_time: float, seed: int):
+    return SearchAI(time_budget=move_time)
+
+
+def _make_mcts(move_time: float, seed: int):
+    # pool workers can't start pools of their own, so playouts stay serial
+    return MCTSAI(time_budget=move_time, workers=1, seed=seed)
+
+
+AI_FACTORIES: Dict[str, Callable] = {
+    "rando": _make_rando,
+    "search": _make_search,
+    "mcts": _make_mcts,
+}
+
+# (black, white, seed, move time, ply limit)
+GameJob = Tuple[str, str, int, float, int]
+
+
+def play_game(job: GameJob) -> dict:
+    """
+    plays one game and returns its record. a player with no legal moves
+    loses, and a game that reaches the ply limit is a draw (winner None)
+    """
+    black_name, white_name, seed, move_time, max_plies = job
+    players = (
+        AI_FACTORIES[black_name](move_time, seed),
+        AI_FACTORIES[white_name](move_time, seed + 1),
+    )
+    state = GameState.initial_state()
+    moves: List[str] = []
+    codes: List[int] = []
+    winner = None
+
+    while len(moves) < max_plies:
+        move = players[state.player_turn].generate_move(state)
+        if move is None:
+            winner = 1 - state.player_turn
+            break
+        moves.append(move_notation(move))
+        codes.append(encode_move(move))
+        state = GameEngine.apply_move(state, move).state
+        if state.winner is not None:
+            winner = state.winner
+            break
+
+    for player in players:
+        close = getattr(player, "close", None)
+        if close is not None:
+            close()
+
+    return {
+        "black": black_name,
+        "white": white_name,
+        "seed": seed,
+        "winner": winner,
+        "plies": len(moves),
+        "moves": moves,
+        "codes": codes,
+    }
+
+
+@dataclass
+class PairingStats:
+    games: int = 0
+    plies: int = 0
+    draws: int = 0
+    wins: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def add(self, record: dict):
+        self.games += 1
+        self.plies += record["plies"]
+        if record["winner"] is None:
+            self.draws += 1
+        else:
+            self.wins[
+                record["black" if record["winner"] == 0 else "white"]
+            ] += 1
+
+
+def parse_pairing(text: str) -> Tuple[str, str]:
+    first, _, second = text.partition(":")
+    for name in (first, second):
+        if name not in AI_FACTORIES:
+            raise argparse.ArgumentTypeError(
+                f"unknown AI {name!r}, choose from {sorted(AI_FACTORIES)}"
+            )
+    return first, second
+
+
+def build_jobs(
+    pairings: List[Tuple[str, str]],
+    games: int,
+    move_time: float,
+    max_plies: int,
+    seed: int,
+) -> List[GameJob]:
+    """
+    `games` games per pairing, alternating which AI plays black
+    """
+    rng = random.Random(seed)
+    jobs: List[GameJob] = []
+    for first, second in pairings:
+        for game in range(games):
+            black, white = (first, second) if game % 2 == 0 else (second, first)
+            jobs.append(
+                (black, white, rng.getrandbits(31), move_time, max_plies)
+            )
+    return jobs
+
+
+def run(
+    jobs: List[GameJob],
+    output,
+    workers: int,
+    log=sys.stderr,
+) -> Dict[Tuple[str, str], PairingStats]:
+    stats: Dict[Tuple[str, str], PairingStats] = defaultdict(PairingStats)
+    start = time.perf_counter()
+
+    def record_game(record: dict):
+        output.write(json.dumps(record, separators=(",", ":")) + "\n")
+        output.flush()
+        pairing = tuple(sorted((record["black"], record["white"])))
+        stats[pairing].add(record)
+
+    if workers <= 1:
+        for job in jobs:
+            record_game(play_game(job))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for record in pool.imap_unordered(play_game, jobs):
+                record_game(record)
+
+    elapsed = time.perf_counter() - start
+    total = sum(pairing.games for pairing in stats.values())
+    print(
+        f"{total} games in {elapsed:.1f}s ({total / elapsed:.2f} games/s)",
+        file=log,
+    )
+    for (first, second), pairing in sorted(stats.items()):
+        rates = ", ".join(
+            f"{name} {pairing.wins[name] / pairing.games:.1%}"
+            for name in sorted({first, second})
+        )
+        print(
+            f"{first} vs {second}: {pairing.games} games, "
+            f"{pairing.games / elapsed:.2f} games/s, "
+            f"{pairing.plies / pairing.games:.1f} plies/game, "
+            f"wins {rates}, draws {pairing.draws / pairing.games:.1%}",
+            file=log,
+        )
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="shobu AI self-play")
+    parser.add_argument(
+        "--pairing",
+        type=parse_pairing,
+        action="append",
+        required=True,
+        help="two AIs as black:white, eg. rando:search. can be repeated",
+    )
+    parser.add_argument("--games", type=int, default=100, help="per pairing")
+    parser.add_argument(
+        "--workers", type=int, default=multiprocessing.cpu_count()
+    )
+    parser.add_argument(
+        "--move-time", type=float, default=0.1, help="seconds per AI move"
+    )
+    parser.add_argument("--max-plies", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default="-", help="JSON lines file, - for stdout"
+    )
+    args = parser.parse_args(argv)
+
+    jobs = build_jobs(
+        args.pairing, args.games, args.move_time, args.max_plies, args.seed
+    )
+    if args.output == "-":
+        run(jobs, sys.stdout, args.workers)
+    else:
+        with open(args.output, "a") as output:
+            run(jobs, output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+symmetries of shobu positions. the rules don't depend on orientation, so
+rotating or reflecting all four boards the same way gives an equivalent
+position (8 geometries). swapping the dark and light boards on both sides
+(a <-> b, c <-> d) keeps every player's home boards and every shade pairing,
+and swapping the colors (a <-> d, b <-> c, black <-> white) gives the same
+position for the other player to move.
+
+canonicalize() picks one representative out of those 32 positions, with
+black to move, so that tables keyed on canonical positions shrink by the
+symmetry factor.
+"""
+
+from typing import NamedTuple, Optional, Tuple, cast
+from app.game.engine import (
+    CARDINAL_STEPS,
+    DIRECTIONS,
+    BitBoards,
+    BoardMove,
+    GameState,
+    Move,
+)
+from app.game.types import (
+    BoardNumberType,
+    CardinalNumberType,
+    CoordinateType,
+    GameEndType,
+    PlayerNumberType,
+)
+
+
+class Transform(NamedTuple):
+    # black <-> white, with boards a <-> d and b <-> c
+    swap_colors: bool
+    # a <-> b and c <-> d
+    swap_shades: bool
+    # 0-3: rotate clockwise by that many quarter turns, 4-7: the same
+    # followed by a left-right mirror
+    geometry: int
+
+
+IDENTITY = Transform(False, False, 0)
+
+
+def _transform_xy(x: int, y: int, geometry: int) -> Tuple[int, int]:
+    for _ in range(geometry % 4):
+        x, y = 3 - y, x
+    if geometry >= 4:
+        x = 3 - x
+    return x, y
+
+
+def _transform_step(x: int, y: int, geometry: int) -> Tuple[int, int]:
+    for _ in range(geometry % 4):
+        x, y = -y, x
+    if geometry >= 4:
+        x = -x
+    return x, y
+
+
+def _transform_coordinate(coordinate: int, geometry: int) -> int:
+    x, y = _transform_xy(coordinate % 4, coordinate // 4, geometry)
+    return (y * 4) + x
+
+
+# COORDINATE_MAPS[geometry][coordinate] -> coordinate
+COORDINATE_MAPS = tuple(
+    tuple(
+        _transform_coordinate(coordinate, geometry) for coordinate in range(16)
+    )
+    for geometry in range(8)
+)
+
+# CARDINAL_MAPS[geometry][cardinal] -> cardinal
+CARDINAL_MAPS = tuple(
+    tuple(
+        CARDINAL_STEPS.index(
+            _transform_step(*CARDINAL_STEPS[cardinal], geometry)
+        )
+        for cardinal in range(8)
+    )
+    for geometry in range(8)
+)
+
+INVERSE_GEOMETRIES = tuple(
+    next(
+        inverse
+        for inverse in range(8)
+        if all(
+            COORDINATE_MAPS[inverse][COORDINATE_MAPS[geometry][coordinate]]
+            == coordinate
+            for coordinate in range(16)
+        )
+    )
+    for geometry in range(8)
+)
+
+
+def _build_byte_tables(geometry: int, high: bool) -> Tuple[int, ...]:
+    offset = 8 if high else 0
+    table = []
+    for byte in range(256):
+        bits = 0
+        for bit in range(8):
+            if (byte >> bit) & 1:
+                bits |= 1 << COORDINATE_MAPS[geometry][bit + offset]
+        table.append(bits)
+    return tuple(table)
+
+
+# a 16 bit board maps through a geometry as LOW[bits & 0xFF] | HIGH[bits >> 8]
+_LOW_TABLES = tuple(
+    _build_byte_tables(geometry, False) for geometry in range(8)
+)
+_HIGH_TABLES = tuple(
+    _build_byte_tables(geometry, True) for geometry in range(8)
+)
+
+
+def board_map(transform: Transform) -> Tuple[int, int, int, int]:
+    boards = [0, 1, 2, 3]
+    if transform.swap_colors:
+        boards = [3 - board for board in boards]
+    if transform.swap_shades:
+        boards = [board ^ 1 for board in boards]
+    return cast(Tuple[int, int, int, int], tuple(boards))
+
+
+def inverse(transform: Transform) -> Transform:
+    # the board and color swaps are their own inverses, and commute with
+    # the geometry
+    return transform._replace(geometry=INVERSE_GEOMETRIES[transform.geometry])
+
+
+def _transform_stones(
+    stones: int, geometry: int, boards: Tuple[int, int, int, int]
+) -> int:
+    low = _LOW_TABLES[geometry]
+    high = _HIGH_TABLES[geometry]
+    result = 0
+    for board in range(4):
+        bits = (stones >> (board * 16)) & 0xFFFF
+        result |= (low[bits & 0xFF] | high[bits >> 8]) << (boards[board] * 16)
+    return result
+
+
+def transform_bitboards(boards: BitBoards, transform: Transform) -> BitBoards:
+    mapping = board_map(transform)
+    black = _transform_stones(boards.black, transform.geometry, mapping)
+    white = _transform_stones(boards.white, transform.geometry, mapping)
+    if transform.swap_colors:
+        return BitBoards(white, black)
+    return BitBoards(black, white)
+
+
+def _transform_player(player: PlayerNumberType, transform: Transform):
+    if transform.swap_colors:
+        return cast(PlayerNumberType, 1 - player)
+    return player
+
+
+def transform_state(state: GameState, transform: Transform) -> GameState:
+    boards = state.boards
+    is_bitboards = isinstance(boards, BitBoards)
+    if not is_bitboards:
+        boards = BitBoards.from_boards(boards)
+    new_boards = transform_bitboards(boards, transform)
+
+    winner: Optional[GameEndType] = state.winner
+    if winner == 0 or winner == 1:
+        winner = _transform_player(winner, transform)
+
+    return GameState(
+        boards=new_boards if is_bitboards else new_boards.to_boards(),
+        player_turn=_transform_player(state.player_turn, transform),
+        winner=winner,
+    )
+
+
+def _transform_board_move(
+    board_move: BoardMove,
+    coordinates: Tuple[int, ...],
+    boards: Tuple[int, int, int, int],
+) -> BoardMove:
+    push_destination = board_move.push_destination
+    if push_destination is not None:
+        push_destination = cast(CoordinateType, coordinates[push_destination])
+    return BoardMove.trusted(
+        cast(BoardNumberType, boards[board_move.board]),
+        cast(CoordinateType, coordinates[board_move.origin]),
+        cast(CoordinateType, coordinates[board_move.destination]),
+        board_move.is_push,
+        push_destination,
+    )
+
+
+def transform_move(move: Move, transform: Transform) -> Move:
+    coordinates = COORDINATE_MAPS[transform.geometry]
+    boards = board_map(transform)
+    cardinal = cast(
+        CardinalNumberType,
+        CARDINAL_MAPS[transform.geometry][move.direction.cardinal],
+    )
+    return Move.trusted(
+        _transform_player(move.player, transform),
+        _transform_board_move(move.passive, coordinates, boards),
+        _transform_board_move(move.active, coordinates, boards),
+        DIRECTIONS[cardinal][move.direction.length - 1],
+    )
+
+
+def untransform_move(move: Move, transform: Transform) -> Move:
+    """
+    maps a move in the transformed (eg. canonical) position back to the
+    original position
+    """
+    return transform_move(move, inverse(transform))
+
+
+def canonical_bitboards(
+    boards: BitBoards, player_turn: PlayerNumberType
+) -> Tuple[BitBoards, Transform]:
+    swap_colors = player_turn == 1
+    best: Optional[BitBoards] = None
+    best_transform = IDENTITY
+    for swap_shades in (False, True):
+        for geometry in range(8):
+            transform = Transform(swap_colors, swap_shades, geometry)
+            candidate = transform_bitboards(boards, transform)
+            if best is None or candidate < best:
+                best = candidate
+                best_transform = transform
+    return cast(BitBoards, best), best_transform
+
+
+def canonicalize(state: GameState) -> Tuple[GameState, Transform]:
+    """
+    returns the canonical representative of `state` (always black to move)
+    and the transform that maps `state` onto it. moves found in the
+    canonical position map back with untransform_move
+    """
+    boards = state.boards
+    if not isinstance(boards, BitBoards):
+        boards = BitBoards.from_boards(boards)
+    _, transform = canonical_bitboards(boards, state.player_turn)
+    return transform_state(state, transform), transform
@@ -0,0 +1,398 @@
+"""
+board-local endgame tablebase. a shobu game is lost by losing every stone on
+any one board, so the tablebase solves single boards with few stones as a
+game of their own: the side to move makes one active move (pushes allowed)
+on the board or passes, and wins by pushing the opponent's last stone off.
+
+solving whole positions retrogradely isn't feasible, since even the
+smallest undecided positions (one stone of each color on all four boards)
+number in the billions. the local game assumes the side to move always has
+a passive move in the direction it needs, so results are an optimistic
+bound for that side rather than exact game values, and the search uses them
+as an evaluation term rather than to cut off.
+
+values are from the side to move's point of view: +n wins in n plies, -n
+loses in n plies, 0 is neither side forcing a win. positions are grouped by
+material class (own stones, opponent stones) and solved layer by layer of
+total stones, each layer's classes in parallel. the file is a header, a
+table of class offsets and one int8 per position, and probing is O(1):
+
+    python -m app.game.tablebase --max-stones 6 --workers 8 --output tb.bin
+"""
+
+import argparse
+import mmap
+import multiprocessing
+import struct
+import sys
+import time
+from itertools import combinations
+from math import comb
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.game.engine import (
+    BOARD_MASK,
+    RAY_MASKS,
+    BitBoards,
+    GameState,
+)
+from app.game.types import PlayerNumberType
+
+MAGIC = b"SHTB"
+VERSION = 1
+HEADER = struct.Struct("<4sBB2x")
+CLASS_ENTRY = struct.Struct("<II")
+
+# distances are capped to fit in a byte
+MAX_DISTANCE = 127
+# a board starts with 4 stones of each color, and stones are never added
+MAX_CLASS_STONES = 4
+DEFAULT_MAX_STONES = 6
+# evaluation bonus for a board the side to move wins in 1 ply, falling off
+# with the distance
+TABLEBASE_WEIGHT = 300
+
+# (own stones, opponent stones)
+MaterialClass = Tuple[int, int]
+
+
+def _build_subset_ranks() -> List[int]:
+    # colex rank of each 16 bit mask among the masks with its bit count. a
+    # mask with top bit t ranks comb(t, count) after the same mask without
+    # it, so the table doubles one top bit at a time
+    ranks = [0]
+    counts = [0]
+    for top in range(16):
+        row = [comb(top, count + 1) for count in range(top + 1)]
+        ranks += [rank + row[count] for rank, count in zip(ranks, counts)]
+        counts += [count + 1 for count in counts]
+    return ranks
+
+
+SUBSET_RANKS = _build_subset_ranks()
+
+# LOCAL_RAYS[coordinate] = [(destination bit, path bits, push bit or 0)]
+LOCAL_RAYS = tuple(
+    tuple(masks for masks in RAY_MASKS[coordinate] if masks is not None)
+    for coordinate in range(16)
+)
+
+
+def _compress(bits: int, free: int) -> int:
+    # moves the bits of `bits` that lie on `free` squares down next to each
+    # other, so the opponent's stones rank among the squares left over
+    result = 0
+    position = 0
+    while free:
+        bit = free & -free
+        free ^= bit
+        if bits & bit:
+            result |= 1 << position
+        position += 1
+    return result
+
+
+def class_size(material: MaterialClass) -> int:
+    own, opponent = material
+    return comb(16, own) * comb(16 - own, opponent)
+
+
+def position_index(own: int, opponent: int, material: MaterialClass) -> int:
+    free = BOARD_MASK & ~own
+    return (SUBSET_RANKS[own] * comb(16 - material[0], material[1])) + (
+        SUBSET_RANKS[_compress(opponent, free)]
+    )
+
+
+def local_moves(own: int, opponent: int) -> Iterator[Tuple[int, int]]:
+    """
+    (own, opponent) stones after each active move the side to move can make
+    on a single board
+    """
+    occupied = own | opponent
+    stones = own
+    while stones:
+        bit = stones & -stones
+        stones ^= bit
+        for destination, path, push in LOCAL_RAYS[bit.bit_length() - 1]:
+            if path & own:
+                continue
+            blocked = path & opponent
+            new_own = (own ^ bit) | destination
+            if not blocked:
+                yield new_own, opponent
+            elif not (blocked & (blocked - 1)) and not (push & occupied):
+                yield new_own, (opponent & ~path) | push
+
+
+def _positions(material: MaterialClass) -> Iterator[Tuple[int, int]]:
+    own_count, opponent_count = material
+    squares = range(16)
+    for own_squares in combinations(squares, own_count):
+        own = sum(1 << square for square in own_squares)
+        free = [square for square in squares if not own & (1 << square)]
+        for opponent_squares in combinations(free, opponent_count):
+            yield own, sum(1 << square for square in opponent_squares)
+
+
+def _solve_classes(
+    job: Tuple[List[MaterialClass], Dict[MaterialClass, bytes]],
+) -> Dict[MaterialClass, bytes]:
+    """
+    solves classes that only lead to each other (a class and its color swap,
+    linked by passes) or to the already solved `lower` classes, by
+    increasing distance: wins in n plies are positions with a move to a loss
+    in n - 1, losses in n are positions where every move (passing included)
+    is a win for the opponent, the slowest in n - 1
+    """
+    materials, lower = job
+    tables: Dict[MaterialClass, bytes | bytearray] = dict(lower)
+    for material in materials:
+        tables[material] = bytearray(class_size(material))
+
+    # (index, successors) of the positions still unsolved, where successors
+    # are (table, index) of the positions after each move, opponent to move
+    unsolved: Dict[MaterialClass, list] = {}
+    for material in materials:
+        values = tables[material]
+        pending = []
+        for own, opponent in _positions(material):
+            index = position_index(own, opponent, material)
+            successors = []
+            for new_own, new_opponent in local_moves(own, opponent):
+                if not new_opponent:
+                    values[index] = 1
+                    break
+                after = (new_opponent.bit_count(), material[0])
+                successors.append(
+                    (
+                        tables[after],
+                        position_index(new_opponent, new_own, after),
+                    )
+                )
+            else:
+                swapped = (material[1], material[0])
+                successors.append(
+                    (tables[swapped], position_index(opponent, own, swapped))
+                )
+                pending.append((index, successors))
+        unsolved[material] = pending
+
+    max_lower = max(
+        (
+            abs(_signed(value))
+            for table in lower.values()
+            for value in set(table)
+        ),
+        default=0,
+    )
+
+    distance = 1
+    idle_rounds = 0
+    while distance < MAX_DISTANCE and any(unsolved.values()):
+        distance += 1
+        changed = False
+        for material in materials:
+            values = tables[material]
+            still_unsolved = []
+            for index, successors in unsolved[material]:
+                if distance % 2:
+                    loss = (-(distance - 1)) & 0xFF
+                    solved = any(
+                        table[successor] == loss
+                        for table, successor in successors
+                    )
+                else:
+                    results = [
+                        _signed(table[successor])
+                        for table, successor in successors
+                    ]
+                    solved = min(results) > 0 and max(results) <= distance - 1
+                if solved:
+                    values[index] = (
+                        distance if distance % 2 else (-distance) & 0xFF
+                    )
+                    changed = True
+                else:
+                    still_unsolved.append((index, successors))
+            unsolved[material] = still_unsolved
+        idle_rounds = 0 if changed else idle_rounds + 1
+        if idle_rounds >= 2 and distance > max_lower + 1:
+            break
+
+    return {material: bytes(tables[material]) for material in materials}
+
+
+def _signed(value: int) -> int:
+    return value - 256 if value > 127 else value
+
+
+def material_classes(max_stones: int) -> List[MaterialClass]:
+    return [
+        (own, opponent)
+        for own in range(1, MAX_CLASS_STONES + 1)
+        for opponent in range(1, MAX_CLASS_STONES + 1)
+        if own + opponent <= max_stones
+    ]
+
+
+def generate(
+    max_stones: int = DEFAULT_MAX_STONES, workers: int = 1, log=None
+) -> Dict[MaterialClass, bytes]:
+    """
+    solves every class of up to `max_stones` stones on the board. a layer of
+    classes with the same total only depends on smaller totals, so each
+    layer's jobs (a class and its color swap) run in parallel
+    """
+    tables: Dict[MaterialClass, bytes] = {}
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        for total in range(2, max_stones + 1):
+            start = time.perf_counter()
+            jobs = []
+            for own, opponent in material_classes(max_stones):
+                if own + opponent != total or own > opponent:
+                    continue
+                materials = [(own, opponent)]
+                if own != opponent:
+                    materials.append((opponent, own))
+                # pushing off a stone leaves the opponent to move with one
+                # stone less of their own
+                lower = {
+                    (moved[1] - 1, moved[0]): tables[(moved[1] - 1, moved[0])]
+                    for moved in materials
+                    if moved[1] > 1
+                }
+                jobs.append((materials, lower))
+            if pool is not None:
+                results = pool.map(_solve_classes, jobs)
+            else:
+                results = [_solve_classes(job) for job in jobs]
+            for result in results:
+                tables.update(result)
+            if log is not None:
+                print(
+                    f"{total} stones: {len(jobs)} jobs in "
+                    f"{time.perf_counter() - start:.1f}s",
+                    file=log,
+                )
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return tables
+
+
+def pack_tablebase(
+    tables: Dict[MaterialClass, bytes], max_stones: int
+) -> bytes:
+    classes = material_classes(max_stones)
+    offset = HEADER.size + (len(classes) * CLASS_ENTRY.size)
+    chunks = [HEADER.pack(MAGIC, VERSION, max_stones)]
+    for material in classes:
+        chunks.append(CLASS_ENTRY.pack(offset, len(tables[material])))
+        offset += len(tables[material])
+    chunks.extend(tables[material] for material in classes)
+    return b"".join(chunks)
+
+
+class Tablebase:
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, version, max_stones = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("not a tablebase")
+        if version != VERSION:
+            raise ValueError(f"unsupported tablebase version {version}")
+        self.max_stones = max_stones
+        self._offsets: Dict[MaterialClass, int] = {}
+        for number, material in enumerate(material_classes(max_stones)):
+            offset, size = CLASS_ENTRY.unpack_from(
+                buffer, HEADER.size + (number * CLASS_ENTRY.size)
+            )
+            if size != class_size(material) or offset + size > len(buffer):
+                raise ValueError("truncated tablebase")
+            self._offsets[material] = offset
+
+    @classmethod
+    def open(cls, path: str) -> "Tablebase":
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped)
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def probe(self, own: int, opponent: int) -> Optional[int]:
+        """
+        value of a single board (16 bit masks) for the side to move, or None
+        if its material isn't covered
+        """
+        material = (own.bit_count(), opponent.bit_count())
+        offset = self._offsets.get(material)
+        if offset is None:
+            return None
+        return _signed(
+            self._buffer[offset + position_index(own, opponent, material)]
+        )
+
+    def board_values(
+        self, boards: BitBoards, player: PlayerNumberType
+    ) -> List[Optional[int]]:
+        own = boards[player]
+        opponent = boards[1 - player]
+        return [
+            self.probe(
+                (own >> (board * 16)) & BOARD_MASK,
+                (opponent >> (board * 16)) & BOARD_MASK,
+            )
+            for board in range(4)
+        ]
+
+    def analyze(self, state: GameState) -> List[Optional[int]]:
+        """
+        local value of each board for the player to move
+        """
+        boards = state.boards
+        if not isinstance(boards, BitBoards):
+            boards = BitBoards.from_boards(boards)
+        return self.board_values(boards, state.player_turn)
+
+    def evaluate(self, boards: BitBoards, player: PlayerNumberType) -> int:
+        """
+        evaluation term for `player` to move: boards they win locally count
+        for them and boards they lose against them, more so the closer the
+        local result is
+        """
+        score = 0
+        for value in self.board_values(boards, player):
+            if value:
+                if value > 0:
+                    score += TABLEBASE_WEIGHT // value
+                else:
+                    score -= TABLEBASE_WEIGHT // -value
+        return score
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="build the board-local shobu endgame tablebase"
+    )
+    parser.add_argument(
+        "--max-stones", type=int, default=DEFAULT_MAX_STONES, help="per board"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=multiprocessing.cpu_count()
+    )
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args(argv)
+
+    tables = generate(args.max_stones, args.workers, log=sys.stderr)
+    with open(args.output, "wb") as file:
+        file.write(pack_tablebase(tables, args.max_stones))
+    positions = sum(len(table) for table in tables.values())
+    print(f"{positions} positions -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.game.batch import (
+    apply_moves,
+    array_to_boards,
+    boards_to_array,
+    legal_move_counts,
+    legal_move_masks,
+    moves_to_array,
+    winners,
+)
+from app.game.engine import GameEngine
+from app.game.testing import random_states
+
+
+def test_boards_round_trip():
+    states = random_states(5, seed=1)
+    positions = boards_to_array([state.boards for state in states])
+
+    assert positions.shape == (5, 4, 16)
+    assert positions.dtype == np.int8
+    assert array_to_boards(positions) == [state.boards for state in states]
+
+
+def test_batch_matches_engine():
+    rng = random.Random(2)
+    states = [
+        state for state in random_states(40, seed=3) if state.winner is None
+    ]
+    positions = boards_to_array([state.boards for state in states])
+    players = np.array([state.player_turn for state in states])
+
+    counts = legal_move_counts(positions, players)
+    assert list(counts) == [
+        GameEngine.count_legal_moves(state) for state in states
+    ]
+
+    passive, active = legal_move_masks(positions, players)
+    moves = [
+        rng.choice(list(GameEngine.legal_moves(state))) for state in states
+    ]
+    rows = moves_to_array(moves)
+    for n, (pb, po, ab, ao, index) in enumerate(rows):
+        assert passive[n, pb, po, index] and active[n, ab, ao, index]
+
+    results = [
+        GameEngine.apply_move(state, move).state
+        for state, move in zip(states, moves)
+    ]
+    new_positions = apply_moves(positions, players, rows)
+    assert array_to_boards(new_positions) == [
+        result.boards for result in results
+    ]
+    assert list(winners(new_positions)) == [
+        -1 if result.winner is None else result.winner for result in results
+    ]
@@ -1,9 +1,22 @@
 from app.game.engine import (
+    BOARD_MOVES,
+    BitBoards,
+    BoardMove,
+    Boards,
     Direction,
     GameEngine,
     GameState,
+    DIRECTIONS,
+    MOVE_DIRECTIONS,
+    Move,
+    PUSH_BOARD_MOVES,
+    RAYS,
     cardinal_to_index,
+    zobrist_hash,
 )
+from app.game.perft import divide, perft
+from app.game.testing import move_key
+import random
 import pytest
 
 
@@ -42,6 +55,27 @@ def test_get_move_direction():
     )
 
 
+def test_ray_tables():
+    se = cardinal_to_index("se")
+    assert RAYS[0][se][1] == (5, None, 10)
+    assert RAYS[0][se][2] == (10, 5, 15)
+    assert RAYS[0][se][3] == (15, None, None)
+    assert RAYS[5][se][2] == (15, 10, None)
+    assert RAYS[3][se][1] == (None, None, None)
+    assert (
+        GameEngine.get_destination_coordinate(8, cardinal_to_index("n"), 2) == 0
+    )
+    assert GameEngine.get_move_midpoint(0, 8) == 4
+
+    for origin in range(16):
+        for destination in range(16):
+            direction = MOVE_DIRECTIONS[origin][destination]
+            if direction is None:
+                continue
+            ray = RAYS[origin][direction.cardinal][direction.length]
+            assert ray.destination == destination
+
+
 def test_game_initialization():
     state = GameState.initial_state()
 
@@ -57,6 +91,72 @@ def test_game_initialization():
     assert state.player_turn is 0, "black starts the game"
 
 
+def test_bitboards_round_trip():
+    state = GameState.initial_state()
+    bits = BitBoards.from_boards(state.boards)
+
+    assert bits.black == 0x000F000F000F000F
+    assert bits.white == 0xF000F000F000F000
+    assert bits.to_boards() == state.boards
+    assert isinstance(bits.to_boards(), Boards)
+
+    # fmt: off
+    boards = Boards([
+        [None, 0, None, None, 1, None, None, None, None, None, None, None, None, None, None, 1],
+        [0, None, None, None, None, None, None, None, None, None, None, None, None, None, None, 1],
+        [None, None, None, 0, None, None, 1, None, None, 0, None, None, 1, None, None, None],
+        [0, 0, 0, 0, 1, 1, 1, 1, None, None, None, None, None, None, None, None],
+    ])
+    # fmt: on
+    assert BitBoards.from_boards(boards).to_boards() == boards
+
+
+def test_bitboards_apply_move_matches_boards():
+    # fmt: off
+    boards = Boards([
+        [0, 0, 0, 0, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+        [0, 0, 0, 0, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+        [0, None, 0, 0, None, 1, None, None, None, None, None, None, 1, None, 1, 1],
+        [0, 0, 0, 0, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+    ])
+    # fmt: on
+    direction = Direction(cardinal_to_index("se"), 1)
+    move = Move(
+        player=0,
+        passive=BoardMove(board=0, origin=0, destination=5),
+        active=BoardMove(board=2, origin=0, destination=5),
+        direction=direction,
+    )
+
+    state = GameState(boards=boards, player_turn=0)
+    bit_state = GameState(boards=BitBoards.from_boards(boards), player_turn=0)
+
+    result = GameEngine.apply_move(state, move)
+    bit_result = GameEngine.apply_move(bit_state, move)
+
+    assert result.state.boards[2][5] == 0, "black stone moved onto c6"
+    assert result.state.boards[2][10] == 1, "white stone pushed to c11"
+    assert isinstance(bit_result.state.boards, BitBoards)
+    assert bit_result.state.boards.to_boards() == result.state.boards
+    assert bit_result.state.player_turn == result.state.player_turn == 1
+
+
+def test_check_winner_bitboards():
+    # fmt: off
+    boards = Boards([
+        [None, None, None, 0, None, None, None, None, None, None, None, None, None, None, None, None],
+        [0, 0, 0, 0, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+        [0, 0, 0, 0, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+        [0, 0, 0, 0, None, None, None, None, None, None, None, None, 1, 1, 1, 1],
+    ])
+    # fmt: on
+    assert GameEngine.check_winner(boards) == 0
+    assert GameEngine.check_winner(BitBoards.from_boards(boards)) == 0
+
+    initial = GameState.initial_state().boards
+    assert GameEngine.check_winner(BitBoards.from_boards(initial)) is None
+
+
 # def test_is_passive_legal():
 # state = GameState.initial_state()
 # player = 0
@@ -159,3 +259,216 @@ def test_game_initialization():
 #    assert (
 #        game.winner == 1
 #    ), "Black should be declared winner because board[0] has no white stones."
+
+
+def brute_force_legal_moves(state):
+    moves = set()
+    for passive_board in range(4):
+        for active_board in range(4):
+            for passive_origin in range(16):
+                for active_origin in range(16):
+                    for cardinal in range(8):
+                        for direction in DIRECTIONS[cardinal]:
+                            length = direction.length
+                            passive_ray = RAYS[passive_origin][cardinal][length]
+                            active_ray = RAYS[active_origin][cardinal][length]
+                            if (
+                                passive_ray.destination is None
+                                or active_ray.destination is None
+                            ):
+                                continue
+                            move = Move(
+                                player=state.player_turn,
+                                passive=BoardMove(
+                                    board=passive_board,
+                                    origin=passive_origin,
+                                    destination=passive_ray.destination,
+                                ),
+                                active=BoardMove(
+                                    board=active_board,
+                                    origin=active_origin,
+                                    destination=active_ray.destination,
+                                ),
+                                direction=direction,
+                            )
+                            if GameEngine.is_move_legal(move, state).is_legal:
+                                moves.add(move_key(move))
+    return moves
+
+
+def test_legal_moves_initial_state():
+    state = GameState.initial_state()
+    moves = list(GameEngine.legal_moves(state))
+
+    assert len(moves) == 232
+    assert GameEngine.count_legal_moves(state) == 232
+    assert {move_key(move) for move in moves} == brute_force_legal_moves(state)
+
+
+def test_legal_moves_match_validation():
+    rng = random.Random(7)
+    state = GameState.initial_state()
+    bit_state = GameState(
+        boards=BitBoards.from_boards(state.boards), player_turn=0
+    )
+
+    for _ in range(8):
+        moves = list(GameEngine.legal_moves(state))
+        assert GameEngine.count_legal_moves(bit_state) == len(moves)
+        assert len({move_key(move) for move in moves}) == len(moves)
+        assert {move_key(move) for move in moves} == brute_force_legal_moves(
+            state
+        )
+        for move in moves:
+            assert GameEngine.is_move_legal(move, bit_state).is_legal
+
+        move = rng.choice(moves)
+        state = GameEngine.apply_move(state, move).state
+        bit_state = GameEngine.apply_move(bit_state, move).state
+        assert bit_state.boards.to_boards() == state.boards
+        if state.winner is not None:
+            break
+
+
+def test_trusted_moves_equal_validated_moves():
+    for square in range(64):
+        for index in range(16):
+            ray = RAYS[square & 15][index >> 1][(index & 1) + 1]
+            if ray.destination is None:
+                assert BOARD_MOVES[square][index] is None
+                continue
+            board_move = BoardMove(square >> 4, square & 15, ray.destination)
+            assert BOARD_MOVES[square][index] == board_move
+            assert PUSH_BOARD_MOVES[square][index] == BoardMove.trusted(
+                square >> 4,
+                square & 15,
+                ray.destination,
+                True,
+                ray.push_destination,
+            )
+
+    move = next(GameEngine.legal_moves(GameState.initial_state()))
+    assert move == Move(move.player, move.passive, move.active, move.direction)
+    assert not hasattr(move, "__dict__")
+    with pytest.raises(ValueError):
+        BoardMove(4, 0, 1)
+    with pytest.raises(ValueError):
+        Direction(8, 1)
+
+
+def test_legal_moves_with_pushes():
+    # fmt: off
+    boards = Boards([
+        [0, None, None, None, None, None, None, None, None, None, None, None, None, None, None, 1],
+        [0, None, None, None, None, 1, None, None, None, None, 1, None, None, None, None, 1],
+        [0, None, None, None, None, 1, None, None, None, None, None, None, None, None, None, 1],
+        [0, None, None, None, None, None, None, None, None, None, None, None, None, None, None, 1],
+    ])
+    # fmt: on
+    state = GameState(boards=boards, player_turn=0)
+    moves = list(GameEngine.legal_moves(state))
+    assert {move_key(move) for move in moves} == brute_force_legal_moves(state)
+
+    se = cardinal_to_index("se")
+    pushes = [
+        move
+        for move in moves
+        if move.active.is_push and move.direction.cardinal == se
+    ]
+    # a1 -> a6 lets c1 push the stone on c6 to c11. b1 can't push two
+    # stones in a row, and c1 se2 would push c6 into the stone on c16
+    assert [(move.passive.board, move.active.board) for move in pushes] == [
+        (0, 2)
+    ]
+    assert pushes[0].direction.length == 1
+    assert pushes[0].active.push_destination == 10
+
+
+# fmt: off
+PERFT_POSITIONS = [
+    (
+        GameState.initial_state().boards,
+        0,
+        {1: 232, 2: 50508},
+    ),
+    (
+        Boards([
+            [0, None, 0, None, 1, None, None, None, None, 0, None, 0, 1, None, 1, 1],
+            [None, 0, None, 0, None, 0, None, None, 0, None, 1, None, 1, 1, None, 1],
+            [None, 0, None, 0, None, None, 1, None, 0, None, 0, None, 1, 1, 1, None],
+            [0, None, 0, 0, 0, None, None, None, None, None, None, 1, 1, 1, 1, None],
+        ]),
+        1,
+        {1: 128, 2: 20053},
+    ),
+    (
+        Boards([
+            [0, None, None, None, 1, None, None, None, None, None, None, None, 0, None, 0, 1],
+            [None, None, None, None, None, 0, None, 0, 1, None, 1, None, None, 1, 0, 1],
+            [0, None, None, 0, None, None, 1, 1, 0, 1, 0, None, 1, None, None, None],
+            [0, None, None, 0, 0, None, 0, None, 1, 1, None, 1, None, None, 1, None],
+        ]),
+        0,
+        {1: 80, 2: 8902, 3: 729068},
+    ),
+]
+# fmt: on
+
+
+@pytest.mark.parametrize("boards,player_turn,expected", PERFT_POSITIONS)
+def test_perft(boards, player_turn, expected):
+    state = GameState(boards=boards, player_turn=player_turn)
+    bit_state = GameState(
+        boards=BitBoards.from_boards(boards), player_turn=player_turn
+    )
+    for depth, nodes in expected.items():
+        assert perft(state, depth) == nodes
+        assert perft(bit_state, depth) == nodes
+
+
+def test_perft_divide():
+    boards, player_turn, expected = PERFT_POSITIONS[1]
+    state = GameState(boards=boards, player_turn=player_turn)
+    results = divide(state, 2)
+
+    assert len(results) == expected[1]
+    assert sum(results.values()) == expected[2]
+
+
+def test_zobrist_keys_update_incrementally():
+    rng = random.Random(11)
+    state = GameState.initial_state()
+    bit_state = GameState(
+        boards=BitBoards.from_boards(state.boards), player_turn=0
+    )
+    assert state.key == bit_state.key == zobrist_hash(state.boards, 0)
+    assert state.key != zobrist_hash(state.boards, 1)
+
+    seen = {state.key}
+    while state.winner is None:
+        move = rng.choice(list(GameEngine.legal_moves(state)))
+        state = GameEngine.apply_move(state, move).state
+        bit_state = GameEngine.apply_move(bit_state, move).state
+
+        assert state.key == bit_state.key
+        assert state.key == zobrist_hash(state.boards, state.player_turn)
+        seen.add(state.key)
+
+    assert len(seen) > 1
+
+
+def test_changed_squares_rebuild_the_position():
+    rng = random.Random(3)
+    state = GameState.initial_state()
+    for _ in range(40):
+        moves = list(GameEngine.legal_moves(state))
+        if not moves or state.winner is not None:
+            break
+        new_state = GameEngine.apply_move(state, rng.choice(moves)).state
+        changes = GameEngine.changed_squares(state.boards, new_state.boards)
+        assert 4 <= len(changes) <= 6
+        boards = [list(board) for board in state.boards]
+        for square, cell in changes:
+            boards[square // 16][square % 16] = cell
+        assert boards == new_state.boards
+        state = new_state
@@ -0,0 +1,42 @@
+import random
+from app.game.engine import BitBoards, GameEngine, GameState, zobrist_hash
+from app.game.position import SearchPosition
+
+
+def test_make_matches_apply_and_unmake_restores():
+    rng = random.Random(4)
+    for _ in range(20):
+        state = GameState.initial_state()
+        boards = BitBoards.from_boards(state.boards)
+        position = SearchPosition.from_state(state)
+        player = 0
+        undos = []
+        history = []
+        for _ in range(200):
+            moves = list(GameEngine._generate_moves(boards, player))
+            if not moves:
+                break
+            # every move makes and unmakes cleanly, and the last one is played
+            for move in rng.sample(moves, min(len(moves), 8)):
+                child, won = GameEngine._apply_generated_move(
+                    boards, player, *move
+                )
+                undo = position.make(*move)
+                assert position.boards == child
+                assert position.won == won
+                assert position.key == zobrist_hash(child, 1 - player)
+                position.unmake(undo)
+                assert position.boards == boards
+                assert position.player == player
+            if won:
+                break
+            undos.append(position.make(*move))
+            history.append((boards, player))
+            boards = child
+            player = 1 - player
+
+        while undos:
+            position.unmake(undos.pop())
+            boards, player = history.pop()
+            assert position.boards == boards
+            assert position.key == zobrist_hash(boards, player)
@@ -0,0 +1,31 @@
+from pytest import approx
+from app.game.rating import Rating, independent_groups, replay_ratings, update
+
+
+def test_update_matches_glickmans_example():
+    player = Rating(1500, 200, 0.06)
+    results = [
+        (Rating(1400, 30), 1.0),
+        (Rating(1550, 100), 0.0),
+        (Rating(1700, 300), 0.0),
+    ]
+    rating = update(player, results)
+    assert rating.rating == approx(1464.06, abs=0.01)
+    assert rating.deviation == approx(151.52, abs=0.01)
+    assert rating.volatility == approx(0.05999, abs=1e-5)
+
+
+def test_groups_replay_to_the_same_ratings():
+    results = [(1, 2), (3, 4), (2, 1), (5, 3), (6, 7), (4, 5), (1, 2)]
+    groups = independent_groups(results)
+    assert sorted(groups) == [
+        [(1, 2), (2, 1), (1, 2)],
+        [(3, 4), (5, 3), (4, 5)],
+        [(6, 7)],
+    ]
+
+    table = {}
+    for group in groups:
+        table.update(replay_ratings(group))
+    assert table == replay_ratings(results)
+    assert table[1][1:] == (3, 2)
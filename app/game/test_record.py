@@ -0,0 +1,72 @@
+import io
+import pytest
+from app.game.engine import (
+    BitBoards,
+    GameEngine,
+    GameState,
+    decode_move,
+    encode_move,
+)
+from app.game.record import (
+    open_records,
+    pack_record,
+    read_records,
+    record_moves,
+    replay,
+    write_record,
+)
+from app.game.testing import random_game
+
+
+def test_move_codes_round_trip():
+    for seed in range(3):
+        moves, states = random_game(seed)
+        for move, state in zip(moves, states):
+            code = encode_move(move)
+            assert 0 <= code < 1 << 16
+            assert decode_move(code, state.boards) == move
+            assert (
+                decode_move(code, BitBoards.from_boards(state.boards)) == move
+            )
+
+
+def test_move_codes_are_unique_per_position():
+    state = GameState.initial_state()
+    codes = [encode_move(move) for move in GameEngine.legal_moves(state)]
+    assert len(set(codes)) == len(codes) == 232
+
+
+def test_decode_rejects_bad_codes():
+    boards = GameState.initial_state().boards
+    with pytest.raises(ValueError, match="out of range"):
+        decode_move(1 << 16, boards)
+    # a passive move on board a pairs with an active move on b or c, not d
+    with pytest.raises(ValueError, match="pairs the wrong boards"):
+        decode_move((0 << 10) | (48 << 4) | 8, boards)
+
+
+def test_records_round_trip(tmp_path):
+    games = [random_game(seed) for seed in range(3)]
+    path = tmp_path / "games.bin"
+    with open(path, "wb") as file:
+        for moves, states in games:
+            write_record(file, moves, states[-1].winner)
+
+    with open_records(str(path)) as records:
+        for record, (moves, states) in zip(records, games):
+            assert len(record) == len(moves)
+            assert record.winner == states[-1].winner
+            assert list(record_moves(record)) == moves
+            replayed = list(replay(record))
+            assert [state.key for state in replayed] == [
+                state.key for state in states
+            ]
+            assert replayed[-1].winner == states[-1].winner
+
+
+def test_truncated_record():
+    moves, _ = random_game(0, plies=4)
+    data = pack_record(moves)
+    with pytest.raises(ValueError):
+        list(read_records(data[:-1]))
+    assert len(list(read_records(io.BytesIO(data).getvalue()))) == 1
@@ -0,0 +1,53 @@
+import io
+import json
+import os
+import subprocess
+import sys
+from app.game.selfplay import build_jobs, play_game, run
+
+
+def test_build_jobs_alternates_colors():
+    jobs = build_jobs([("rando", "search")], 4, 0.01, 50, seed=1)
+    assert [(job[0], job[1]) for job in jobs] == [
+        ("rando", "search"),
+        ("search", "rando"),
+    ] * 2
+    assert len({job[2] for job in jobs}) == 4
+
+
+def test_play_game_record():
+    record = play_game(("rando", "rando", 7, 0.01, 40))
+    assert record["black"] == "rando" and record["white"] == "rando"
+    assert record["plies"] == len(record["moves"]) <= 40
+    if record["plies"] < 40:
+        assert record["winner"] in (0, 1)
+
+
+def test_run_streams_records():
+    output = io.StringIO()
+    jobs = build_jobs([("rando", "rando")], 3, 0.01, 30, seed=2)
+    stats = run(jobs, output, workers=1, log=io.StringIO())
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 3
+    assert all("moves" in json.loads(line) for line in lines)
+    assert stats[("rando", "rando")].games == 3
+
+
+def test_command_line_tools_import_without_the_web_stack():
+    # run where config.py can't be found, as the tools are from a checkout
+    code = (
+        "import sys, app.game.selfplay, app.game.perft, app.game.ai.book, "
+        "app.game.ai.tune, app.utils.tui_engine; "
+        "print(sorted({name.split('.')[0] for name in sys.modules} & "
+        "{'config', 'flask', 'flask_sqlalchemy', 'sqlalchemy'}))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(root),
+        env={**os.environ, "PYTHONPATH": root},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
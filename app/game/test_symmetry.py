@@ -0,0 +1,63 @@
+from app.game.engine import BitBoards, GameEngine, GameState
+from app.game.symmetry import (
+    Transform,
+    canonicalize,
+    inverse,
+    transform_move,
+    transform_state,
+    untransform_move,
+)
+from app.game.testing import move_keys, random_state
+
+TRANSFORMS = [
+    Transform(swap_colors, swap_shades, geometry)
+    for swap_colors in (False, True)
+    for swap_shades in (False, True)
+    for geometry in range(8)
+]
+
+
+def test_transforms_preserve_legal_moves():
+    state = random_state(seed=4, plies=9)
+    moves = list(GameEngine.legal_moves(state))
+
+    for transform in TRANSFORMS:
+        transformed = transform_state(state, transform)
+        assert transform_state(transformed, inverse(transform)) == state
+
+        mapped = [transform_move(move, transform) for move in moves]
+        assert move_keys(mapped) == move_keys(
+            GameEngine.legal_moves(transformed)
+        )
+        assert [untransform_move(move, transform) for move in mapped] == moves
+
+
+def test_canonicalize_is_shared_by_symmetric_positions():
+    state = random_state(seed=8, plies=6)
+    canonical, transform = canonicalize(state)
+
+    assert canonical.player_turn == 0
+    assert transform_state(state, transform) == canonical
+    for other in TRANSFORMS:
+        equivalent = transform_state(state, other)
+        assert canonicalize(equivalent)[0].key == canonical.key
+
+    bit_state = GameState(
+        boards=BitBoards.from_boards(state.boards),
+        player_turn=state.player_turn,
+    )
+    bit_canonical, _ = canonicalize(bit_state)
+    assert isinstance(bit_canonical.boards, BitBoards)
+    assert bit_canonical.key == canonical.key
+
+
+def test_canonical_moves_map_back():
+    state = random_state(seed=15, plies=5)
+    canonical, transform = canonicalize(state)
+
+    for move in GameEngine.legal_moves(canonical):
+        original = untransform_move(move, transform)
+        assert GameEngine.is_move_legal(original, state).is_legal
+        result = GameEngine.apply_move(state, original).state
+        expected = GameEngine.apply_move(canonical, move).state
+        assert canonicalize(result)[0].key == canonicalize(expected)[0].key
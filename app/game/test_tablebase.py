@@ -0,0 +1,59 @@
+import random
+from functools import lru_cache
+from app.game.engine import GameState
+from app.game.tablebase import (
+    Tablebase,
+    _positions,
+    generate,
+    local_moves,
+    pack_tablebase,
+)
+
+
+@lru_cache(maxsize=None)
+def wins_within(own, opponent, plies):
+    if plies < 1:
+        return False
+    for new_own, new_opponent in local_moves(own, opponent):
+        if not new_opponent or loses_within(new_opponent, new_own, plies - 1):
+            return True
+    return False
+
+
+@lru_cache(maxsize=None)
+def loses_within(own, opponent, plies):
+    if plies < 2:
+        return False
+    successors = list(local_moves(own, opponent)) + [(own, opponent)]
+    return all(
+        new_opponent and wins_within(new_opponent, new_own, plies - 1)
+        for new_own, new_opponent in successors
+    )
+
+
+def test_values_match_brute_force():
+    tablebase = Tablebase(pack_tablebase(generate(3), 3))
+    rng = random.Random(0)
+    for material in ((1, 1), (1, 2), (2, 1)):
+        positions = list(_positions(material))
+        for own, opponent in rng.sample(positions, 60):
+            value = tablebase.probe(own, opponent)
+            if value > 0:
+                assert wins_within(own, opponent, value)
+                assert not wins_within(own, opponent, value - 2)
+            elif value < 0:
+                assert loses_within(own, opponent, -value)
+                assert not loses_within(own, opponent, -value - 2)
+            else:
+                assert not wins_within(own, opponent, 7)
+                assert not loses_within(own, opponent, 8)
+
+
+def test_probe_outside_the_tablebase():
+    tablebase = Tablebase(pack_tablebase(generate(2), 2))
+    # the initial position has 4 stones of each color on every board
+    assert tablebase.analyze(GameState.initial_state()) == [None] * 4
+    # one stone each, the side to move pushes the other off: its stone on
+    # square 5 (coordinate 4) pushes the one on square 1 (coordinate 0, on
+    # the edge) off the board
+    assert tablebase.probe(1 << 4, 1 << 0) == 1
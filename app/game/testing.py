@@ -0,0 +1,62 @@
+"""
+helpers shared by the game and AI tests
+"""
+
+import random
+from typing import List, Tuple
+from app.game.engine import GameEngine, GameState, Move
+
+
+def random_walk(
+    rng: random.Random, plies: int
+) -> Tuple[List[Move], List[GameState]]:
+    """
+    plays up to `plies` uniformly random moves from the initial position,
+    stopping early when the game ends. returns the moves and every state,
+    starting with the initial one
+    """
+    state = GameState.initial_state()
+    states = [state]
+    moves: List[Move] = []
+    while len(moves) < plies and state.winner is None:
+        legal = list(GameEngine.legal_moves(state))
+        if not legal:
+            break
+        move = rng.choice(legal)
+        moves.append(move)
+        state = GameEngine.apply_move(state, move).state
+        states.append(state)
+    return moves, states
+
+
+def random_game(seed: int, plies: int = 30):
+    return random_walk(random.Random(seed), plies)
+
+
+def random_state(seed: int, plies: int) -> GameState:
+    return random_walk(random.Random(seed), plies)[1][-1]
+
+
+def random_states(count: int, seed: int) -> List[GameState]:
+    """
+    `count` positions between 0 and 29 plies into random games
+    """
+    rng = random.Random(seed)
+    return [random_walk(rng, rng.randrange(0, 30))[1][-1] for _ in range(count)]
+
+
+def move_key(move: Move) -> tuple:
+    """
+    a move as a plain tuple, to compare moves from different generators
+    """
+    return (
+        move.passive.board,
+        move.passive.origin,
+        move.active.board,
+        move.active.origin,
+        move.direction,
+    )
+
+
+def move_keys(moves) -> set:
+    return {move_key(move) for move in moves}
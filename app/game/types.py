@@ -11,4 +11,4 @@ CardinalLetterType = Literal["n", "ne", "e", "se", "s", "sw", "w", "nw"]
 CardinalNumberType = Literal[0, 1, 2, 3, 4, 5, 6, 7]
 BoardType = List[Optional[PlayerNumberType]]
 BoardsType = List[BoardType]
-OpponentType = Literal["human", "rando"]
+OpponentType = Literal["human", "rando", "search", "mcts"]
@@ -1,6 +1,54 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+# rows keep their loaded values after a commit instead of being read back on
+# the next attribute access. the game row's version is bumped client-side on
+# flush, so it stays correct without the refresh
+db = SQLAlchemy(session_options={"expire_on_commit": False})
+
+# set on every new SQLite connection. WAL lets readers run alongside the
+# writer, NORMAL only syncs at checkpoints (a power cut can lose the last
+# commits but not corrupt the file), and writers wait for the lock instead
+# of failing at once with "database is locked"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+}
+
+# a gevent web worker (gunicorn.conf.py) runs many requests at once, but event
+# streams hand their connection back before streaming, so up to 64 requests
+# per worker hold one and the rest wait up to pool_timeout. connections are
+# checked before use and replaced every half hour, so ones dropped by the
+# server or a proxy aren't handed out
+POSTGRES_ENGINE_OPTIONS = {
+    "pool_size": 16,
+    "max_overflow": 48,
+    "pool_timeout": 10,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+}
+
+
+def engine_options(database_uri: str) -> dict:
+    if database_uri.startswith(("postgresql", "postgres")):
+        return dict(POSTGRES_ENGINE_OPTIONS)
+    return {}
+
+
+def apply_sqlite_pragmas(engine, pragmas: dict):
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
-db = SQLAlchemy()
 
 from .user import User
 from .game import Game
+from .game_move import GameMove, GameSnapshot
+from .leaderboard import LeaderboardEntry
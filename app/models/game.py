@@ -1,25 +1,136 @@
+from typing import Iterator, Optional, Tuple
 from . import db
+from .game_move import SNAPSHOT_INTERVAL, GameMove, GameSnapshot
 from sqlalchemy.orm import relationship
+from app.game.engine import BitBoards, GameEngine, GameState, Move
 
 
 class Game(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     boards = db.Column(db.JSON, nullable=False)
+    # always empty, the moves are in the game_move table
     moves = db.Column(db.JSON, nullable=False)
     player_turn = db.Column(db.Integer, nullable=False, default=1)
     player1_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     player2_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
     is_human_vs_ai = db.Column(db.Boolean, nullable=False)
+    # seconds per AI move, None for the server default
+    ai_time_budget = db.Column(db.Float, nullable=True)
     winner = db.Column(db.Integer, nullable=True)
     status = db.Column(db.String(20), nullable=False, default="waiting")
+    # when the game was won or abandoned, the order ratings are replayed in
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # bumped on every update, so cached game states can tell they're stale
+    # and concurrent writers fail instead of overwriting each other
+    version = db.Column(db.Integer, nullable=False, default=1)
+    # number of moves played, ie. the ply of the latest GameMove row
+    ply = db.Column(db.Integer, nullable=False, default=0)
 
     player1 = relationship("User", foreign_keys=[player1_id])
     player2 = relationship("User", foreign_keys=[player2_id])
 
+    __table_args__ = (
+        # a player's games with a status, from either seat
+        db.Index("ix_game_player1_status", "player1_id", "status"),
+        db.Index("ix_game_player2_status", "player2_id", "status"),
+        # active games, newest first. partial, so it stays small and SQLite
+        # doesn't prefer it over the player indexes before ANALYZE has run
+        db.Index(
+            "ix_game_active",
+            "id",
+            sqlite_where=db.text("status = 'active'"),
+            postgresql_where=db.text("status = 'active'"),
+        ),
+        # finished games in order, for replaying ratings
+        db.Index("ix_game_finished_at", "finished_at"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+    def record_snapshot(self, state: GameState):
+        boards = state.boards
+        if not isinstance(boards, BitBoards):
+            boards = BitBoards.from_boards(boards)
+        db.session.add(
+            GameSnapshot.from_bitboards(
+                self.id, self.ply, boards, state.player_turn
+            )
+        )
+
+    def record_move(self, move: Move, state: GameState):
+        """
+        appends `move`, which led to `state`, to the move log: one INSERT,
+        plus a snapshot every SNAPSHOT_INTERVAL plies
+        """
+        self.ply += 1
+        db.session.add(GameMove.from_move(self.id, self.ply, move))
+        if self.ply % SNAPSHOT_INTERVAL == 0:
+            self.record_snapshot(state)
+
+    def replay(
+        self, first: int = 0, last: Optional[int] = None
+    ) -> Iterator[Tuple[int, GameState]]:
+        """
+        (ply, state) for every ply from `first` to `last` (default: the
+        latest), rebuilt from the nearest snapshot at or before `first` with
+        one query for the snapshot and one for the moves
+        """
+        if last is None:
+            last = self.ply
+        if not 0 <= first <= last <= self.ply:
+            raise ValueError(f"plies {first}-{last} out of range 0-{self.ply}")
+
+        snapshot = db.session.scalars(
+            db.select(GameSnapshot)
+            .where(GameSnapshot.game_id == self.id, GameSnapshot.ply <= first)
+            .order_by(GameSnapshot.ply.desc())
+            .limit(1)
+        ).first()
+        if snapshot is None:
+            raise ValueError(f"game {self.id} has no snapshots")
+
+        boards = snapshot.bitboards()
+        player = snapshot.player_turn
+        winner = GameEngine.check_winner(boards)
+        if snapshot.ply == first:
+            yield first, GameState(
+                boards=boards.to_boards(), player_turn=player, winner=winner
+            )
+        moves = db.session.scalars(
+            db.select(GameMove)
+            .where(
+                GameMove.game_id == self.id,
+                GameMove.ply > snapshot.ply,
+                GameMove.ply <= last,
+            )
+            .order_by(GameMove.ply)
+        ).all()
+        for game_move in moves:
+            boards, won = GameEngine._apply_generated_move(
+                boards, player, *game_move.raw_move()
+            )
+            if won:
+                winner = player
+            player = 1 - player
+            if game_move.ply >= first:
+                yield game_move.ply, GameState(
+                    boards=boards.to_boards(), player_turn=player, winner=winner
+                )
+
+    def state_at(self, ply: Optional[int] = None) -> GameState:
+        """
+        rebuilds the position after `ply` moves (default: the latest) from
+        the nearest snapshot at or before it
+        """
+        if ply is None:
+            ply = self.ply
+        for _, state in self.replay(ply, ply):
+            return state
+        raise ValueError(f"game {self.id} is missing moves up to ply {ply}")
+
     def to_dict(self):
         return {
             "id": self.id,
-            "moves": self.moves,
+            "ply": self.ply,
             "player_turn": self.player_turn,
             "player1": self.player1.username if self.player1 else None,
             "player2": self.player2.username if self.player2 else "AI/Waiting",
@@ -0,0 +1,68 @@
+from . import db
+from app.game.engine import BitBoards, Move
+
+# a board snapshot is stored every this many plies, so rebuilding any
+# position replays at most this many moves
+SNAPSHOT_INTERVAL = 16
+
+
+class GameMove(db.Model):
+    """
+    one row per ply, appended as the move is played. squares are
+    board * 16 + coordinate and direction is cardinal * 2 + length - 1, the
+    same triple GameEngine._generate_moves produces. the player is implied by
+    the ply, since turns alternate
+    """
+
+    __tablename__ = "game_move"
+
+    game_id = db.Column(db.Integer, db.ForeignKey("game.id"), primary_key=True)
+    ply = db.Column(db.Integer, primary_key=True)
+    passive_square = db.Column(db.SmallInteger, nullable=False)
+    active_square = db.Column(db.SmallInteger, nullable=False)
+    direction = db.Column(db.SmallInteger, nullable=False)
+
+    @classmethod
+    def from_move(cls, game_id: int, ply: int, move: Move) -> "GameMove":
+        return cls(
+            game_id=game_id,
+            ply=ply,
+            passive_square=(move.passive.board * 16) + move.passive.origin,
+            active_square=(move.active.board * 16) + move.active.origin,
+            direction=(move.direction.cardinal * 2) + move.direction.length - 1,
+        )
+
+    def raw_move(self) -> tuple[int, int, int]:
+        return (self.passive_square, self.active_square, self.direction)
+
+
+class GameSnapshot(db.Model):
+    """
+    the position after `ply` moves, as the black and white bitboards packed
+    into 16 bytes
+    """
+
+    __tablename__ = "game_snapshot"
+
+    game_id = db.Column(db.Integer, db.ForeignKey("game.id"), primary_key=True)
+    ply = db.Column(db.Integer, primary_key=True)
+    player_turn = db.Column(db.Integer, nullable=False)
+    stones = db.Column(db.LargeBinary(16), nullable=False)
+
+    @classmethod
+    def from_bitboards(
+        cls, game_id: int, ply: int, boards: BitBoards, player_turn: int
+    ) -> "GameSnapshot":
+        return cls(
+            game_id=game_id,
+            ply=ply,
+            player_turn=player_turn,
+            stones=boards.black.to_bytes(8, "little")
+            + boards.white.to_bytes(8, "little"),
+        )
+
+    def bitboards(self) -> BitBoards:
+        return BitBoards(
+            int.from_bytes(self.stones[:8], "little"),
+            int.from_bytes(self.stones[8:], "little"),
+        )
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from typing import Optional
+from . import db
+from app.game.rating import Rating, rate_game
+
+
+class LeaderboardEntry(db.Model):
+    """
+    a player's current rating, kept up to date as rated games finish rather
+    than computed from the game history. the indexed score is the order of
+    the leaderboard, so a page is an index range scan
+    """
+
+    __tablename__ = "leaderboard"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    rating = db.Column(db.Float, nullable=False)
+    deviation = db.Column(db.Float, nullable=False)
+    volatility = db.Column(db.Float, nullable=False)
+    # the conservative rating, rating - 2 * deviation
+    score = db.Column(db.Float, nullable=False)
+    games = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    # two games finishing at once for the same player fail one commit
+    # instead of losing an update
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    user = db.relationship("User")
+
+    __table_args__ = (db.Index("ix_leaderboard_score", "score", "user_id"),)
+    __mapper_args__ = {"version_id_col": version}
+
+    @classmethod
+    def for_user(cls, user_id: int) -> "LeaderboardEntry":
+        entry = db.session.get(cls, user_id)
+        if entry is None:
+            entry = cls(user_id=user_id, games=0, wins=0)
+            entry.set_rating(Rating())
+            db.session.add(entry)
+        return entry
+
+    def get_rating(self) -> Rating:
+        return Rating(self.rating, self.deviation, self.volatility)
+
+    def set_rating(self, rating: Rating):
+        self.rating = rating.rating
+        self.deviation = rating.deviation
+        self.volatility = rating.volatility
+        self.score = rating.conservative
+
+    def to_dict(self, rank: Optional[int] = None):
+        return {
+            "rank": rank,
+            "username": self.user.username,
+            "rating": round(self.rating),
+            "deviation": round(self.deviation),
+            "score": round(self.score),
+            "games": self.games,
+            "wins": self.wins,
+        }
+
+
+def is_rated(game) -> bool:
+    return (
+        not game.is_human_vs_ai
+        and game.player2_id is not None
+        and game.winner is not None
+    )
+
+
+def record_result(game):
+    """
+    marks `game` finished and updates both players' ratings in the same
+    session, so they're committed together with the result
+    """
+    game.finished_at = datetime.now(timezone.utc)
+    if not is_rated(game):
+        return
+    player_ids = (game.player1_id, game.player2_id)
+    winner = LeaderboardEntry.for_user(player_ids[game.winner])
+    loser = LeaderboardEntry.for_user(player_ids[1 - game.winner])
+    new_winner, new_loser = rate_game(winner.get_rating(), loser.get_rating())
+    winner.set_rating(new_winner)
+    winner.games += 1
+    winner.wins += 1
+    loser.set_rating(new_loser)
+    loser.games += 1
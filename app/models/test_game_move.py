@@ -0,0 +1,70 @@
+import pytest
+from app.game.engine import BitBoards, GameEngine, GameState
+from app.game.testing import random_game
+from app.models.game_move import SNAPSHOT_INTERVAL, GameMove, GameSnapshot
+
+
+def test_snapshot_round_trip():
+    state = GameState.initial_state()
+    boards = BitBoards.from_boards(state.boards)
+    snapshot = GameSnapshot.from_bitboards(1, 0, boards, 0)
+    assert len(snapshot.stones) == 16
+    assert snapshot.bitboards() == boards
+
+
+def test_move_row_replays_the_move():
+    state = GameState.initial_state()
+    boards = BitBoards.from_boards(state.boards)
+    for move in GameEngine.legal_moves(state):
+        row = GameMove.from_move(1, 1, move)
+        replayed = GameEngine._generated_move(boards, 0, *row.raw_move())
+        assert replayed == move
+
+
+def test_replay_matches_live_play(app):
+    from app.api.game import new_game
+    from app.models import Game, User, db
+
+    # three snapshot intervals and a few moves into the fourth
+    moves, states = random_game(seed=2, plies=3 * SNAPSHOT_INTERVAL + 5)
+    assert len(moves) == 3 * SNAPSHOT_INTERVAL + 5
+
+    with app.app_context():
+        players = []
+        for name in ("black", "white"):
+            user = User(username=name, email=f"{name}@example.com")
+            user.set_password(name)
+            db.session.add(user)
+            db.session.commit()
+            players.append(user.id)
+        game = new_game(*players)
+        for move, state in zip(moves, states[1:]):
+            game.record_move(move, state)
+            db.session.commit()
+        game_id = game.id
+
+    with app.app_context():
+        game = db.session.get(Game, game_id)
+        assert game.ply == len(moves)
+        snapshots = db.session.scalars(
+            db.select(GameSnapshot.ply).where(GameSnapshot.game_id == game_id)
+        ).all()
+        assert sorted(snapshots) == [0, 16, 32, 48]
+
+        def plain(state):
+            return (list(state.boards), state.player_turn, state.winner)
+
+        replayed = list(game.replay())
+        assert [ply for ply, _ in replayed] == list(range(len(states)))
+        assert [plain(state) for _, state in replayed] == [
+            plain(state) for state in states
+        ]
+        # ranges and single plies either side of a snapshot
+        first, last = SNAPSHOT_INTERVAL - 3, 2 * SNAPSHOT_INTERVAL + 2
+        assert [plain(state) for _, state in game.replay(first, last)] == [
+            plain(state) for state in states[first : last + 1]
+        ]
+        for ply in (0, 15, 16, 17, 31, 32, 33, len(moves)):
+            assert plain(game.state_at(ply)) == plain(states[ply])
+        with pytest.raises(ValueError):
+            game.state_at(len(moves) + 1)
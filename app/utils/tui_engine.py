@@ -10,8 +10,10 @@ from app.game.engine import (
     GameError,
     Move,
     Direction,
+    RAYS,
     board_letter_to_index,
     cardinal_to_index,
+    move_notation,
     player_number_to_color,
 )
 from app.game.types import (
@@ -21,7 +23,11 @@ from app.game.types import (
     MoveLengthType,
     PlayerNumberType,
 )
+from app.game.ai.mcts import MCTSAI
 from app.game.ai.rando import RandoAI
+from app.game.ai.search import SearchAI
+
+OPPONENT_PROMPT = "choose an opponent: human, rando, search or mcts"
 
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
@@ -49,7 +55,7 @@ class InputParser:
         elif command == "start":
             return GameResult(
                 state=GameState.initial_state(),
-                message="choose an opponent: human or rando",
+                message=OPPONENT_PROMPT,
             )
         else:
             move = InputParser._parse_move(command, player)
@@ -102,12 +108,12 @@ class InputParser:
 
         direction = Direction(cardinal=cardinal_index, length=direction_length)
 
-        passive_destination = GameEngine.get_destination_coordinate(
-            passive_origin, direction.cardinal, direction.length
-        )
-        active_destination = GameEngine.get_destination_coordinate(
-            active_origin, direction.cardinal, direction.length
-        )
+        passive_destination = RAYS[passive_origin][direction.cardinal][
+            direction.length
+        ].destination
+        active_destination = RAYS[active_origin][direction.cardinal][
+            direction.length
+        ].destination
 
         if passive_destination is None:
             raise GameError("passive move destination is out of bounds")
@@ -137,6 +143,11 @@ def run_terminal_game():
         "enter 'quit' to exit, 'read' to see board, 'start' to start new game"
     )
     opponent = "human"
+    ais = {
+        "rando": RandoAI(),
+        "search": SearchAI(time_budget=2.0),
+        "mcts": MCTSAI(time_budget=2.0),
+    }
 
     while True:
         try:
@@ -147,11 +158,11 @@ def run_terminal_game():
 
             if result.message:
                 print(result.message)
-                if result.message == "choose an opponent: human or rando":
+                if result.message == OPPONENT_PROMPT:
                     opponent_selection = input("~> ").strip()
                     if (
                         opponent_selection == "human"
-                        or opponent_selection == "rando"
+                        or opponent_selection in ais
                     ):
                         opponent = opponent_selection
                     else:
@@ -163,17 +174,26 @@ def run_terminal_game():
 
             state = result.state
 
-            if opponent == "rando":
-                passive_candidates = RandoAI.get_passive_candidates(
-                    state.boards, state.player_turn
-                )
-                active_candidates = (
-                    RandoAI.get_active_candidates_from_passive_candidates(
-                        state.boards, state.player_turn, passive_candidates
-                    )
-                )
-                print(f"passive candidates: {passive_candidates}")
-                print(f"active candidates: {active_candidates}")
+            if (
+                opponent in ais
+                and state.player_turn == 1
+                and state.winner is None
+            ):
+                ai_move = ais[opponent].generate_move(state)
+                if ai_move is None:
+                    print(f"{opponent} has no legal moves")
+                else:
+                    print(f"{opponent} plays {move_notation(ai_move)}")
+                    stats = getattr(ais[opponent], "last_stats", None)
+                    if stats is not None:
+                        print(
+                            f"{stats.playouts} playouts in {stats.seconds:.2f}s"
+                            f" ({stats.playouts_per_second_per_core:.0f}/s/core)"
+                        )
+                    result = GameEngine.apply_move(state, ai_move)
+                    state = result.state
+                    if result.message:
+                        print(result.message)
 
             print(format_game_state(state))
 
@@ -1,4 +1,27 @@
+import os
+
+
 class Config:
     SECRET_KEY = "your-secret-key-here"
     SQLALCHEMY_DATABASE_URI = "sqlite:///shobu.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Redis server the web workers share game events and the matchmaking
+    # queue through. without it, the REDIS_URL environment variable or a
+    # local server on the default port
+    REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    # open event streams per web worker. each holds one of the worker's
+    # connections (see gunicorn.conf.py), so keep this below
+    # worker_connections
+    MAX_EVENT_STREAMS = 800
+    # AI worker processes for human vs AI games
+    AI_WORKERS = 2
+    # opening book for the AI, built with `python -m app.game.ai.book`
+    OPENING_BOOK = None
+    # endgame tablebase for the AI, built with `python -m app.game.tablebase`
+    TABLEBASE = None
+    # evaluation weights for the AI, fitted with `python -m app.game.ai.tune`
+    EVAL_WEIGHTS = None
+    # SQLite connections get app.models.SQLITE_PRAGMAS (WAL and friends) and
+    # Postgres engines app.models.POSTGRES_ENGINE_OPTIONS unless these are set
+    # SQLITE_PRAGMAS = {}
+    # SQLALCHEMY_ENGINE_OPTIONS = {}
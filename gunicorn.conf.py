@@ -0,0 +1,24 @@
+# gunicorn settings, read from the working directory on startup
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# gevent workers: an open event stream or replay is a greenlet waiting on
+# its socket, not a thread, so a worker holds hundreds of them. game events
+# go through Redis (app.api.events.RedisBroker), so every worker's streams
+# see the moves committed by the others. the app refuses streams past
+# MAX_EVENT_STREAMS (800 by default), which leaves at least 200 connections
+# of each worker for moves and other requests
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "gevent"
+worker_connections = 1000
+
+
+def post_fork(server, worker):
+    # psycopg2 waits for Postgres in C, which blocks every greenlet of the
+    # worker unless it's made to yield to gevent
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        return
+    patch_psycopg()
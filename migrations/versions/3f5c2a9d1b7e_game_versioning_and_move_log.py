@@ -0,0 +1,164 @@
+"""game versioning, move log and snapshots
+
+Revision ID: 3f5c2a9d1b7e
+Revises:
+Create Date: 2026-10-17 09:12:40.115203
+
+the first revision. databases from before migrations were set up got their
+tables from db.create_all(), so this one creates whatever tables are missing
+and adds the columns the game table lacks, and works on an empty database or
+an existing shobu.db alike. games that predate the move log get a snapshot
+of their current position as ply 0, so they can still be rebuilt and played
+on.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f5c2a9d1b7e"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if "user" not in tables:
+        op.create_table(
+            "user",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("username", sa.String(length=80), nullable=False),
+            sa.Column("email", sa.String(length=120), nullable=False),
+            sa.Column("password_hash", sa.String(length=256), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("email"),
+            sa.UniqueConstraint("username"),
+        )
+
+    if "game" not in tables:
+        op.create_table(
+            "game",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("boards", sa.JSON(), nullable=False),
+            sa.Column("moves", sa.JSON(), nullable=False),
+            sa.Column("player_turn", sa.Integer(), nullable=False),
+            sa.Column("player1_id", sa.Integer(), nullable=False),
+            sa.Column("player2_id", sa.Integer(), nullable=True),
+            sa.Column("is_human_vs_ai", sa.Boolean(), nullable=False),
+            sa.Column("ai_time_budget", sa.Float(), nullable=True),
+            sa.Column("winner", sa.Integer(), nullable=True),
+            sa.Column("status", sa.String(length=20), nullable=False),
+            sa.Column(
+                "version", sa.Integer(), nullable=False, server_default="1"
+            ),
+            sa.Column("ply", sa.Integer(), nullable=False, server_default="0"),
+            sa.ForeignKeyConstraint(["player1_id"], ["user.id"]),
+            sa.ForeignKeyConstraint(["player2_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    else:
+        columns = {
+            column["name"] for column in sa.inspect(bind).get_columns("game")
+        }
+        with op.batch_alter_table("game") as batch_op:
+            if "ai_time_budget" not in columns:
+                batch_op.add_column(
+                    sa.Column("ai_time_budget", sa.Float(), nullable=True)
+                )
+            if "version" not in columns:
+                batch_op.add_column(
+                    sa.Column(
+                        "version",
+                        sa.Integer(),
+                        nullable=False,
+                        server_default="1",
+                    )
+                )
+            if "ply" not in columns:
+                batch_op.add_column(
+                    sa.Column(
+                        "ply", sa.Integer(), nullable=False, server_default="0"
+                    )
+                )
+
+    if "game_move" not in tables:
+        op.create_table(
+            "game_move",
+            sa.Column("game_id", sa.Integer(), nullable=False),
+            sa.Column("ply", sa.Integer(), nullable=False),
+            sa.Column("passive_square", sa.SmallInteger(), nullable=False),
+            sa.Column("active_square", sa.SmallInteger(), nullable=False),
+            sa.Column("direction", sa.SmallInteger(), nullable=False),
+            sa.ForeignKeyConstraint(["game_id"], ["game.id"]),
+            sa.PrimaryKeyConstraint("game_id", "ply"),
+        )
+
+    if "game_snapshot" not in tables:
+        op.create_table(
+            "game_snapshot",
+            sa.Column("game_id", sa.Integer(), nullable=False),
+            sa.Column("ply", sa.Integer(), nullable=False),
+            sa.Column("player_turn", sa.Integer(), nullable=False),
+            sa.Column("stones", sa.LargeBinary(length=16), nullable=False),
+            sa.ForeignKeyConstraint(["game_id"], ["game.id"]),
+            sa.PrimaryKeyConstraint("game_id", "ply"),
+        )
+
+    _snapshot_existing_games(bind)
+
+
+def _snapshot_existing_games(bind):
+    # same layout as GameSnapshot.from_bitboards: black then white, one bit
+    # per square (board * 16 + coordinate), 8 bytes each, little-endian
+    game = sa.table(
+        "game",
+        sa.column("id", sa.Integer),
+        sa.column("boards", sa.JSON),
+        sa.column("player_turn", sa.Integer),
+        sa.column("ply", sa.Integer),
+    )
+    snapshot = sa.table(
+        "game_snapshot",
+        sa.column("game_id", sa.Integer),
+        sa.column("ply", sa.Integer),
+        sa.column("player_turn", sa.Integer),
+        sa.column("stones", sa.LargeBinary),
+    )
+    snapshotted = sa.select(snapshot.c.game_id).where(
+        snapshot.c.game_id == game.c.id
+    )
+    rows = bind.execute(
+        sa.select(game.c.id, game.c.boards, game.c.player_turn).where(
+            game.c.ply == 0, ~sa.exists(snapshotted)
+        )
+    ).all()
+    snapshots = []
+    for game_id, boards, player_turn in rows:
+        stones = [0, 0]
+        for board_id, board in enumerate(boards):
+            for coordinate, cell in enumerate(board):
+                if cell is not None:
+                    stones[cell] |= 1 << ((board_id * 16) + coordinate)
+        snapshots.append(
+            {
+                "game_id": game_id,
+                "ply": 0,
+                "player_turn": player_turn,
+                "stones": stones[0].to_bytes(8, "little")
+                + stones[1].to_bytes(8, "little"),
+            }
+        )
+    if snapshots:
+        op.bulk_insert(snapshot, snapshots)
+
+
+def downgrade():
+    op.drop_table("game_snapshot")
+    op.drop_table("game_move")
+    with op.batch_alter_table("game") as batch_op:
+        batch_op.drop_column("ply")
+        batch_op.drop_column("version")
+        batch_op.drop_column("ai_time_budget")
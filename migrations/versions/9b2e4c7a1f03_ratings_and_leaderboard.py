@@ -0,0 +1,48 @@
+"""ratings and leaderboard
+
+Revision ID: 9b2e4c7a1f03
+Revises: 3f5c2a9d1b7e
+Create Date: 2026-10-17 14:03:27.481920
+
+adds when each game finished, the order ratings are replayed in, and the
+leaderboard table. run `flask ratings recompute --write` afterwards to rate
+the games that finished before this.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9b2e4c7a1f03"
+down_revision = "3f5c2a9d1b7e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("game") as batch_op:
+        batch_op.add_column(
+            sa.Column("finished_at", sa.DateTime(), nullable=True)
+        )
+
+    op.create_table(
+        "leaderboard",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("rating", sa.Float(), nullable=False),
+        sa.Column("deviation", sa.Float(), nullable=False),
+        sa.Column("volatility", sa.Float(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("games", sa.Integer(), nullable=False),
+        sa.Column("wins", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_index("ix_leaderboard_score", "leaderboard", ["score", "user_id"])
+
+
+def downgrade():
+    op.drop_index("ix_leaderboard_score", table_name="leaderboard")
+    op.drop_table("leaderboard")
+    with op.batch_alter_table("game") as batch_op:
+        batch_op.drop_column("finished_at")
@@ -0,0 +1,44 @@
+"""game indexes
+
+Revision ID: c41d8e2f6a95
+Revises: 9b2e4c7a1f03
+Create Date: 2026-10-17 16:21:08.305117
+
+indexes for a player's games by status, active games, and finished games in
+the order they finished.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c41d8e2f6a95"
+down_revision = "9b2e4c7a1f03"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_game_player1_status": ["player1_id", "status"],
+    "ix_game_player2_status": ["player2_id", "status"],
+    "ix_game_active": ["id"],
+    "ix_game_finished_at": ["finished_at"],
+}
+# partial indexes
+WHERE = {"ix_game_active": "status = 'active'"}
+
+
+def upgrade():
+    for name, columns in INDEXES.items():
+        where = WHERE.get(name)
+        op.create_index(
+            name,
+            "game",
+            columns,
+            sqlite_where=where and sa.text(where),
+            postgresql_where=where and sa.text(where),
+        )
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name="game")